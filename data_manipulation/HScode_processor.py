@@ -1,98 +1,208 @@
-import pandas as pd
-import re
+"""
+Build embedding-ready HS texts and the HS hierarchy artifact from an
+HS nomenclature export (NomenclatureCode, Tier, ProductCode, Product Description).
 
-# === CONFIG ===
-INPUT_FILE = "/Users/ayushbhardwaj/Documents/TarrifIQ/data/HSProducts - HS Nomenclature.csv"
-OUTPUT_FILE = "/Users/ayushbhardwaj/Documents/TarrifIQ/data/hs_embedding_ready.csv"
+Parents are resolved in one linear, stack-based pass over the Tier column;
+ancestor codes (chapter → heading → subheading) and the leaf texts are then
+built with vectorized array operations.
 
-# === LOAD ===
-df = pd.read_csv(INPUT_FILE)
-df.columns = df.columns.str.strip()
+Usage:
+    python data_manipulation/HScode_processor.py
+    python data_manipulation/HScode_processor.py --benchmark
+"""
 
-# Normalize column names if needed
-if "Product Description" in df.columns:
-    df.rename(columns={"Product Description": "ProductDescription"}, inplace=True)
+import argparse
+import os
+import time
 
-def clean_text(text):
-    text = str(text)
+import numpy as np
+import pandas as pd
 
-    # Remove year ranges like (-2001) or (2002-2011)
-    text = re.sub(r"\(\-?\d{4}.*?\)", "", text)
+# === CONFIG ===
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+INPUT_FILE = os.path.join(DATA_DIR, "HSProducts - HS Nomenclature.csv")
+OUTPUT_FILE = os.path.join(DATA_DIR, "hs_embedding_ready.csv")
+HIERARCHY_FILE = os.path.join(DATA_DIR, "hs_hierarchy.csv")
 
-    # Remove leading code artifacts and dashes
-    text = re.sub(r"^\d+\s*", "", text)
-    text = re.sub(r"^-+\s*", "", text)
-    text = re.sub(r"^--+\s*", "", text)
+# Tier → level name in the hierarchy artifact
+LEVEL_NAMES = {1: "chapter", 2: "heading", 3: "subheading"}
 
-    # Normalize whitespace
-    text = re.sub(r"\s+", " ", text)
 
-    text = text.strip().rstrip(".")
-    return text
+def load_nomenclature(path: str = INPUT_FILE) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype={"ProductCode": str})
+    df.columns = df.columns.str.strip()
 
+    # Normalize column names if needed
+    if "Product Description" in df.columns:
+        df.rename(columns={"Product Description": "ProductDescription"}, inplace=True)
+    return df
 
-# === Detect leaf nodes ===
-df["NextTier"] = df["Tier"].shift(-1)
-df["IsLeaf"] = df["NextTier"].isna() | (df["NextTier"] <= df["Tier"])
 
-hierarchy = {}
-results = []
+def clean_texts(texts: pd.Series) -> pd.Series:
+    """Vectorized description cleanup."""
+    text = texts.astype(str)
 
-for idx, row in df.iterrows():
-    tier = int(row["Tier"])
-    desc = clean_text(row["ProductDescription"])
-    code = str(row["ProductCode"])
+    # Remove year ranges like (-2001) or (2002-2011)
+    text = text.str.replace(r"\(\-?\d{4}.*?\)", "", regex=True)
 
-    # Ignore Tier 0 completely
-    if tier == 0:
-        continue
+    # Remove leading code artifacts and dashes
+    text = text.str.replace(r"^\d+\s*", "", regex=True)
+    text = text.str.replace(r"^-+\s*", "", regex=True)
+    text = text.str.replace(r"^--+\s*", "", regex=True)
 
-    # Update hierarchy
-    hierarchy[tier] = desc
+    # Normalize whitespace
+    text = text.str.replace(r"\s+", " ", regex=True)
 
-    # Remove deeper tiers if moving upward
-    for k in list(hierarchy.keys()):
-        if k > tier:
-            del hierarchy[k]
+    return text.str.strip().str.rstrip(".")
 
-    # Process only leaf nodes
-    if row["IsLeaf"] and code.lower() != "total":
 
-        ordered_tiers = sorted(hierarchy.keys())
-        ordered_desc = [hierarchy[t] for t in ordered_tiers]
+def resolve_parents(tiers: np.ndarray) -> np.ndarray:
+    """
+    Stack-based parent resolution: the parent of each row is the nearest
+    preceding row with a lower tier. Tier-0 rows are ignored (parent -1,
+    never a parent). Linear time — each row is pushed and popped once.
+    """
+    parents = np.full(len(tiers), -1, dtype=np.int64)
+    stack_rows: list[int] = []
+    stack_tiers: list[int] = []
 
-        # Skip if too shallow
-        if len(ordered_desc) < 2:
+    for i, tier in enumerate(tiers.tolist()):
+        if tier == 0:
             continue
-
-        # Most specific
-        product = ordered_desc[-1]
-
-        # Immediate parent
-        parent = ordered_desc[-2]
-
-        # Broader context (one level above parent if exists)
-        broader = ordered_desc[-3] if len(ordered_desc) >= 3 else None
-
-        # Merge naturally
-        if product.lower().startswith(parent.lower()):
-            merged = product
-        else:
-            merged = f"{parent} {product}"
-
-        if broader:
-            final_text = f"{merged}, classified under {broader.lower()}."
-        else:
-            final_text = f"{merged}."
-
-        results.append({
-            "hs_code": code,
-            "embedding_text": final_text
-        })
-
-
-# === SAVE ===
-output_df = pd.DataFrame(results)
-output_df.to_csv(OUTPUT_FILE, index=False)
-
-print(f"Saved {len(output_df)} cleaned, embedding-optimized records.")
\ No newline at end of file
+        while stack_tiers and stack_tiers[-1] >= tier:
+            stack_tiers.pop()
+            stack_rows.pop()
+        if stack_rows:
+            parents[i] = stack_rows[-1]
+        stack_rows.append(i)
+        stack_tiers.append(tier)
+
+    return parents
+
+
+def _ancestor_chain(parents: np.ndarray, max_depth: int) -> list[np.ndarray]:
+    """chain[k] = k-th ancestor row of every row (-1 beyond the root)."""
+    chain = [np.arange(len(parents), dtype=np.int64)]
+    for _ in range(max_depth):
+        prev = chain[-1]
+        chain.append(np.where(prev >= 0, parents[np.maximum(prev, 0)], -1))
+    return chain
+
+
+def build_hierarchy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per nomenclature entry with explicit parent and ancestor codes
+    for the full chapter → heading → subheading tree.
+    """
+    tiers = df["Tier"].to_numpy(dtype=np.int64)
+    codes = df["ProductCode"].astype(str).str.strip().to_numpy()
+
+    parents = resolve_parents(tiers)
+    max_tier = int(tiers.max()) if len(tiers) else 0
+    chain = _ancestor_chain(parents, max_tier)
+
+    # Leaf = next row (including Tier 0 rows) is not deeper
+    next_tier = np.append(tiers[1:], -1)
+    is_leaf = (next_tier <= tiers) | (np.arange(len(tiers)) == len(tiers) - 1)
+
+    out = pd.DataFrame({
+        "hs_code": codes,
+        "tier": tiers,
+        "description": clean_texts(df["ProductDescription"]).to_numpy(),
+        "parent_row": parents,
+        "parent_code": np.where(parents >= 0, codes[np.maximum(parents, 0)], ""),
+        "is_leaf": is_leaf,
+    })
+
+    for level_tier in range(1, max_tier + 1):
+        name = LEVEL_NAMES.get(level_tier, f"tier{level_tier}")
+        ancestor = np.full(len(tiers), -1, dtype=np.int64)
+        for rows in chain:
+            hit = (ancestor < 0) & (rows >= 0) & (tiers[np.maximum(rows, 0)] == level_tier)
+            ancestor[hit] = rows[hit]
+        out[f"{name}_code"] = np.where(ancestor >= 0, codes[np.maximum(ancestor, 0)], "")
+
+    return out
+
+
+def build_embedding_texts(hierarchy: pd.DataFrame) -> pd.DataFrame:
+    """
+    Leaf texts: "<parent> <product>, classified under <broader>." — merging
+    parent and product when the product already starts with the parent.
+    """
+    desc = hierarchy["description"].to_numpy(dtype=str)
+    parents = hierarchy["parent_row"].to_numpy()
+    grand = np.where(parents >= 0, parents[np.maximum(parents, 0)], -1)
+
+    keep = (
+        hierarchy["is_leaf"].to_numpy()
+        & (hierarchy["tier"].to_numpy() != 0)
+        & (hierarchy["hs_code"].str.lower().to_numpy() != "total")
+        & (parents >= 0)  # skip if too shallow
+    )
+
+    product = desc[keep]
+    parent = desc[parents[keep]]
+    grand_k = grand[keep]
+    broader = np.where(grand_k >= 0, desc[np.maximum(grand_k, 0)], "")
+
+    starts = np.char.startswith(np.char.lower(product), np.char.lower(parent))
+    merged = np.where(starts, product, np.char.add(np.char.add(parent, " "), product))
+
+    with_broader = np.char.add(
+        np.char.add(merged, ", classified under "),
+        np.char.add(np.char.lower(broader), "."),
+    )
+    final_text = np.where(grand_k >= 0, with_broader, np.char.add(merged, "."))
+
+    return pd.DataFrame({
+        "hs_code": hierarchy["hs_code"].to_numpy()[keep],
+        "embedding_text": final_text,
+    })
+
+
+def _synthetic_nomenclature(n_rows: int) -> pd.DataFrame:
+    """Synthetic chapter → heading → subheading → national-line nomenclature."""
+    tiers = np.tile(np.array([1, 2, 3, 4, 4, 3, 4, 2, 3, 4]), n_rows // 10 + 1)[:n_rows]
+    idx = np.arange(n_rows)
+    return pd.DataFrame({
+        "NomenclatureCode": "HS",
+        "Tier": tiers,
+        "ProductCode": pd.Series(idx).astype(str).str.zfill(8).to_numpy(),
+        "ProductDescription": np.char.add("Synthetic product line ", idx.astype(str)),
+    })
+
+
+def benchmark() -> None:
+    for label, df in [
+        ("HS nomenclature file", load_nomenclature(INPUT_FILE)),
+        ("synthetic 500k rows", _synthetic_nomenclature(500_000)),
+    ]:
+        start = time.time()
+        hierarchy = build_hierarchy(df)
+        texts = build_embedding_texts(hierarchy)
+        print(f"  {label:<22} {len(df):>8,} rows → {len(texts):>8,} leaf texts "
+              f"in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build HS embedding texts and hierarchy.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time the build on the HS file and a synthetic 500k-row file")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        df = load_nomenclature(INPUT_FILE)
+        hierarchy = build_hierarchy(df)
+        output_df = build_embedding_texts(hierarchy)
+
+        # === SAVE ===
+        hierarchy.to_csv(HIERARCHY_FILE, index_label="row")
+        output_df.to_csv(OUTPUT_FILE, index=False)
+
+        print(f"Saved {len(output_df)} cleaned, embedding-optimized records.")
+        print(f"Saved hierarchy artifact with {len(hierarchy)} nodes → {HIERARCHY_FILE}")
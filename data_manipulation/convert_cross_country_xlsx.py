@@ -1,10 +1,23 @@
 """
 Convert all .xlsx files in cross_country_preffered/ to .csv
 Reads the 'Country-TariffData' sheet and extracts the HS code
-from the Product column into a separate column.
+from the Product column into a separate column. Each CSV gets a
+columnar .npz copy next to it (one array per column), which the
+cross-country store reads instead of re-parsing the CSV.
+
+Files are converted in parallel across a process pool. A manifest of
+source checksums is kept in the output directory, so unchanged files
+are skipped on the next run (pass --force to rebuild everything).
 """
 
+import argparse
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
 
 XLSX_DIR = os.path.join(
@@ -17,25 +30,113 @@ OUTPUT_DIR = os.path.join(
     "data", "cross_country_csv",
 )
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, ".manifest.json")
+
 
-converted = 0
+def file_checksum(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-for filename in sorted(os.listdir(XLSX_DIR)):
-    if not filename.endswith(".xlsx"):
-        continue
 
+def convert_file(filename: str) -> dict:
+    """Convert one workbook; runs inside a worker process."""
+    start = time.time()
     filepath = os.path.join(XLSX_DIR, filename)
     df = pd.read_excel(filepath, sheet_name="Country-TariffData")
 
     # Extract HS code from "010599 - Description" format
     df["hs_code"] = df["Product"].str.extract(r"^(\d+)").iloc[:, 0]
 
-    csv_name = filename.replace(".xlsx", ".csv")
-    out_path = os.path.join(OUTPUT_DIR, csv_name)
-    df.to_csv(out_path, index=False)
+    stem = filename[:-len(".xlsx")]
+    df.to_csv(os.path.join(OUTPUT_DIR, f"{stem}.csv"), index=False)
+    save_columns(df, os.path.join(OUTPUT_DIR, f"{stem}.npz"))
+
+    return {
+        "filename": filename,
+        "csv_name": f"{stem}.csv",
+        "rows": len(df),
+        "seconds": time.time() - start,
+    }
+
+
+def save_columns(df: pd.DataFrame, path: str) -> None:
+    """Columnar binary copy: numeric columns as float64, the rest as strings (no pickling)."""
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_numeric_dtype(col):
+            columns[str(name)] = col.to_numpy(dtype=np.float64)
+        else:
+            columns[str(name)] = col.fillna("").astype(str).to_numpy(dtype=str)
+    np.savez(path, **columns)
+
+
+def _load_manifest() -> dict:
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE) as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: dict) -> None:
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def convert_all(workers: int | None = None, force: bool = False) -> None:
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    wall_start = time.time()
+
+    manifest = _load_manifest()
+    pending = {}
+    skipped = 0
+
+    for filename in sorted(os.listdir(XLSX_DIR)):
+        if not filename.endswith(".xlsx"):
+            continue
+
+        checksum = file_checksum(os.path.join(XLSX_DIR, filename))
+        stem = filename[:-len(".xlsx")]
+        output_exists = all(
+            os.path.exists(os.path.join(OUTPUT_DIR, f"{stem}{ext}")) for ext in (".csv", ".npz")
+        )
+        if not force and manifest.get(filename) == checksum and output_exists:
+            skipped += 1
+            continue
+        pending[filename] = checksum
+
+    converted = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert_file, f): f for f in pending}
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                info = future.result()
+            except Exception as e:
+                print(f"  ❌ {filename} failed: {e}")
+                continue
+
+            manifest[filename] = pending[filename]
+            converted += 1
+            print(f"  ✅ {filename} → {info['csv_name']}  "
+                  f"({info['rows']} rows, {info['seconds']:.2f}s)")
+
+    _save_manifest(manifest)
+
+    print(f"\nDone. Converted {converted} files, skipped {skipped} unchanged "
+          f"→ {OUTPUT_DIR}  (wall time {time.time() - wall_start:.2f}s)")
+
 
-    converted += 1
-    print(f"  ✅ {filename} → {csv_name}  ({len(df)} rows)")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reconvert files even if their checksum is unchanged")
+    args = parser.parse_args()
 
-print(f"\nDone. Converted {converted} files → {OUTPUT_DIR}")
+    convert_all(workers=args.workers, force=args.force)
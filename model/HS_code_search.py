@@ -57,6 +57,36 @@ def search(query: str, index, codes_df, model, top_k=TOP_K):
     return results
 
 
+def search_batch(queries: list[str], index, codes_df, model, top_k=TOP_K) -> list[list[dict]]:
+    """
+    Batched version of search(): one encode call and one FAISS search
+    for all queries. Returns one candidate list per query, in order.
+    """
+    if not queries:
+        return []
+
+    query_embeddings = model.encode(
+        queries,
+        normalize_embeddings=True,
+    ).astype("float32")
+
+    scores, indices = index.search(query_embeddings, top_k)
+
+    all_results = []
+    for q_indices, q_scores in zip(indices, scores):
+        results = []
+        for rank, (idx, score) in enumerate(zip(q_indices, q_scores), start=1):
+            row = codes_df.iloc[idx]
+            results.append({
+                "rank": rank,
+                "hs_code": str(row["hs_code"]),
+                "description": str(row["embedding_text"]),
+                "score": round(float(score), 4),
+            })
+        all_results.append(results)
+    return all_results
+
+
 def rerank_with_llm(product_description, candidates):
     """
     Rerank HS candidates using MegaLLM (OpenAI-compatible API).
@@ -5,6 +5,11 @@ Uses the Tavily API to search the web for real-time compliance
 and regulatory checks for a given product and country.
 Then uses MegaLLM to synthesize and extract a structured checklist.
 
+Checklists are cached per (destination, HS code or product) in the
+compliance store (see compliance_store), compressed queries are memoized
+per product, and the search query variants run concurrently. Search
+results are packed to a token budget by relevance (see context_packing).
+
 Usage (standalone demo):
     conda run -n tarrifiq python model/compliance_agent.py
 """
@@ -12,11 +17,18 @@ Usage (standalone demo):
 import os
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain, zip_longest
 
 from dotenv import load_dotenv
 from openai import OpenAI
 from tavily import TavilyClient
 
+from compliance_kb import KB_TTL_S, get_compliance_kb
+from context_packing import pack_context
+from compliance_store import COMPLIANCE_TTL_S, extract_hs_code, get_compliance_store, result_key
+
 load_dotenv()
 
 TAVILY_API_KEY = os.getenv("TAVILLY_API_KEY")
@@ -27,88 +39,145 @@ megallm_client = OpenAI(
     api_key=MEGALLM_API_KEY,
 )
 
+# ── Concurrent Searches ────────────────────────────────────────────
+# Query variants of one check (and concurrent checks) share one pool
+COMPLIANCE_WORKERS = int(os.getenv("TARIFFIQ_COMPLIANCE_WORKERS", "4"))
+COMPLIANCE_EXECUTOR = ThreadPoolExecutor(max_workers=COMPLIANCE_WORKERS, thread_name_prefix="compliance-search")
 
-def _compress_compliance_query(country: str, product_desc: str) -> str:
+# Descriptions at least this long are compressed by MegaLLM before searching
+LONG_DESCRIPTION_CHARS = 100
+# Search context handed to the checklist synthesis (≈ the former 7000-char cut)
+COMPLIANCE_CONTEXT_TOKENS = int(os.getenv("TARIFFIQ_COMPLIANCE_CONTEXT_TOKENS", "1500"))
+
+
+@lru_cache(maxsize=1)
+def _tavily_client() -> TavilyClient:
+    """One Tavily client (and HTTP session) for every search."""
+    if not TAVILY_API_KEY:
+        raise ValueError("TAVILLY_API_KEY not found. Add it to your .env file.")
+    return TavilyClient(api_key=TAVILY_API_KEY)
+
+
+def _compress_product(product_desc: str) -> str:
     """
-    If the product description is long, use MegaLLM to compress it into
-    a search-optimized query under 300 characters for Tavily.
+    Core product name + key specs of a long description, for search
+    queries. Depends on the product only, so it is memoized in the
+    compliance store and reused for every destination.
     """
-    if len(product_desc) < 100:
-        return (
-            f"Import compliance regulatory requirements certification "
-            f"for {product_desc} in {country} "
-            f"customs rules safety standards labeling requirements"
-        )
-        
+    store = get_compliance_store()
+    cached = store.get_query(product_desc)
+    if cached:
+        return cached
+
     try:
         prompt = f"""
         Extract the core product name and essential technical specifications from this description 
-        to create a highly effective search query for trade compliance and import regulations.
+        to create a highly effective search phrase for trade compliance and import regulations.
         
         Product Description: {product_desc}
-        Destination Country: {country}
         
         Rules:
-        - Return ONLY the optimized query string.
-        - The query MUST be under 250 characters.
-        - Focus on keywords like 'import requirements', 'regulations', 'standards'.
+        - Return ONLY the product phrase (no country, no extra words).
+        - The phrase MUST be under 200 characters.
         """
         
         response = megallm_client.chat.completions.create(
             model="gpt-4.1",
             messages=[
-                {"role": "system", "content": "You are a trade compliance search expert. Output ONLY the optimized search query."},
+                {"role": "system", "content": "You are a trade compliance search expert. Output ONLY the product phrase."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0
         )
-        optimized_query = response.choices[0].message.content.strip()
+        phrase = response.choices[0].message.content.strip()
         # Clean up any potential LLM output artifacts
-        optimized_query = optimized_query.replace('"', '').replace("'", "")
+        phrase = phrase.replace('"', '').replace("'", "")
         
-        print(f"✨ Optimized query for Tavily: '{optimized_query[:100]}...'")
-        return optimized_query
+        print(f"✨ Compressed product for Tavily: '{phrase[:100]}...'")
+        store.put_query(product_desc, phrase)
+        return phrase
         
     except Exception as e:
         print(f"Failed to compress compliance query: {e}")
-        # Fallback: simple truncation with keywords
-        return f"Import compliance {product_desc[:150]} in {country} regulations"
+        # Fallback: simple truncation (not memoized, so the next check retries)
+        return product_desc[:150]
 
 
-def search_compliance_info(country: str, product_desc: str) -> str:
+def _compress_compliance_query(country: str, product_desc: str) -> str:
     """
-    Search the web using Tavily for compliance, regulatory, 
-    and certification requirements for the given product & country.
+    Search-optimized Tavily query. Long product descriptions are first
+    compressed by MegaLLM (memoized per product).
     """
-    if not TAVILY_API_KEY:
-        raise ValueError("TAVILLY_API_KEY not found. Add it to your .env file.")
+    if len(product_desc) < LONG_DESCRIPTION_CHARS:
+        return (
+            f"Import compliance regulatory requirements certification "
+            f"for {product_desc} in {country} "
+            f"customs rules safety standards labeling requirements"
+        )
+    return (
+        f"{_compress_product(product_desc)} import requirements "
+        f"regulations standards certification {country}"
+    )
 
-    client = TavilyClient(api_key=TAVILY_API_KEY)
-    
-    query = _compress_compliance_query(country, product_desc)
-    
+
+def _query_variants(country: str, product_desc: str, hs_code: str | None = None) -> list[str]:
+    """Regulatory / standards query plus a customs documentation & restrictions query."""
+    subject = product_desc if len(product_desc) < LONG_DESCRIPTION_CHARS else _compress_product(product_desc)
+    if hs_code:
+        subject = f"HS {hs_code} {subject}"
+    return [
+        _compress_compliance_query(country, product_desc),
+        f"{country} customs clearance import documentation licences "
+        f"prohibited restricted goods {subject}"[:400],
+    ]
+
+
+def _tavily_search(query: str) -> dict:
+    """One advanced Tavily search; empty result on failure."""
     try:
         # We use 'search' with search_depth='advanced' for high-quality results
-        response = client.search(
-            query=query, 
+        return _tavily_client().search(
+            query=query,
             search_depth="advanced",
             max_results=5,
             include_answer=True
         )
-        
-        # Combine the synthetic answer and the snippets from top results
-        context = []
-        if response.get("answer"):
-            context.append(f"Summary: {response['answer']}")
-            
-        for res in response.get("results", []):
-            context.append(f"Source ({res['url']}): {res['content']}")
-            
-        return "\n\n".join(context)
-        
     except Exception as e:
         print(f"Tavily search failed: {e}")
-        return ""
+        return {}
+
+
+def search_compliance_info(
+    country: str,
+    product_desc: str,
+    hs_code: str | None = None,
+    model=None,
+    max_tokens: int = COMPLIANCE_CONTEXT_TOKENS,
+) -> str:
+    """
+    Search the web using Tavily for compliance, regulatory, 
+    and certification requirements for the given product & country.
+
+    The query variants are searched concurrently; results are interleaved
+    by rank across variants and de-duplicated by URL, then packed to
+    max_tokens — most relevant passages to the regulatory query first
+    when a SentenceTransformer `model` is given.
+    """
+    _tavily_client()  # raises early when the key is missing
+    queries = _query_variants(country, product_desc, hs_code or extract_hs_code(product_desc))
+    responses = list(COMPLIANCE_EXECUTOR.map(_tavily_search, queries))
+
+    # Combine the synthetic answers and the snippets from top results
+    sources = [("Summary", r["answer"]) for r in responses if r.get("answer")][:1]
+    seen = set()
+    ranked = chain.from_iterable(zip_longest(*(r.get("results", []) for r in responses)))
+    for res in ranked:
+        if res is None or res["url"] in seen:
+            continue
+        seen.add(res["url"])
+        sources.append((f"Source ({res['url']})", res["content"]))
+
+    return pack_context(sources, queries[0], max_tokens, model=model)
 
 
 def generate_compliance_checklist(country: str, product_desc: str, search_context: str) -> dict | None:
@@ -191,30 +260,53 @@ Rules:
         return None
 
 
-def run_compliance_check(country: str, product_desc: str) -> dict | None:
+def run_compliance_check(
+    country: str,
+    product_desc: str,
+    hs_code: str | None = None,
+    use_store: bool = True,
+    max_age_s: float = COMPLIANCE_TTL_S,
+    model=None,
+) -> dict | None:
     """
     Main orchestration function.
-    1. Searches web via Tavily
+    0. Serves a stored checklist for the same (destination, HS code or
+       product) if younger than max_age_s, else the knowledge-base
+       checklist of the HS heading / chapter (plus related requirements
+       found by embedding search when a SentenceTransformer `model` is given)
+    1. Searches web via Tavily, packing the most relevant passages (ranked
+       with `model` when given) into COMPLIANCE_CONTEXT_TOKENS
     2. Synthesizes via MegaLLM
-    3. Returns structured dict
+    3. Returns structured dict (cached=True and source = "store" /
+       "knowledge_base" when answered locally, source = "web" otherwise)
     """
+    store = get_compliance_store()
+    key, hs = result_key(country, product_desc, hs_code)
+    if use_store:
+        stored = store.get(key, max_age_s)
+        if stored is not None:
+            print(f"⚡ Compliance checklist for {key} served from the store.")
+            return {**stored, "product": product_desc, "cached": True, "source": "store"}
+
+        known = get_compliance_kb().lookup(country, product_desc, hs, model=model, max_age_s=KB_TTL_S)
+        if known is not None:
+            print(f"📚 Compliance checklist for {country} / HS {hs} served from the knowledge base ({known['kb_scope']}).")
+            return {**known, "cached": True, "source": "knowledge_base"}
+
     print(f"🔍 Searching the web for {product_desc} compliance in {country}...")
-    context = search_compliance_info(country, product_desc)
+    context = search_compliance_info(country, product_desc, hs, model=model)
     
     if not context:
         print("❌ Failed to retrieve web context.")
         return None
-        
-    # Truncate context to avoid token overflow or excessive synthesis time
-    MAX_CHARS = 7000
-    if len(context) > MAX_CHARS:
-        print(f"⚠️ Truncating context from {len(context)} to {MAX_CHARS} chars.")
-        context = context[:MAX_CHARS] + "..."
 
     print(f"🧠 Synthesizing {len(context)} characters of context with MegaLLM...")
     checklist = generate_compliance_checklist(country, product_desc, context)
-    
-    return checklist
+    if checklist is None:
+        return None
+
+    store.put(key, country, product_desc, checklist, hs_code=hs)
+    return {**checklist, "cached": False, "source": "web"}
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -0,0 +1,339 @@
+"""
+TariffIQ — Compliance Knowledge Base
+=====================================
+Precomputed compliance checklists per (destination, HS chapter or
+heading), so most checks are answered locally instead of with a fresh
+web search: import requirements are stable per destination and heading.
+
+- Offline, ``build_knowledge_base`` runs ``search_compliance_info`` +
+  ``generate_compliance_checklist`` once per scope — described by its
+  HS nomenclature title — and stores the checklist plus one embedded row
+  per requirement (SentenceTransformer, normalized) in the compliance
+  database.
+- At runtime ``lookup`` answers from the most specific fresh scope
+  (heading, then chapter), then adds product-specific nuances: stored
+  requirements of other scopes for the same destination whose embedding
+  is close to the product description.
+- A miss or a scope older than ``KB_TTL_S`` falls through to the web
+  path in compliance_agent.
+
+Usage (offline build):
+    python model/compliance_kb.py --countries USA India --chapters 84 85 61
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from compliance_store import COMPLIANCE_DB_FILE, DATA_DIR, normalize_country
+
+NOMENCLATURE_FILE = os.path.join(DATA_DIR, "HSProducts - HS Nomenclature.csv")
+
+KB_TTL_S = float(os.getenv("TARIFFIQ_COMPLIANCE_KB_TTL_S", str(90 * 24 * 3600)))
+KB_BUILD_WORKERS = int(os.getenv("TARIFFIQ_COMPLIANCE_KB_WORKERS", "2"))
+# Cosine similarity (all-MiniLM-L6-v2) above which another scope's
+# requirement is treated as relevant to the product
+KB_MIN_SIMILARITY = 0.45
+KB_MAX_RELATED = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kb_checklists (
+    scope         TEXT PRIMARY KEY,
+    country       TEXT NOT NULL,
+    hs_prefix     TEXT NOT NULL,
+    label         TEXT,
+    checklist     TEXT NOT NULL,
+    built_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kb_requirements (
+    scope         TEXT NOT NULL,
+    idx           INTEGER NOT NULL,
+    country       TEXT NOT NULL,
+    requirement   TEXT NOT NULL,
+    embedding     BLOB,
+    PRIMARY KEY (scope, idx)
+);
+CREATE INDEX IF NOT EXISTS kb_requirements_country ON kb_requirements (country);
+"""
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Scopes
+# ═══════════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=1)
+def hs_scope_labels() -> dict[str, str]:
+    """HS chapter (2-digit) and heading (4-digit) titles from the nomenclature file."""
+    if not os.path.exists(NOMENCLATURE_FILE):
+        return {}
+    df = pd.read_csv(NOMENCLATURE_FILE, dtype=str)
+    df = df[df["Tier"].isin(["1", "2"])]
+    width = df["Tier"].map({"1": 2, "2": 4})
+    codes = [code.strip().zfill(w) for code, w in zip(df["ProductCode"], width)]
+    return dict(zip(codes, df["Product Description"].str.strip().str.rstrip(".")))
+
+
+def scope_prefixes(hs_code: str | None) -> list[str]:
+    """Knowledge-base scopes for an HS code, most specific first: heading, chapter."""
+    digits = "".join(ch for ch in str(hs_code or "") if ch.isdigit())
+    if len(digits) < 2:
+        return []
+    return [digits[:4], digits[:2]] if len(digits) >= 4 else [digits[:2]]
+
+
+def scope_key(country: str, hs_prefix: str) -> str:
+    return f"{normalize_country(country)}|{hs_prefix}"
+
+
+def scope_description(hs_prefix: str) -> str:
+    """Search-ready description of a scope ("Nuclear reactors, boilers, machinery... (HS chapter 84)")."""
+    kind = "chapter" if len(hs_prefix) == 2 else "heading"
+    label = hs_scope_labels().get(hs_prefix)
+    return f"{label} (HS {kind} {hs_prefix})" if label else f"Goods classified under HS {kind} {hs_prefix}"
+
+
+def _requirement_text(item: dict) -> str:
+    return f"{item.get('requirement_title', '')}: {item.get('description', '')}"
+
+
+def _encode(model, texts: list[str]) -> np.ndarray:
+    return np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Knowledge Base
+# ═══════════════════════════════════════════════════════════════════
+
+class ComplianceKnowledgeBase:
+    """Scope checklists and embedded requirements, in the compliance database."""
+
+    def __init__(self, path: str = COMPLIANCE_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def get(self, scope: str) -> sqlite3.Row | None:
+        with self._lock:
+            return self._db.execute("SELECT * FROM kb_checklists WHERE scope = ?", (scope,)).fetchone()
+
+    def is_fresh(self, scope: str, max_age_s: float = KB_TTL_S) -> bool:
+        row = self.get(scope)
+        return row is not None and time.time() - row["built_at"] <= max_age_s
+
+    def put(self, country: str, hs_prefix: str, checklist: dict, model=None) -> None:
+        """Store a scope's checklist and its requirements (embedded when a model is given)."""
+        scope = scope_key(country, hs_prefix)
+        items = checklist.get("compliance_checklist") or []
+        vectors = _encode(model, [_requirement_text(i) for i in items]) if model is not None and items else None
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO kb_checklists VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, normalize_country(country), hs_prefix, hs_scope_labels().get(hs_prefix),
+                 json.dumps(checklist), time.time()),
+            )
+            self._db.execute("DELETE FROM kb_requirements WHERE scope = ?", (scope,))
+            self._db.executemany(
+                "INSERT INTO kb_requirements VALUES (?, ?, ?, ?, ?)",
+                [
+                    (scope, i, normalize_country(country), json.dumps(item),
+                     None if vectors is None else vectors[i].tobytes())
+                    for i, item in enumerate(items)
+                ],
+            )
+
+    def related(self, country: str, product_desc: str, model, exclude_scope: str,
+                top_k: int = KB_MAX_RELATED, min_similarity: float = KB_MIN_SIMILARITY) -> list[dict]:
+        """
+        Requirements stored for other scopes of the same destination whose
+        embedding is closest to the product description. Rows stored
+        without an embedding are embedded now and written back.
+        """
+        country = normalize_country(country)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT scope, idx, requirement, embedding FROM kb_requirements WHERE country = ? AND scope != ?",
+                (country, exclude_scope),
+            ).fetchall()
+        if not rows:
+            return []
+
+        missing = [r for r in rows if r["embedding"] is None]
+        if missing:
+            vectors = _encode(model, [_requirement_text(json.loads(r["requirement"])) for r in missing])
+            with self._lock, self._db:
+                self._db.executemany(
+                    "UPDATE kb_requirements SET embedding = ? WHERE scope = ? AND idx = ?",
+                    [(v.tobytes(), r["scope"], r["idx"]) for v, r in zip(vectors, missing)],
+                )
+            filled = {(r["scope"], r["idx"]): v for r, v in zip(missing, vectors)}
+        else:
+            filled = {}
+
+        matrix = np.stack([
+            filled.get((r["scope"], r["idx"])) if r["embedding"] is None
+            else np.frombuffer(r["embedding"], dtype=np.float32)
+            for r in rows
+        ])
+        scores = matrix @ _encode(model, [product_desc])[0]
+        order = np.argsort(-scores)[:top_k]
+        return [
+            {**json.loads(rows[i]["requirement"]), "kb_scope": rows[i]["scope"], "kb_similarity": round(float(scores[i]), 4)}
+            for i in order.tolist() if scores[i] >= min_similarity
+        ]
+
+    def lookup(self, country: str, product_desc: str, hs_code: str | None, model=None,
+               max_age_s: float = KB_TTL_S) -> dict | None:
+        """
+        Checklist for the most specific fresh scope of hs_code, with
+        product-specific related requirements appended (when a model is
+        given), or None when no scope is stored and fresh.
+        """
+        for prefix in scope_prefixes(hs_code):
+            scope = scope_key(country, prefix)
+            row = self.get(scope)
+            if row is None:
+                continue
+            if time.time() - row["built_at"] > max_age_s:
+                # A stale heading can still be backed by a fresh chapter
+                with self._lock:
+                    self._stats["stale"] += 1
+                continue
+            with self._lock:
+                self._stats["hits"] += 1
+
+            checklist = json.loads(row["checklist"])
+            items = checklist.get("compliance_checklist") or []
+            if model is not None:
+                titles = {str(i.get("requirement_title", "")).strip().lower() for i in items}
+                items = items + [
+                    r for r in self.related(country, product_desc, model, exclude_scope=scope)
+                    if str(r.get("requirement_title", "")).strip().lower() not in titles
+                ]
+            return {
+                **checklist,
+                "product": product_desc,
+                "country": country,
+                "compliance_checklist": items,
+                "kb_scope": scope,
+                "kb_built_at": row["built_at"],
+            }
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            scopes = self._db.execute("SELECT COUNT(*) FROM kb_checklists").fetchone()[0]
+            requirements = self._db.execute("SELECT COUNT(*) FROM kb_requirements").fetchone()[0]
+            return {"scopes": scopes, "requirements": requirements, **self._stats}
+
+
+_KB: ComplianceKnowledgeBase | None = None
+_KB_LOCK = threading.Lock()
+
+
+def get_compliance_kb() -> ComplianceKnowledgeBase:
+    """Process-wide knowledge base (opened on first use)."""
+    global _KB
+    if _KB is None:
+        with _KB_LOCK:
+            if _KB is None:
+                _KB = ComplianceKnowledgeBase(COMPLIANCE_DB_FILE)
+    return _KB
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Offline Build
+# ═══════════════════════════════════════════════════════════════════
+
+def build_scope(country: str, hs_prefix: str, model=None) -> bool:
+    """Search + synthesize one (destination, chapter / heading) checklist into the KB."""
+    from compliance_agent import generate_compliance_checklist, search_compliance_info
+
+    description = scope_description(hs_prefix)
+    context = search_compliance_info(country, description, hs_prefix, model=model)
+    if not context:
+        return False
+    checklist = generate_compliance_checklist(country, description, context)
+    if checklist is None:
+        return False
+    get_compliance_kb().put(country, hs_prefix, checklist, model=model)
+    return True
+
+
+class _SerialModel:
+    """SentenceTransformer proxy whose encode() holds a lock, so build threads embed one at a time."""
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.Lock()
+
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self._model.encode(*args, **kwargs)
+
+
+def build_knowledge_base(
+    countries: list[str],
+    hs_prefixes: list[str],
+    model=None,
+    max_age_s: float = KB_TTL_S,
+    workers: int = KB_BUILD_WORKERS,
+) -> dict:
+    """
+    Build (or refresh) every missing / stale (country, prefix) scope.
+    Returns {built, fresh, failed} lists of scope keys.
+    """
+    kb = get_compliance_kb()
+    summary = {"built": [], "fresh": [], "failed": []}
+    todo = []
+    for country in countries:
+        for prefix in hs_prefixes:
+            prefix = str(prefix).strip().zfill(2) if len(str(prefix).strip()) <= 2 else str(prefix).strip()
+            scope = scope_key(country, prefix)
+            if kb.is_fresh(scope, max_age_s):
+                summary["fresh"].append(scope)
+            else:
+                todo.append((country, prefix, scope))
+
+    # The fast tokenizer is not thread-safe ("Already borrowed")
+    if model is not None and workers > 1:
+        model = _SerialModel(model)
+
+    print(f"📚 Building {len(todo)} compliance scopes ({len(summary['fresh'])} already fresh)...")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compliance-kb") as pool:
+        for (country, prefix, scope), ok in zip(todo, pool.map(lambda t: build_scope(t[0], t[1], model), todo)):
+            summary["built" if ok else "failed"].append(scope)
+            print(f"  {'✅' if ok else '❌'} {scope}")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the TariffIQ compliance knowledge base.")
+    parser.add_argument("--countries", nargs="+", required=True, help="Destination countries")
+    parser.add_argument("--chapters", nargs="*", default=None, help="HS chapters / headings (default: all chapters)")
+    parser.add_argument("--max-age-days", type=float, default=KB_TTL_S / 86400, help="Rebuild scopes older than this")
+    parser.add_argument("--no-embeddings", action="store_true", help="Skip requirement embeddings")
+    args = parser.parse_args()
+
+    model = None
+    if not args.no_embeddings:
+        from sentence_transformers import SentenceTransformer
+        from HS_code_search import MODEL_NAME
+        model = SentenceTransformer(MODEL_NAME)
+
+    prefixes = args.chapters or sorted(p for p in hs_scope_labels() if len(p) == 2)
+    result = build_knowledge_base(args.countries, prefixes, model=model, max_age_s=args.max_age_days * 86400)
+    print(f"Done: {len(result['built'])} built, {len(result['fresh'])} fresh, {len(result['failed'])} failed.")
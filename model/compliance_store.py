@@ -0,0 +1,150 @@
+"""
+TariffIQ — Compliance Result Store
+===================================
+Persistent (SQLite) cache for the compliance agent, so a (destination,
+product) pair goes through Tavily + MegaLLM once per ``COMPLIANCE_TTL_S``
+no matter how many users ask.
+
+- Checklists are keyed by normalized destination (ISO3 where known) and
+  the HS code when one is given or found in the description ("HS
+  8486.20"), else the normalized product text.
+- Search queries compressed from long descriptions are memoized on the
+  product text alone, independent of destination and TTL (the LLM runs
+  at temperature 0).
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# ── Paths ───────────────────────────────────────────────────────────
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+COMPLIANCE_DB_FILE = os.getenv("TARIFFIQ_COMPLIANCE_DB", os.path.join(DATA_DIR, "compliance.sqlite"))
+
+# Regulatory requirements move slowly: a week by default
+COMPLIANCE_TTL_S = float(os.getenv("TARIFFIQ_COMPLIANCE_TTL_S", str(7 * 24 * 3600)))
+
+_HS_RE = re.compile(r"\bHS(?:\s*code)?\s*[:#]?\s*(\d{4}(?:[.\s]?\d{2}){0,2})\b", re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key           TEXT PRIMARY KEY,
+    country       TEXT NOT NULL,
+    hs_code       TEXT,
+    product       TEXT NOT NULL,
+    result        TEXT NOT NULL,
+    created_at    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    product       TEXT PRIMARY KEY,
+    query         TEXT NOT NULL,
+    created_at    REAL NOT NULL
+);
+"""
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Keys
+# ═══════════════════════════════════════════════════════════════════
+
+def normalize_country(country: str) -> str:
+    """ISO3 code for a known country name or code, else the lower-cased name."""
+    from wits_api import _resolve_iso3
+
+    try:
+        return _resolve_iso3(country)
+    except ValueError:
+        return " ".join(_WORD_RE.findall(country.lower()))
+
+
+def normalize_product(product_desc: str) -> str:
+    """Lower-cased words only, so punctuation / spacing variants share a key."""
+    return " ".join(_WORD_RE.findall(product_desc.lower()))
+
+
+def extract_hs_code(text: str) -> str | None:
+    """HS heading / subheading digits from "HS 8486.20"-style mentions, or None."""
+    match = _HS_RE.search(text)
+    return re.sub(r"\D", "", match.group(1)) if match else None
+
+
+def result_key(country: str, product_desc: str, hs_code: str | None = None) -> tuple[str, str | None]:
+    """(store key, HS digits used) for a compliance check."""
+    hs = re.sub(r"\D", "", hs_code) if hs_code else extract_hs_code(product_desc)
+    if hs and len(hs) >= 4:
+        hs = hs[:6]
+        return f"{normalize_country(country)}|hs:{hs}", hs
+    return f"{normalize_country(country)}|p:{normalize_product(product_desc)}", None
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Store
+# ═══════════════════════════════════════════════════════════════════
+
+class ComplianceStore:
+    """SQLite-backed checklists (with TTL) and compressed search queries."""
+
+    def __init__(self, path: str = COMPLIANCE_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def get(self, key: str, max_age_s: float = COMPLIANCE_TTL_S) -> dict | None:
+        """Stored checklist for `key` if younger than max_age_s (with cached_at), else None."""
+        with self._lock:
+            row = self._db.execute("SELECT result, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row["created_at"] > max_age_s:
+                self._stats["misses" if row is None else "stale"] += 1
+                return None
+            self._stats["hits"] += 1
+        return {**json.loads(row["result"]), "cached_at": row["created_at"]}
+
+    def put(self, key: str, country: str, product_desc: str, result: dict, hs_code: str | None = None) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, country, hs_code, product_desc, json.dumps(result), time.time()),
+            )
+
+    def get_query(self, product_desc: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT query FROM queries WHERE product = ?", (normalize_product(product_desc),),
+            ).fetchone()
+        return None if row is None else row["query"]
+
+    def put_query(self, product_desc: str, query: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                (normalize_product(product_desc), query, time.time()),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            results = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            queries = self._db.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+            return {"results": results, "queries": queries, "path": self.path, **self._stats}
+
+
+_STORE: ComplianceStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_compliance_store() -> ComplianceStore:
+    """Process-wide store (opened on first use)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = ComplianceStore(COMPLIANCE_DB_FILE)
+    return _STORE
@@ -0,0 +1,147 @@
+"""
+TariffIQ — Search Context Packing
+==================================
+Builds the LLM context for the compliance agent and the vendor finder
+from Tavily results under a token budget, instead of slicing the
+concatenated text at a fixed character count.
+
+1. Each source is split into passages at paragraph / sentence
+   boundaries (at most ``PASSAGE_CHARS`` each).
+2. Near-identical passages — the same boilerplate syndicated across
+   sites, or repeated between query variants — are dropped by word
+   shingle overlap (``DEDUPE_JACCARD``).
+3. Passages are ranked by cosine similarity to the query with the
+   SentenceTransformer the server already has loaded; without a model
+   they keep their search rank.
+4. The best passages are packed greedily until the token budget is
+   spent, and emitted grouped per source in search order.
+
+Tokens are estimated at ``CHARS_PER_TOKEN`` characters each (no
+tokenizer dependency); budgets are set with some headroom.
+"""
+
+import math
+import re
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+PASSAGE_CHARS = 600
+DEDUPE_JACCARD = 0.8
+SHINGLE_WORDS = 3
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=\s*[-*•#])")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text` for budgeting."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Passages
+# ═══════════════════════════════════════════════════════════════════
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> list[str]:
+    """Paragraphs of `text`, long ones re-split into sentence runs of at most max_chars."""
+    passages = []
+    for paragraph in _PARAGRAPH_RE.split(text or ""):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            passages.append(paragraph)
+            continue
+        chunk = ""
+        for sentence in _SENTENCE_RE.split(paragraph):
+            # A single run-on sentence longer than the limit is hard-wrapped
+            while len(sentence) > max_chars:
+                if chunk:
+                    passages.append(chunk)
+                    chunk = ""
+                passages.append(sentence[:max_chars])
+                sentence = sentence[max_chars:].lstrip()
+            if chunk and len(chunk) + 1 + len(sentence) > max_chars:
+                passages.append(chunk)
+                chunk = ""
+            chunk = f"{chunk} {sentence}" if chunk else sentence
+        if chunk:
+            passages.append(chunk)
+    return passages
+
+
+def _shingles(text: str) -> frozenset:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return frozenset([" ".join(words)])
+    return frozenset(" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+
+
+def dedupe_passages(passages: list[str], threshold: float = DEDUPE_JACCARD) -> list[int]:
+    """Indices of the passages kept: each one not near-identical to an earlier kept one."""
+    kept, kept_shingles = [], []
+    for i, passage in enumerate(passages):
+        s = _shingles(passage)
+        if any(len(s & k) / len(s | k) >= threshold for k in kept_shingles):
+            continue
+        kept.append(i)
+        kept_shingles.append(s)
+    return kept
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Packing
+# ═══════════════════════════════════════════════════════════════════
+
+def pack_context(
+    sources: list[tuple[str, str]],
+    query: str,
+    max_tokens: int,
+    model=None,
+) -> str:
+    """
+    Pack the most query-relevant passages of `sources` ([(label, text)],
+    in search-rank order) into at most ~max_tokens tokens.
+
+    Passages are ranked by embedding similarity to `query` when a
+    SentenceTransformer `model` is given (search rank otherwise) and
+    emitted per source, in the original order, as "label: passages".
+    """
+    labels, passages = [], []
+    for s, (label, text) in enumerate(sources):
+        for passage in split_passages(text):
+            labels.append(s)
+            passages.append(passage)
+    if not passages:
+        return ""
+
+    keep = dedupe_passages(passages)
+    labels = [labels[i] for i in keep]
+    passages = [passages[i] for i in keep]
+
+    if model is not None:
+        emb = np.asarray(model.encode([query] + passages, normalize_embeddings=True), dtype=np.float32)
+        order = np.argsort(-(emb[1:] @ emb[0]), kind="stable").tolist()
+    else:
+        order = list(range(len(passages)))
+
+    # Greedy: best first, skip what no longer fits (a shorter passage may still)
+    chosen, opened, used = set(), set(), 0
+    for i in order:
+        cost = estimate_tokens(passages[i]) + 1
+        if labels[i] not in opened:
+            cost += estimate_tokens(sources[labels[i]][0]) + 2
+        if used + cost > max_tokens:
+            continue
+        chosen.add(i)
+        opened.add(labels[i])
+        used += cost
+
+    blocks = {}
+    for i in sorted(chosen):
+        blocks.setdefault(labels[i], []).append(passages[i])
+    return "\n\n".join(
+        f"{sources[s][0]}: " + "\n".join(blocks[s]) for s in sorted(blocks)
+    )
@@ -0,0 +1,277 @@
+"""
+TariffIQ — Consolidated Cross-Country Tariff Store
+===================================================
+Indexes every reporter-partner file in ``data/cross_country_csv`` into one
+structure keyed by (reporter, partner, hs_code), so landed-cost lookups
+are a single dict probe instead of a per-request DataFrame scan.
+
+The store is built once, persisted as ``data/cross_country_store.npz``
+and rebuilt automatically when a source CSV changes. A build reads each
+file's columnar ``.npz`` copy (written by the converter) when present.
+
+Usage (rebuild from the CSVs):
+    python model/cross_country_store.py
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ── Paths ───────────────────────────────────────────────────────────
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+STORE_FILE = os.path.join(DATA_DIR, "cross_country_store.npz")
+
+# Columns carried from the WITS cross-country exports
+VALUE_COLUMNS = ("AppliedTariff", "MFNRate", "Product", "IsTraded")
+
+
+class CrossCountryStore:
+    """
+    Column arrays for every (reporter, partner, hs_code) row, plus a hash
+    index from key → row position. Country keys are the short names used
+    by shipping_landed_cost (e.g. "usa", "uk").
+    """
+
+    def __init__(self, reporters, partners, hs_codes, applied, mfn, product, is_traded, sources=None):
+        self.reporters = np.asarray(reporters, dtype=str)
+        self.partners = np.asarray(partners, dtype=str)
+        self.hs_codes = np.asarray(hs_codes, dtype=str)
+        self.applied = np.asarray(applied, dtype=np.float64)
+        self.mfn = np.asarray(mfn, dtype=np.float64)
+        self.product = np.asarray(product, dtype=str)
+        self.is_traded = np.asarray(is_traded, dtype=str)
+        self.sources = dict(sources or {})
+
+        # First row wins, matching the old `match.iloc[0]` behaviour
+        self._index: dict[tuple[str, str, str], int] = {}
+        for i, key in enumerate(zip(self.reporters.tolist(), self.partners.tolist(), self.hs_codes.tolist())):
+            self._index.setdefault(key, i)
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        self._n_routes: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def routes(self) -> set[tuple[str, str]]:
+        """All (reporter, partner) pairs present in the store."""
+        return {(r, p) for r, p, _ in self._index}
+
+    def row(self, reporter: str, partner: str, hs_code: str) -> int | None:
+        """Row position for a key, or None."""
+        i = self._index.get((_normalize(reporter), _normalize(partner), str(hs_code).strip()))
+        self._count(hits=int(i is not None), misses=int(i is None))
+        return i
+
+    def lookup(self, reporter: str, partner: str, hs_code: str) -> dict | None:
+        """
+        O(1) lookup of AppliedTariff, MFNRate, Product and IsTraded.
+        reporter = importer, partner = exporter.
+        """
+        i = self.row(reporter, partner, hs_code)
+        if i is None:
+            return None
+        return {
+            "AppliedTariff": float(self.applied[i]),
+            "MFNRate": float(self.mfn[i]),
+            "Product": str(self.product[i]),
+            "IsTraded": str(self.is_traded[i]),
+        }
+
+    def applied_rates(self, reporter: str, partners: list[str], hs_code: str) -> np.ndarray:
+        """AppliedTariff for one reporter across many partners (NaN where missing)."""
+        reporter, hs_code = _normalize(reporter), str(hs_code).strip()
+        rows = [self._index.get((reporter, _normalize(p), hs_code)) for p in partners]
+        out = np.full(len(rows), np.nan)
+        hit = np.array([r is not None for r in rows], dtype=bool)
+        self._count(hits=int(hit.sum()), misses=int((~hit).sum()))
+        if hit.any():
+            out[hit] = self.applied[[r for r in rows if r is not None]]
+        return out
+
+    # ── Stats ───────────────────────────────────────────────────────
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self._stats["hits"] += hits
+            self._stats["misses"] += misses
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (the key index is not counted)."""
+        return sum(a.nbytes for a in (
+            self.reporters, self.partners, self.hs_codes, self.applied, self.mfn, self.product, self.is_traded,
+        ))
+
+    def stats(self) -> dict:
+        if self._n_routes is None:
+            self._n_routes = len(self.routes())
+        with self._lock:
+            return {
+                "rows": len(self.reporters), "keys": len(self), "routes": self._n_routes,
+                "nbytes": self.nbytes, **self._stats,
+            }
+
+    # ── Persistence ─────────────────────────────────────────────────
+
+    def save(self, path: str = STORE_FILE) -> None:
+        np.savez(
+            path,
+            reporters=self.reporters, partners=self.partners, hs_codes=self.hs_codes,
+            applied=self.applied, mfn=self.mfn, product=self.product,
+            is_traded=self.is_traded,
+            source_names=np.array(list(self.sources.keys()), dtype=str),
+            source_mtimes=np.array(list(self.sources.values()), dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, path: str = STORE_FILE) -> "CrossCountryStore":
+        data = np.load(path)
+        sources = dict(zip(data["source_names"].tolist(), data["source_mtimes"].tolist()))
+        return cls(
+            data["reporters"], data["partners"], data["hs_codes"], data["applied"],
+            data["mfn"], data["product"], data["is_traded"], sources,
+        )
+
+
+def _normalize(name: str) -> str:
+    """Lowercase + strip a country name."""
+    return name.strip().lower()
+
+
+def _source_files(csv_dir: str) -> dict[str, float]:
+    """Map of source CSV filename → mtime."""
+    if not os.path.isdir(csv_dir):
+        return {}
+    return {
+        f: os.path.getmtime(os.path.join(csv_dir, f))
+        for f in sorted(os.listdir(csv_dir))
+        if f.endswith(".csv")
+    }
+
+
+def _read_columns(path_stem: str) -> pd.DataFrame:
+    """
+    hs_code + VALUE_COLUMNS of one converted file: from its columnar .npz
+    copy when that is at least as new as the CSV, else from the CSV.
+    """
+    csv_path, npz_path = f"{path_stem}.csv", f"{path_stem}.npz"
+    if os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(csv_path):
+        with np.load(npz_path) as data:
+            df = pd.DataFrame({c: data[c] for c in ("hs_code", *VALUE_COLUMNS) if c in data.files})
+        # The converter stores missing strings as ""
+        return df.replace("", np.nan)
+    return pd.read_csv(
+        csv_path, dtype={"hs_code": str},
+        usecols=lambda c: c in VALUE_COLUMNS or c == "hs_code",
+    )
+
+
+def build_cross_country_store(csv_dir: str | None = None) -> CrossCountryStore:
+    """Read every reporter-partner CSV once and index it."""
+    from shipping_landed_cost import CROSS_COUNTRY_DIR, FILE_NAME_MAP
+
+    csv_dir = csv_dir or CROSS_COUNTRY_DIR
+    file_to_short = {v: k for k, v in FILE_NAME_MAP.items()}
+    sources = _source_files(csv_dir)
+
+    frames = []
+    for filename in sources:
+        stem = filename[:-len(".csv")]
+        if "-" not in stem:
+            continue
+        r_file, p_file = stem.split("-", 1)
+
+        df = _read_columns(os.path.join(csv_dir, stem))
+        df = df.dropna(subset=["hs_code"])
+        df["reporter"] = file_to_short.get(r_file, r_file)
+        df["partner"] = file_to_short.get(p_file, p_file)
+        frames.append(df)
+
+    if frames:
+        all_rows = pd.concat(frames, ignore_index=True)
+    else:
+        all_rows = pd.DataFrame(columns=["reporter", "partner", "hs_code", *VALUE_COLUMNS])
+
+    return CrossCountryStore(
+        all_rows["reporter"].to_numpy(dtype=str),
+        all_rows["partner"].to_numpy(dtype=str),
+        all_rows["hs_code"].astype(str).str.strip().to_numpy(dtype=str),
+        pd.to_numeric(all_rows["AppliedTariff"], errors="coerce").to_numpy(dtype=np.float64),
+        pd.to_numeric(all_rows["MFNRate"], errors="coerce").to_numpy(dtype=np.float64),
+        all_rows["Product"].fillna("Unknown").astype(str).to_numpy(dtype=str),
+        all_rows["IsTraded"].fillna("No").astype(str).to_numpy(dtype=str),
+        sources,
+    )
+
+
+_STORE: CrossCountryStore | None = None
+_STORE_LOCK = threading.Lock()
+_STORE_VERSION = 0
+_store_stats = {"loads": 0, "builds": 0}
+
+
+def store_version() -> int:
+    """Bumped every time the process-wide store is (re)loaded."""
+    return _STORE_VERSION
+
+
+def get_cross_country_store(refresh: bool = False) -> CrossCountryStore:
+    """
+    Process-wide store. Loads STORE_FILE when it matches the current
+    source CSVs; otherwise rebuilds from the CSVs and re-persists.
+    """
+    global _STORE, _STORE_VERSION
+    if _STORE is not None and not refresh:
+        return _STORE
+
+    with _STORE_LOCK:
+        if _STORE is not None and not refresh:
+            return _STORE
+
+        from shipping_landed_cost import CROSS_COUNTRY_DIR
+
+        current = _source_files(CROSS_COUNTRY_DIR)
+        store = None
+        if os.path.exists(STORE_FILE):
+            store = CrossCountryStore.load(STORE_FILE)
+            if store.sources != current:
+                store = None
+            else:
+                _store_stats["loads"] += 1
+
+        if store is None:
+            store = build_cross_country_store(CROSS_COUNTRY_DIR)
+            _store_stats["builds"] += 1
+            if current:
+                store.save(STORE_FILE)
+
+        _STORE = store
+        _STORE_VERSION += 1
+    return _STORE
+
+
+def cross_country_store_stats() -> dict:
+    """Size and hit counts of the process-wide store (without loading it)."""
+    with _STORE_LOCK:
+        store, counts = _STORE, dict(_store_stats)
+    return {"loaded": store is not None, **counts, **(store.stats() if store is not None else {})}
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Build Run
+# ═══════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    store = build_cross_country_store()
+    store.save(STORE_FILE)
+    print(f"✅ Indexed {len(store):,} rows across {len(store.routes())} routes "
+          f"in {time.time() - start:.2f}s → {STORE_FILE}")
@@ -0,0 +1,189 @@
+"""
+TariffIQ — Landed-Cost Risk Simulation
+=======================================
+Vectorized Monte-Carlo over the landed-cost formula. Each route gets N
+scenarios drawn in NumPy:
+
+- Freight: shipping cost × a mean-one lognormal shock (volatility per mode).
+- FX: product value × a mean-one lognormal shock, shared by every route
+  into the same destination (one currency, one draw per scenario).
+- Tariff: with probability ``tariff_change_prob`` the rate moves by
+  ``tariff_change_pp`` percentage points (floored at 0).
+
+The draws run through ``landed_cost_from_shipping``, so every simulated
+total uses exactly the same cost build-up as ``calculate_landed_cost``.
+Pass ``seed`` for reproducible results.
+"""
+
+import numpy as np
+
+from shipping_landed_cost import (
+    _normalize, calculate_landed_cost_batch, calculate_shipping_cost_batch,
+    landed_cost_from_shipping,
+)
+
+# ── Default Risk Parameters ─────────────────────────────────────────
+# Annualized-style shock sizes; tune per engagement.
+FREIGHT_VOLATILITY = {"air": 0.15, "sea": 0.35, "rail": 0.20}
+FX_VOLATILITY = 0.05
+TARIFF_CHANGE_PROB = 0.10
+TARIFF_CHANGE_PP = 10.0
+
+PERCENTILES = (5, 50, 95)
+DEFAULT_DRAWS = 100_000
+
+
+def _lognormal_shocks(rng: np.random.Generator, sigma, size) -> np.ndarray:
+    """Mean-one lognormal multipliers: exp(N(-σ²/2, σ))."""
+    sigma = np.asarray(sigma, dtype=np.float64)
+    return np.exp(rng.standard_normal(size) * sigma - 0.5 * sigma ** 2)
+
+
+def simulate_totals(
+    routes: list[dict],
+    n: int = DEFAULT_DRAWS,
+    seed: int | None = None,
+    freight_volatility: dict | None = None,
+    fx_volatility: float = FX_VOLATILITY,
+    tariff_change_prob: float = TARIFF_CHANGE_PROB,
+    tariff_change_pp: float = TARIFF_CHANGE_PP,
+) -> np.ndarray:
+    """
+    Simulated total landed cost, shape (len(routes), n).
+
+    Each route needs origin, destination, mode, weight_kg, product_value
+    and tariff_rate (hs_code optional, for excise). Draws for route i use
+    the same scenario index as every other route, so FX moves are common
+    to routes into one destination.
+    """
+    rng = np.random.default_rng(seed)
+    vols = {**FREIGHT_VOLATILITY, **(freight_volatility or {})}
+
+    origins = np.array([r["origin"] for r in routes], dtype=object)
+    destinations = np.array([_normalize(r["destination"]) for r in routes], dtype=object)
+    modes = np.array([_normalize(r["mode"]) for r in routes], dtype=object)
+    weights = np.array([r["weight_kg"] for r in routes], dtype=np.float64)
+    values = np.array([r["product_value"] for r in routes], dtype=np.float64)
+    rates = np.array([r["tariff_rate"] for r in routes], dtype=np.float64)
+
+    shipping = calculate_shipping_cost_batch(origins, destinations, modes, weights)["shipping_cost"]
+    n_routes = len(routes)
+
+    # Freight: one independent shock per route and scenario
+    freight_sigma = np.array([vols.get(m, 0.0) for m in modes], dtype=np.float64)[:, None]
+    shipping_draws = shipping[:, None] * _lognormal_shocks(rng, freight_sigma, (n_routes, n))
+
+    # FX: one shock per destination currency and scenario
+    dest_keys, dest_idx = np.unique(destinations.astype(str), return_inverse=True)
+    fx = _lognormal_shocks(rng, fx_volatility, (len(dest_keys), n))[dest_idx]
+    value_draws = values[:, None] * fx
+
+    # Tariff: Bernoulli change of tariff_change_pp points
+    changed = rng.random((n_routes, n)) < tariff_change_prob
+    rate_draws = np.maximum(rates[:, None] + changed * tariff_change_pp, 0.0)
+
+    hs_codes = np.array([r.get("hs_code") for r in routes], dtype=object)[:, None]
+    return landed_cost_from_shipping(
+        shipping_draws, value_draws, rate_draws,
+        destinations=destinations[:, None], hs_codes=hs_codes,
+    )["total_landed_cost"]
+
+
+def summarize(totals: np.ndarray) -> dict:
+    """P5/P50/P95, mean and standard deviation of simulated totals."""
+    p5, p50, p95 = np.percentile(totals, PERCENTILES)
+    return {
+        "p5": round(float(p5), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "expected": round(float(totals.mean()), 2),
+        "std": round(float(totals.std()), 2),
+    }
+
+
+def probability_cheaper(totals: np.ndarray) -> np.ndarray:
+    """P[i, j] = share of scenarios where route i is strictly cheaper than route j."""
+    n_routes = totals.shape[0]
+    out = np.zeros((n_routes, n_routes))
+    for i in range(n_routes):
+        out[i] = (totals[i][None, :] < totals).mean(axis=1)
+    return out
+
+
+def simulate_routes(
+    routes: list[dict],
+    n: int = DEFAULT_DRAWS,
+    seed: int | None = None,
+    **risk,
+) -> dict:
+    """
+    Risk profile for several candidate routes.
+
+    Returns {
+        routes: [{route, mode, deterministic_total, p5, p50, p95, expected, std}],
+        prob_cheaper: [[P(route i cheaper than route j)]],
+        draws, seed
+    }
+    """
+    totals = simulate_totals(routes, n=n, seed=seed, **risk)
+    prob = probability_cheaper(totals)
+    deterministic = calculate_landed_cost_batch(*(
+        [r[k] for r in routes]
+        for k in ("origin", "destination", "mode", "weight_kg", "product_value", "tariff_rate")
+    ), hs_codes=[r.get("hs_code") for r in routes])["total_landed_cost"]
+
+    summaries = []
+    for r, row, base in zip(routes, totals, deterministic):
+        summaries.append({
+            "route": f"{r['origin']} → {r['destination']}",
+            "mode": _normalize(r["mode"]),
+            "deterministic_total": float(base),
+            **summarize(row),
+        })
+
+    return {
+        "routes": summaries,
+        "prob_cheaper": np.round(prob, 4).tolist(),
+        "draws": n,
+        "seed": seed,
+    }
+
+
+def compare_two(route_a: dict, route_b: dict, n: int = DEFAULT_DRAWS,
+                seed: int | None = None, **risk) -> dict:
+    """Risk profiles of two routes plus P(A cheaper than B)."""
+    result = simulate_routes([route_a, route_b], n=n, seed=seed, **risk)
+    return {
+        "a": result["routes"][0],
+        "b": result["routes"][1],
+        "prob_a_cheaper": result["prob_cheaper"][0][1],
+        "draws": n,
+        "seed": seed,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Demo Run
+# ═══════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    import time
+
+    candidates = [
+        {"origin": src, "destination": "usa", "mode": mode, "weight_kg": 500,
+         "product_value": 10000, "tariff_rate": rate}
+        for src, rate in (("china", 25.0), ("vietnam", 12.0), ("india", 8.0))
+        for mode in ("air", "sea")
+    ]
+
+    start = time.time()
+    result = simulate_routes(candidates, n=DEFAULT_DRAWS, seed=42)
+    elapsed = time.time() - start
+
+    print(f"🎲 {len(candidates)} routes × {DEFAULT_DRAWS:,} draws in {elapsed * 1e3:.0f} ms\n")
+    print(f"  {'Route':<20} {'Mode':<5} {'P5':>11} {'P50':>11} {'P95':>11} {'E[cost]':>11}")
+    for r in result["routes"]:
+        print(f"  {r['route']:<20} {r['mode']:<5} {r['p5']:>11,.2f} {r['p50']:>11,.2f} "
+              f"{r['p95']:>11,.2f} {r['expected']:>11,.2f}")
+
+    print(f"\n  P(vietnam sea cheaper than china sea): {result['prob_cheaper'][3][1]:.1%}")
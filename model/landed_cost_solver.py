@@ -0,0 +1,183 @@
+"""
+TariffIQ — Landed-Cost Sensitivity & Break-Even Solver
+=======================================================
+Answers "what if" questions from one tariff resolution instead of
+dozens of /api/landed-cost round-trips.
+
+Away from cent rounding, the landed cost of a cell (origin, mode) is
+
+    total = A(r) · CIF + fees,    CIF = 1.03 · value + base_m + weight · k_m · f_om
+    A(r)  = A0 + A1 · r           (r = tariff rate, %)
+
+where A0 / A1 come from the destination's tax schedule (duty, cess,
+excise, VAT/GST bases), base_m / k_m are the mode's shipping rates and
+f_om the route's distance factor. From that:
+
+- partial derivatives of the total w.r.t. weight, value and tariff rate
+- break-even weight between every pair of modes on a route
+- break-even tariff rates against every alternative origin
+
+are closed-form over all cells of a scenario matrix at once. Results are
+exact up to cent rounding.
+"""
+
+import numpy as np
+
+from scenario_matrix import get_scenario_matrix, default_origins
+from shipping_landed_cost import (
+    MODES, SHIPPING_RATES, _normalize, calculate_shipping_cost_batch, route_supported_mask,
+)
+from tax_schedule import get_tax_schedule, hs_chapters
+
+INSURANCE_RATE = 0.03
+
+_BASE = np.array([SHIPPING_RATES[m]["base_charge"] for m in MODES], dtype=np.float64)
+_PER_KG = np.array([SHIPPING_RATES[m]["per_kg_rate"] for m in MODES], dtype=np.float64)
+
+
+def tax_multiplier(destination: str, hs_code: str | None, product_value: float) -> dict:
+    """
+    Coefficients of total = (A0 + A1·r) · CIF + fees for one destination,
+    HS code and product value (de-minimis thresholds depend on the value).
+    """
+    tax = get_tax_schedule()
+    t = int(tax.country_ids([destination])[0])
+    ch = int(hs_chapters([hs_code])[0])
+
+    duty_on = not (tax.duty_de_minimis[t] > 0 and product_value <= tax.duty_de_minimis[t])
+    vat_on = not (tax.vat_de_minimis[t] > 0 and product_value <= tax.vat_de_minimis[t])
+    vat = (tax.vat_rate[t] + tax.gst_rate[t]) if vat_on else 0.0
+    c, e = tax.cess_rate[t], tax.excise[t, ch]
+    cess_on_duty = bool(tax.cess_on_duty[t])
+
+    # Per unit of CIF: value at r = 0 and slope per tariff point
+    duty0, duty1 = 0.0, (0.01 if duty_on else 0.0)
+    cess0, cess1 = (0.0, c * duty1) if cess_on_duty else (c, 0.0)
+    exc0, exc1 = e * (1 + duty0), e * duty1
+    base0 = 1 + tax.base_duty[t] * duty0 + tax.base_cess[t] * cess0 + tax.base_excise[t] * exc0
+    base1 = tax.base_duty[t] * duty1 + tax.base_cess[t] * cess1 + tax.base_excise[t] * exc1
+
+    return {
+        "a0": 1 + duty0 + vat * base0 + cess0 + exc0,
+        "a1": duty1 + vat * base1 + cess1 + exc1,
+        "fees": float(tax.handling_fee[t] + tax.doc_fee[t]),
+    }
+
+
+def _freight_terms(origins: list[str], destination: str) -> tuple[np.ndarray, np.ndarray]:
+    """(base charge, cost per kg) arrays of shape (origins, modes); NaN where no route."""
+    base = np.full((len(origins), len(MODES)), np.nan)
+    per_kg = np.full_like(base, np.nan)
+    ok = route_supported_mask(
+        np.array(origins, dtype=object)[:, None], destination, np.array(MODES, dtype=object)[None, :],
+    )
+    oi, mi = np.nonzero(ok)
+    if len(oi):
+        factor = calculate_shipping_cost_batch(
+            np.array(origins, dtype=object)[oi], destination,
+            np.array(MODES, dtype=object)[mi], 0.0,
+        )["distance_factor"]
+        base[oi, mi] = _BASE[mi]
+        per_kg[oi, mi] = _PER_KG[mi] * factor
+    return base, per_kg
+
+
+def sensitivity(a0: float, a1: float, rate: float, cif: float, per_kg: float) -> dict:
+    """∂total/∂weight (per kg), ∂total/∂value (per $) and ∂total/∂rate (per tariff point)."""
+    multiplier = a0 + a1 * rate
+    return {
+        "d_total_d_weight_kg": round(multiplier * per_kg, 4),
+        "d_total_d_product_value": round(multiplier * (1 + INSURANCE_RATE), 4),
+        "d_total_d_tariff_pp": round(a1 * cif, 4),
+    }
+
+
+def breakeven_weights(base: np.ndarray, per_kg: np.ndarray) -> list[dict]:
+    """
+    Weight at which each pair of modes costs the same on one route. Taxes
+    scale both modes' CIF by the same multiplier, so the crossing depends
+    only on freight: base_a + w·k_a = base_b + w·k_b. Without a positive
+    crossing one mode is cheaper at every weight.
+    """
+    out = []
+    for a in range(len(MODES)):
+        for b in range(a + 1, len(MODES)):
+            if np.isnan(base[a]) or np.isnan(base[b]):
+                continue
+            slope = per_kg[a] - per_kg[b]
+            weight = (base[b] - base[a]) / slope if slope else np.nan
+            entry = {"modes": [MODES[a], MODES[b]], "breakeven_weight_kg": None}
+            if np.isfinite(weight) and weight > 0:
+                light, heavy = (a, b) if base[a] < base[b] else (b, a)
+                entry["breakeven_weight_kg"] = round(float(weight), 2)
+                entry["cheaper_below"] = MODES[light]
+                entry["cheaper_above"] = MODES[heavy]
+            else:
+                entry["always_cheaper"] = MODES[a] if base[a] + per_kg[a] < base[b] + per_kg[b] else MODES[b]
+            out.append(entry)
+    return out
+
+
+def solve(
+    hs_code: str,
+    origin: str,
+    destination: str,
+    mode: str,
+    weight_kg: float,
+    product_value: float,
+    origins: list[str] | None = None,
+    year: int = 2021,
+) -> dict:
+    """
+    Sensitivities, mode break-even weights and origin break-even tariffs
+    for one shipment, from a single (cached) tariff resolution.
+    """
+    origin, destination, mode = _normalize(origin), _normalize(destination), _normalize(mode)
+    wanted = (default_origins(destination) if origins is None else list(origins)) + [origin]
+    matrix = get_scenario_matrix(hs_code, destination, origins=wanted, year=year)
+    costs = matrix.costs(weight_kg, product_value)
+    current = matrix.scenario(costs, origin, mode, weight_kg, product_value)
+    if current is None:
+        raise ValueError(f"No tariff data found for HS {hs_code} on route {origin} → {destination}.")
+
+    terms = tax_multiplier(destination, hs_code, product_value)
+    a0, a1, fees = terms["a0"], terms["a1"], terms["fees"]
+    base, per_kg = _freight_terms(matrix.origins, destination)
+
+    i, m = matrix.origins.index(origin), MODES.index(mode)
+    rate = float(matrix.rates[i])
+    cif = (1 + INSURANCE_RATE) * product_value + base[i, m] + weight_kg * per_kg[i, m]
+    total = current["total_landed_cost"]
+
+    # Break-even tariffs vs every alternative origin (same mode)
+    cifs = (1 + INSURANCE_RATE) * product_value + base[:, m] + weight_kg * per_kg[:, m]
+    alternatives = []
+    for j, alt in enumerate(matrix.origins):
+        if j == i or np.isnan(matrix.rates[j]) or np.isnan(cifs[j]):
+            continue
+        alt_total = float(costs["total_landed_cost"][j, m])
+        entry = {
+            "origin": alt,
+            "tariff_rate": float(matrix.rates[j]),
+            "total_landed_cost": alt_total,
+            "cheaper_now": alt_total < total,
+            # Alternative's rate below which it beats the current route
+            "alt_breakeven_tariff": None,
+            # Current route's rate above which the alternative wins
+            "current_breakeven_tariff": None,
+        }
+        if a1 > 0:
+            alt_r = ((total - fees) / cifs[j] - a0) / a1
+            cur_r = ((alt_total - fees) / cif - a0) / a1
+            entry["alt_breakeven_tariff"] = round(float(alt_r), 2) if alt_r >= 0 else None
+            entry["current_breakeven_tariff"] = round(float(cur_r), 2) if cur_r >= 0 else None
+        alternatives.append(entry)
+    alternatives.sort(key=lambda e: e["total_landed_cost"])
+
+    return {
+        "hs_code": matrix.hs_code,
+        "current": current,
+        "sensitivity": sensitivity(a0, a1, rate, cif, per_kg[i, m]),
+        "mode_breakeven": breakeven_weights(base[i], per_kg[i]),
+        "origin_breakeven": alternatives,
+    }
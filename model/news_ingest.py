@@ -0,0 +1,200 @@
+"""
+TariffIQ — Background News Ingestion
+=====================================
+Polls The News API on an interval and analyses new tariff articles off
+the request path, writing them to the news store; /api/news then only
+reads the store.
+
+- Incremental: each poll asks only for articles published after the
+  cursor, paging back up to ``INGEST_MAX_PAGES`` pages per poll. The
+  cursor only ever covers a contiguous ingested range: when a poll hits
+  the page limit, the older remainder is recorded as a backfill window
+  (published after the cursor, before the oldest article fetched) that
+  the next polls drain before the cursor moves up to the newest article.
+- Articles whose analysis fails — or is still pending at the deadline —
+  are retried on the next polls (up to ``INGEST_MAX_RETRIES`` attempts)
+  instead of holding the cursor back.
+- Runs as a daemon thread inside the FastAPI process (started from the
+  server lifespan), or standalone:
+
+    python model/news_ingest.py          # poll forever
+    python model/news_ingest.py --once   # one poll, then exit
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from news_store import get_news_store
+from policy_shock_engine import ARTICLE_TIMEOUT_S, analyze_articles, fetch_tariff_news
+
+NEWS_POLL_S = float(os.getenv("TARIFFIQ_NEWS_POLL_S", "600"))
+INGEST_BATCH = 25
+INGEST_MAX_PAGES = 4
+INGEST_MAX_RETRIES = 3
+
+CURSOR_KEY = "ingest_cursor"
+RETRY_KEY = "ingest_retry"
+BACKFILL_KEY = "ingest_backfill"
+
+_TS_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _published(article: dict) -> str:
+    """published_at trimmed to The News API's published_after format (YYYY-MM-DDTHH:MM:SS)."""
+    return (article.get("dateTime") or "")[:19]
+
+
+def _one_second_after(ts: str) -> str:
+    """ts + 1 s, so an exclusive published_before still covers articles at ts."""
+    return (datetime.strptime(ts, _TS_FORMAT) + timedelta(seconds=1)).strftime(_TS_FORMAT)
+
+
+def ingest_once(timeout_s: float = ARTICLE_TIMEOUT_S) -> dict:
+    """
+    One incremental poll: fetch articles newer than the cursor (or drain
+    the backfill window), retry earlier failures, analyse (store hits and
+    near-duplicates skip the LLM) and advance the cursor once the range
+    is contiguous. Returns counts for the poll.
+    """
+    store = get_news_store()
+    cursor = store.get_state(CURSOR_KEY)
+    backfill = json.loads(store.get_state(BACKFILL_KEY) or "null")
+
+    fetched: list[dict] = []
+    exhausted = False
+    for page in range(1, INGEST_MAX_PAGES + 1):
+        batch = fetch_tariff_news(
+            max_items=INGEST_BATCH, published_after=cursor, page=page,
+            published_before=backfill["before"] if backfill else None,
+        )
+        fetched += batch
+        if len(batch) < INGEST_BATCH:
+            exhausted = True
+            break
+    articles = list(fetched)
+
+    retry = json.loads(store.get_state(RETRY_KEY) or "[]")
+    seen = {a["url"] for a in articles}
+    articles += [r["article"] for r in retry if r["article"]["url"] not in seen]
+    attempts = {r["article"]["url"]: r["attempts"] for r in retry}
+
+    results = analyze_articles(articles, timeout_s=timeout_s)
+
+    # Pending analyses keep running (and are stored if they succeed); a
+    # retry of one that did is a store hit
+    still_failing = [
+        {"article": art, "attempts": attempts.get(art["url"], 0) + 1}
+        for art, res in zip(articles, results)
+        if res["status"] in ("failed", "pending") and attempts.get(art["url"], 0) + 1 < INGEST_MAX_RETRIES
+    ]
+    store.set_state(RETRY_KEY, json.dumps(still_failing))
+
+    # The cursor only moves over a contiguous range: (cursor, newest] once
+    # nothing older than the fetched pages is left between them
+    published = [_published(a) for a in fetched if _published(a)]
+    head = backfill["head"] if backfill else (max(published) if published else None)
+    if exhausted:
+        if head and (cursor is None or head > cursor):
+            cursor = head
+            store.set_state(CURSOR_KEY, cursor)
+        backfill = None
+    elif published:
+        backfill = {"before": _one_second_after(min(published)), "head": head}
+    store.set_state(BACKFILL_KEY, json.dumps(backfill))
+
+    statuses = [r["status"] for r in results]
+    return {
+        "fetched": len(articles),
+        "cached": sum(bool(r.get("cached")) for r in results),
+        "analyzed": sum(s == "ok" for s in statuses) - sum(bool(r.get("cached")) for r in results),
+        "failed": statuses.count("failed"),
+        "pending": statuses.count("pending"),
+        "retry_queue": len(still_failing),
+        "cursor": cursor,
+        "backfill_before": backfill["before"] if backfill else None,
+    }
+
+
+class NewsIngestor:
+    """Daemon thread running ingest_once every interval_s."""
+
+    def __init__(self, interval_s: float = NEWS_POLL_S):
+        self.interval_s = interval_s
+        self.last_run: float | None = None
+        self.last_result: dict | None = None
+        self.last_error: str | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="news-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.last_result = ingest_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"News ingestion failed: {e}")
+            self.last_run = time.time()
+            self._stop.wait(self.interval_s)
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_s": self.interval_s,
+            "last_run": self.last_run,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+_INGESTOR: NewsIngestor | None = None
+_INGESTOR_LOCK = threading.Lock()
+
+
+def get_news_ingestor() -> NewsIngestor:
+    """Process-wide ingestor (created on first use, not started)."""
+    global _INGESTOR
+    if _INGESTOR is None:
+        with _INGESTOR_LOCK:
+            if _INGESTOR is None:
+                _INGESTOR = NewsIngestor()
+    return _INGESTOR
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Standalone Worker
+# ═══════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    if "--once" in sys.argv:
+        print(f"📰 {ingest_once()}")
+        sys.exit(0)
+
+    print(f"📰 Ingesting tariff news every {NEWS_POLL_S:.0f}s (Ctrl+C to stop)...")
+    while True:
+        started = time.time()
+        try:
+            print(f"📰 {ingest_once()}")
+        except Exception as e:
+            print(f"News ingestion failed: {e}")
+        time.sleep(max(NEWS_POLL_S - (time.time() - started), 0))
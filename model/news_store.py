@@ -0,0 +1,302 @@
+"""
+TariffIQ — News Analysis Store
+===============================
+Persistent (SQLite) store of analysed news articles, so each distinct
+story goes through MegaLLM once no matter how often /api/news is polled.
+
+An article is recognised as already analysed when:
+
+1. its URL is stored with the same content hash (exact repeat), or
+2. another stored article has the same content hash (same text, new URL), or
+3. another stored article's 64-bit SimHash over title + body is within
+   ``NEAR_DUPLICATE_BITS`` Hamming distance (syndicated / lightly edited copy).
+
+The store also remembers the last fetched news list, so repeat requests
+inside ``NEWS_TTL_S`` skip The News API entirely, and the background
+ingestor's published-at cursor. Risk level, affected countries and HS
+chapters are denormalized into columns so the feed can be paged and
+filtered in SQL.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# ── Paths ───────────────────────────────────────────────────────────
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+NEWS_DB_FILE = os.getenv("TARIFFIQ_NEWS_DB", os.path.join(DATA_DIR, "news_analysis.sqlite"))
+
+NEWS_TTL_S = float(os.getenv("TARIFFIQ_NEWS_TTL_S", "300"))
+# News snippets are short (~20-60 words): word bigrams keep an added
+# byline or edited date within a few bits, while distinct stories on the
+# same topic land 25+ bits apart
+NEAR_DUPLICATE_BITS = 10
+SHINGLE_SIZE = 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url           TEXT PRIMARY KEY,
+    content_hash  TEXT NOT NULL,
+    simhash       INTEGER NOT NULL,
+    title         TEXT,
+    source        TEXT,
+    date_time     TEXT,
+    image         TEXT,
+    analysis      TEXT NOT NULL,
+    analyzed_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (content_hash);
+CREATE TABLE IF NOT EXISTS feeds (
+    name          TEXT PRIMARY KEY,
+    fetched_at    REAL NOT NULL,
+    articles      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key           TEXT PRIMARY KEY,
+    value         TEXT
+);
+"""
+
+# Filter columns (added to stores created before they existed)
+_FILTER_COLUMNS = {
+    "published_at": "TEXT",
+    "risk_level": "TEXT",
+    "risk_score": "REAL",
+    "countries": "TEXT",     # "|china|usa|"
+    "hs_chapters": "TEXT",   # "|72|73|"
+}
+_HS_CHAPTER_RE = re.compile(r"\d{1,2}")
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Fingerprints
+# ═══════════════════════════════════════════════════════════════════
+
+def _tokens(title: str, body: str) -> list[str]:
+    return _TOKEN_RE.findall(f"{title} {body}".lower())
+
+
+def content_hash(title: str, body: str) -> str:
+    """SHA-1 of the normalized (lower-cased, punctuation-free) text."""
+    return hashlib.sha1(" ".join(_tokens(title, body)).encode()).hexdigest()
+
+
+def simhash(title: str, body: str) -> int:
+    """
+    64-bit SimHash over word shingles. Each shingle votes ±1 per bit of
+    its hash; the sign of the tally is the fingerprint bit.
+    """
+    words = _tokens(title, body)
+    shingles = {
+        " ".join(words[i:i + SHINGLE_SIZE])
+        for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))
+    }
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = (2 * bits.astype(np.int64) - 1).sum(axis=0)
+    return int(((votes > 0).astype(np.uint64) << np.arange(64, dtype=np.uint64)).sum())
+
+
+def hamming(a: np.ndarray, b: int) -> np.ndarray:
+    """Bit distance between each fingerprint in `a` (uint64) and `b`."""
+    diff = np.asarray(a, dtype=np.uint64) ^ np.uint64(b)
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def _to_sql(h: int) -> int:
+    """uint64 → signed int64 for SQLite INTEGER."""
+    return int(np.uint64(h).view(np.int64))
+
+
+def _filter_fields(analysis: dict) -> dict:
+    """Risk level / score, countries and 2-digit HS chapters from an analysis."""
+    policy = analysis.get("extracted_policy") or {}
+    strategy = analysis.get("strategic_analysis") or {}
+    countries = [str(c).strip().lower() for c in policy.get("affected_countries") or [] if str(c).strip()]
+    chapters = []
+    for entry in policy.get("likely_affected_hs_chapters") or []:
+        match = _HS_CHAPTER_RE.search(str(entry))
+        if match:
+            chapters.append(match.group().zfill(2))
+    risk_score = strategy.get("risk_score")
+    return {
+        "risk_level": str(strategy.get("risk_level") or "").strip().lower() or None,
+        "risk_score": float(risk_score) if isinstance(risk_score, (int, float)) else None,
+        "countries": f"|{'|'.join(countries)}|" if countries else None,
+        "hs_chapters": f"|{'|'.join(dict.fromkeys(chapters))}|" if chapters else None,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Store
+# ═══════════════════════════════════════════════════════════════════
+
+class NewsStore:
+    """
+    SQLite-backed article analyses plus an in-memory SimHash index
+    (url → fingerprint) for near-duplicate scans.
+    """
+
+    def __init__(self, path: str = NEWS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        existing = {r["name"] for r in self._db.execute("PRAGMA table_info(articles)")}
+        for column, kind in _FILTER_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE articles ADD COLUMN {column} {kind}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS articles_published ON articles (published_at)")
+        rows = self._db.execute("SELECT url, simhash FROM articles").fetchall()
+        self._urls = [r["url"] for r in rows]
+        self._hashes = np.array([r["simhash"] for r in rows], dtype=np.int64).view(np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def lookup(self, article: dict) -> dict | None:
+        """
+        Stored analysis for an article, or None. Near-duplicate hits carry
+        duplicate_of = the stored article's URL.
+        """
+        chash = content_hash(article["title"], article["body"])
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM articles WHERE url = ? AND content_hash = ?", (article["url"], chash),
+            ).fetchone() or self._db.execute(
+                "SELECT * FROM articles WHERE content_hash = ? LIMIT 1", (chash,),
+            ).fetchone()
+            if row is None and len(self._urls):
+                distance = hamming(self._hashes, simhash(article["title"], article["body"]))
+                nearest = int(np.argmin(distance))
+                if distance[nearest] <= NEAR_DUPLICATE_BITS:
+                    row = self._db.execute(
+                        "SELECT * FROM articles WHERE url = ?", (self._urls[nearest],),
+                    ).fetchone()
+        if row is None:
+            return None
+        return {
+            "analysis": json.loads(row["analysis"]),
+            "analyzed_at": row["analyzed_at"],
+            "duplicate_of": None if row["url"] == article["url"] else row["url"],
+        }
+
+    def put(self, article: dict, analysis: dict) -> None:
+        """Insert or refresh an article's analysis."""
+        title, body = article["title"], article["body"]
+        fingerprint = simhash(title, body)
+        row = {
+            "url": article["url"], "content_hash": content_hash(title, body),
+            "simhash": _to_sql(fingerprint), "title": title, "source": article.get("source"),
+            "date_time": article.get("dateTime"), "image": article.get("image"),
+            "analysis": json.dumps(analysis), "analyzed_at": time.time(),
+            "published_at": article.get("dateTime") or None, **_filter_fields(analysis),
+        }
+        with self._lock, self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO articles ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values()),
+            )
+            if article["url"] in self._urls:
+                self._hashes[self._urls.index(article["url"])] = np.uint64(fingerprint)
+            else:
+                self._urls.append(article["url"])
+                self._hashes = np.append(self._hashes, np.uint64(fingerprint))
+
+    def put_feed(self, name: str, articles: list[dict]) -> None:
+        """Remember the raw article list of a feed fetch."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?)", (name, time.time(), json.dumps(articles)),
+            )
+
+    def get_feed(self, name: str, max_age_s: float = NEWS_TTL_S) -> list[dict] | None:
+        """The feed's article list if fetched within max_age_s, else None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM feeds WHERE name = ?", (name,)).fetchone()
+        if row is None or time.time() - row["fetched_at"] > max_age_s:
+            return None
+        return json.loads(row["articles"])
+
+    def query(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        risk_level: str | None = None,
+        country: str | None = None,
+        hs_chapter: str | None = None,
+    ) -> tuple[int, list[dict]]:
+        """
+        (total matches, one page of {article, analysis, status}) — newest
+        first, optionally filtered by risk level, affected country and HS
+        chapter (any code or chapter string; its first two digits are used).
+        """
+        where, params = [], []
+        if risk_level:
+            where.append("risk_level = ?")
+            params.append(risk_level.strip().lower())
+        if country:
+            where.append("countries LIKE ?")
+            params.append(f"%|{country.strip().lower()}|%")
+        if hs_chapter:
+            where.append("hs_chapters LIKE ?")
+            params.append(f"%|{str(hs_chapter).strip()[:2].zfill(2)}|%")
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM articles {clause}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT * FROM articles {clause} ORDER BY published_at DESC, analyzed_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        return total, [
+            {
+                "article": {
+                    "title": r["title"], "url": r["url"], "source": r["source"],
+                    "dateTime": r["date_time"], "image": r["image"],
+                },
+                "analysis": json.loads(r["analysis"]),
+                "status": "ok",
+            }
+            for r in rows
+        ]
+
+    def get_state(self, key: str) -> str | None:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row["value"]
+
+    def set_state(self, key: str, value: str | None) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, value))
+
+    def stats(self) -> dict:
+        return {"articles": len(self), "path": self.path}
+
+
+_STORE: NewsStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_news_store() -> NewsStore:
+    """Process-wide store (opened on first use)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = NewsStore(NEWS_DB_FILE)
+    return _STORE
@@ -11,15 +11,22 @@ before/after landed-cost impact simulation.
 import os
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
 
 from dotenv import load_dotenv
 from openai import OpenAI
 import urllib.parse
 import urllib.request
 
-from tarrif_lookup_engine import load_tariffs, get_tariff_rate
-from tarrif_lookup_engine import load_tariffs, get_tariff_rate
-from shipping_landed_cost import calculate_landed_cost, calculate_landed_cost_live
+from tarrif_lookup_engine import load_tariffs
+from shipping_landed_cost import _normalize, resolve_tariffs_bulk
+from shock_simulator import baseline_rates_from_df, simulate_shock
+from shock_targeting import compile_policy, simulate_policies, stacked_deltas
+from news_store import NEAR_DUPLICATE_BITS, NEWS_TTL_S, content_hash, get_news_store, hamming, simhash
 
 load_dotenv()
 
@@ -30,6 +37,17 @@ megallm_client = OpenAI(
     api_key=MEGALLM_API_KEY,
 )
 
+# Concurrent article analysis: bounded pool shared by every request, so
+# polling clients can't stack up unbounded LLM calls
+NEWS_WORKERS = int(os.getenv("TARIFFIQ_NEWS_WORKERS", "4"))
+ARTICLE_TIMEOUT_S = float(os.getenv("TARIFFIQ_ARTICLE_TIMEOUT_S", "30"))
+NEWS_EXECUTOR = ThreadPoolExecutor(max_workers=NEWS_WORKERS, thread_name_prefix="news-analysis")
+
+# Analyses submitted but not finished, by article content hash, so a poll
+# arriving while an earlier one is still running waits on the same call
+_IN_FLIGHT: dict = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
 
 # ═══════════════════════════════════════════════════════════════════
 #  Step 1: Parse News → Extract Tariff Details via MegaLLM
@@ -133,59 +151,31 @@ def run_personal_impact(
     For each user-provided HS code, compute the before/after
     landed cost under the extracted tariff delta.
 
-    Returns per-HS results + portfolio aggregation.
+    Baselines come from one bulk lookup and both landed-cost passes are
+    vectorized (see shock_simulator).
+
+    Returns per-HS results + portfolio and per-chapter aggregation.
     """
     if tariffs_df is None:
         tariffs_df = load_tariffs()
 
-    results = []
-    skipped = []
+    rates = baseline_rates_from_df(hs_codes, importing_country, year, tariffs_df)
+    lines = [
+        {"hs_code": hs, "origin": origin, "destination": destination, "mode": mode,
+         "weight_kg": weight_kg, "product_value": product_value}
+        for hs in hs_codes
+    ]
+    return _impact_report(simulate_shock(lines, tariff_delta_percent, baseline_rates=rates))
 
-    for hs in hs_codes:
-        baseline_tariff = get_tariff_rate(hs, importing_country, year, tariffs_df)
-        if baseline_tariff is None:
-            skipped.append(hs)
-            continue
-
-        # Baseline
-        baseline = calculate_landed_cost(
-            origin, destination, mode, weight_kg, product_value, baseline_tariff
-        )
-
-        # Post-shock (clamp to 0)
-        new_tariff = round(max(0, baseline_tariff + tariff_delta_percent), 2)
-        post = calculate_landed_cost(
-            origin, destination, mode, weight_kg, product_value, new_tariff
-        )
-
-        impact = round(post["total_landed_cost"] - baseline["total_landed_cost"], 2)
-        pct = round((impact / baseline["total_landed_cost"]) * 100, 2) if baseline["total_landed_cost"] else 0.0
-
-        results.append({
-            "hs_code": hs,
-            "baseline_tariff": baseline_tariff,
-            "new_tariff": new_tariff,
-            "baseline_total": baseline["total_landed_cost"],
-            "new_total": post["total_landed_cost"],
-            "absolute_impact": impact,
-            "percent_impact": pct,
-        })
-
-    # Portfolio aggregation
-    total_base = sum(r["baseline_total"] for r in results)
-    total_new = sum(r["new_total"] for r in results)
-    total_impact = round(total_new - total_base, 2)
-    pct_change = round((total_impact / total_base) * 100, 2) if total_base else 0.0
 
+def _impact_report(sim: dict) -> dict:
+    """simulate_shock output in the per_hs / portfolio / skipped shape of the impact functions."""
+    per_hs = [{k: v for k, v in r.items() if k != "origin"} for r in sim["per_hs"]]
     return {
-        "per_hs": results,
-        "portfolio": {
-            "total_baseline_cost": total_base,
-            "total_new_cost": total_new,
-            "total_impact": total_impact,
-            "portfolio_percent_change": pct_change,
-        },
-        "skipped": skipped,
+        "per_hs": per_hs,
+        "portfolio": sim["portfolio"],
+        "by_chapter": sim["by_chapter"],
+        "skipped": sim["skipped"],
     }
 
 
@@ -203,61 +193,33 @@ def run_personal_impact_live(
     LIVE WITS API version of run_personal_impact.
     Uses actual Effectively Applied (AHS) rates from WITS as the baseline,
     showing if an FTA already applies before adding the shock delta.
-    """
-    results = []
-    skipped = []
-
-    for hs in hs_codes:
-        # Get live baseline (AHS rate)
-        baseline = calculate_landed_cost_live(
-            origin, destination, mode, weight_kg, product_value, hs, year
-        )
-        
-        if baseline is None:
-            skipped.append(hs)
-            continue
 
-        baseline_tariff = baseline["applied_tariff"]
-        
-        # Post-shock (clamp to 0) - assumes policy delta is applied on top of AHS
-        new_tariff = round(max(0, baseline_tariff + tariff_delta_percent), 2)
-        post = calculate_landed_cost(
-            origin, destination, mode, weight_kg, product_value, new_tariff
-        )
-
-        impact = round(post["total_landed_cost"] - baseline["total_landed_cost"], 2)
-        pct = round((impact / baseline["total_landed_cost"]) * 100, 2) if baseline["total_landed_cost"] else 0.0
-
-        results.append({
-            "hs_code": hs,
-            "product_label": baseline.get("product_description"),
+    Baselines are resolved once per unique HS code, concurrently on the
+    shared live-lookup executor (bounded by the WITS concurrency budget);
+    codes in the same chapter range share their TradeStats fetches.
+    """
+    keys = [(_normalize(origin), _normalize(destination), str(hs).strip()) for hs in hs_codes]
+    tariffs = resolve_tariffs_bulk(keys, year=year)
+    baselines = {hs: tariffs[k] for hs, k in zip(hs_codes, keys)}
+
+    # Post-shock (clamp to 0) - assumes policy delta is applied on top of AHS
+    lines = [
+        {"hs_code": hs, "origin": origin, "destination": destination, "mode": mode,
+         "weight_kg": weight_kg, "product_value": product_value}
+        for hs in hs_codes
+    ]
+    rates = [baselines[hs]["ahs_rate"] for hs in hs_codes]
+    report = _impact_report(simulate_shock(lines, tariff_delta_percent, baseline_rates=rates))
+
+    for row in report["per_hs"]:
+        baseline = baselines[row["hs_code"]]
+        row.update({
+            "product_label": baseline.get("product_label", baseline["csv_product_description"]),
             "mfn_rate": baseline.get("mfn_rate"),
-            "baseline_tariff": baseline_tariff,
             "preference_margin": baseline.get("preference_margin", 0.0),
             "has_preference": baseline.get("has_preference", False),
-            "new_tariff": new_tariff,
-            "baseline_total": baseline["total_landed_cost"],
-            "new_total": post["total_landed_cost"],
-            "absolute_impact": impact,
-            "percent_impact": pct,
         })
-
-    # Portfolio aggregation
-    total_base = sum(r["baseline_total"] for r in results)
-    total_new = sum(r["new_total"] for r in results)
-    total_impact = round(total_new - total_base, 2)
-    pct_change = round((total_impact / total_base) * 100, 2) if total_base else 0.0
-
-    return {
-        "per_hs": results,
-        "portfolio": {
-            "total_baseline_cost": total_base,
-            "total_new_cost": total_new,
-            "total_impact": total_impact,
-            "portfolio_percent_change": pct_change,
-        },
-        "skipped": skipped,
-    }
+    return report
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -275,6 +237,7 @@ def run_policy_shock(
     importing_country: str | None = None,
     year: int = 2025,
     use_live_wits: bool = False,
+    targeted: bool = True,
 ) -> dict:
     """
     Main entry point.
@@ -282,6 +245,12 @@ def run_policy_shock(
     1. Analyze news with MegaLLM → extract tariff details + strategic analysis
     2. If HS codes provided → run before/after simulation
 
+    With targeted=True the delta only hits HS codes in the policy's
+    chapters / headings on routes involving its countries (see
+    shock_targeting); targeted=False applies it to every code. Country
+    names that could not be resolved are listed in unresolved_countries
+    (if none resolved, every route is shocked — targeting.country_fallback).
+
     Returns combined result dict.
     """
     # Step 1: MegaLLM analysis
@@ -291,6 +260,8 @@ def run_policy_shock(
         "news": news_text,
         "analysis": analysis,
         "personal_impact": None,
+        "targeting": None,
+        "unresolved_countries": [],
     }
 
     # Step 2: Optional personal impact
@@ -298,6 +269,17 @@ def run_policy_shock(
         delta = analysis.get("extracted_policy", {}).get("estimated_tariff_delta_percent", 0)
 
         if origin and destination and importing_country:
+            if targeted:
+                policy = compile_policy(analysis.get("extracted_policy") or {}, delta)
+                delta = stacked_deltas([policy], hs_codes, origin, destination)[0]
+                output["unresolved_countries"] = policy.unresolved_countries
+                if policy.country_fallback:
+                    print(f"⚠️ No affected country resolved ({policy.unresolved_countries}); "
+                          f"shock applied to every route.")
+                output["targeting"] = {
+                    **policy.describe(),
+                    "matched_hs_codes": [hs for hs, d in zip(hs_codes, delta.tolist()) if d],
+                }
             if use_live_wits:
                  impact = run_personal_impact_live(
                      hs_codes, delta, origin, destination, mode,
@@ -313,6 +295,44 @@ def run_policy_shock(
     return output
 
 
+def run_stacked_policy_shock(
+    analyses: list[dict],
+    hs_codes: list[str],
+    origin: str,
+    destination: str,
+    mode: str = "sea",
+    weight_kg: float = 100,
+    product_value: float = 10000,
+    importing_country: str | None = None,
+    year: int = 2025,
+    tariffs_df=None,
+) -> dict:
+    """
+    Evaluate several news analyses at once: each policy is targeted at
+    its own chapters and countries, and the combined shock is the sum of
+    their deltas. Baseline, every policy alone and the combination come
+    out of one landed-cost pass (see shock_targeting.simulate_policies).
+    """
+    if tariffs_df is None:
+        tariffs_df = load_tariffs()
+
+    policies = [
+        compile_policy(a.get("extracted_policy") or {})
+        for a in analyses if a and a.get("extracted_policy")
+    ]
+    rates = baseline_rates_from_df(hs_codes, importing_country or destination, year, tariffs_df)
+    lines = [
+        {"hs_code": hs, "origin": origin, "destination": destination, "mode": mode,
+         "weight_kg": weight_kg, "product_value": product_value}
+        for hs in hs_codes
+    ]
+    result = simulate_policies(lines, policies, baseline_rates=rates)
+    result["unresolved_countries"] = list(dict.fromkeys(
+        name for policy in policies for name in policy.unresolved_countries
+    ))
+    return result
+
+
 # ═══════════════════════════════════════════════════════════════════
 #  Live News Pipeline: The News API → Analysis
 # ═══════════════════════════════════════════════════════════════════
@@ -321,9 +341,12 @@ def run_policy_shock(
 _TARIFF_SEARCH_QUERY = 'tariff | "trade war" | "customs duty" | "import duty" | "trade policy" | "trade sanctions" | "anti-dumping" | "countervailing duty" | "retaliatory tariff" | "tariff hike" | "tariff exemption"'
 
 
-def fetch_tariff_news(max_items: int = 5) -> list[dict]:
+def fetch_tariff_news(max_items: int = 5, published_after: str | None = None, page: int = 1,
+                      published_before: str | None = None) -> list[dict]:
     """
-    Query The News API for the most recent tariff-related news articles.
+    Query The News API for the most recent tariff-related news articles,
+    optionally only those published after / before ISO timestamps (UTC).
+    `page` pages back through older results, max_items at a time.
 
     Returns a list of article dicts, each containing:
         title, body, url, source, dateTime, image
@@ -334,12 +357,19 @@ def fetch_tariff_news(max_items: int = 5) -> list[dict]:
             "Add it to your .env file."
         )
 
-    params = urllib.parse.urlencode({
+    query = {
         'api_token': THENEWSAPI_API_KEY,
         'search': _TARIFF_SEARCH_QUERY,
         'language': 'en',
+        'sort': 'published_at',
         'limit': str(min(max_items, 100)),
-    })
+        'page': str(page),
+    }
+    if published_after:
+        query['published_after'] = published_after
+    if published_before:
+        query['published_before'] = published_before
+    params = urllib.parse.urlencode(query)
 
     url = f"https://api.thenewsapi.com/v1/news/all?{params}"
     
@@ -369,35 +399,132 @@ def fetch_tariff_news(max_items: int = 5) -> list[dict]:
     return articles[:max_items]
 
 
-def run_policy_shock_from_live_news(max_articles: int = 5) -> list[dict]:
-    """
-    Auto-fetch the latest tariff-related news via Event Registry,
-    then analyse each article with MegaLLM.
+def _article_summary(art: dict) -> dict:
+    return {
+        "title":    art["title"],
+        "url":      art["url"],
+        "source":   art["source"],
+        "dateTime": art["dateTime"],
+        "image":    art["image"],
+    }
 
-    Returns a list of dicts, one per article:
-        { article: { title, url, source, dateTime, image },
-          analysis: { extracted_policy, strategic_analysis } }
+
+def _analyze_and_store(art: dict) -> dict | None:
+    """analyze_news for one article, written through to the news store on success."""
+    analysis = analyze_news(f"{art['title']}\n\n{art['body']}")
+    if analysis:
+        get_news_store().put(art, analysis)
+    return analysis
+
+
+def _submit_analysis(art: dict, analyse):
+    """NEWS_EXECUTOR future analysing `art`, shared with any still-running call for the same text."""
+    key = content_hash(art["title"], art["body"])
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+        if future is not None:
+            return future
+        future = NEWS_EXECUTOR.submit(analyse, art)
+        _IN_FLIGHT[key] = future
+    # Outside the lock: a future already done runs the callback right here
+    future.add_done_callback(lambda f: _release_analysis(key, f))
+    return future
+
+
+def _release_analysis(key: str, future) -> None:
+    with _IN_FLIGHT_LOCK:
+        if _IN_FLIGHT.get(key) is future:
+            del _IN_FLIGHT[key]
+
+
+def analyze_articles(articles: list[dict], timeout_s: float = ARTICLE_TIMEOUT_S,
+                     use_store: bool = True) -> list[dict]:
+    """
+    Analyse articles concurrently on NEWS_EXECUTOR. Results keep the input
+    order; each carries a status:
+
+        ok       — analysis returned (cached=True when served from the store)
+        failed   — MegaLLM error / invalid JSON (analysis is None)
+        pending  — not finished within timeout_s of submission; the call
+                   keeps running in the background but does not block
+
+    With use_store, articles already in the news store (same URL and text,
+    same text elsewhere, or a near-duplicate) are served without an LLM
+    call, and near-duplicates inside the batch share one analysis; both
+    carry duplicate_of = the URL whose analysis they reuse. Completed
+    analyses — including ones finishing after the deadline — are stored,
+    and an article whose analysis is still running from an earlier call
+    waits on that call instead of being submitted again.
     """
-    articles = fetch_tariff_news(max_items=max_articles)
+    started = time.time()
+    store = get_news_store() if use_store else None
+    analyse = _analyze_and_store if use_store else (lambda art: analyze_news(f"{art['title']}\n\n{art['body']}"))
 
     results: list[dict] = []
+    futures: list = []
+    submitted: list[tuple[int, str, object]] = []  # (simhash, url, future) for in-batch dedup
     for art in articles:
-        news_text = f"{art['title']}\n\n{art['body']}"
-        analysis = analyze_news(news_text)
-        results.append({
-            "article": {
-                "title":    art["title"],
-                "url":      art["url"],
-                "source":   art["source"],
-                "dateTime": art["dateTime"],
-                "image":    art["image"],
-            },
-            "analysis": analysis,
-        })
+        entry = {"article": _article_summary(art), "analysis": None, "status": "pending"}
+        future = None
+        cached = store.lookup(art) if store else None
+        if cached:
+            entry.update(analysis=cached["analysis"], status="ok", cached=True)
+            if cached["duplicate_of"]:
+                entry["duplicate_of"] = cached["duplicate_of"]
+        else:
+            fingerprint = simhash(art["title"], art["body"])
+            distance = hamming(np.array([s[0] for s in submitted], dtype=np.uint64), fingerprint)
+            if len(distance) and distance.min() <= NEAR_DUPLICATE_BITS:
+                _, entry["duplicate_of"], future = submitted[int(distance.argmin())]
+            else:
+                future = _submit_analysis(art, analyse)
+                submitted.append((fingerprint, art["url"], future))
+        results.append(entry)
+        futures.append(future)
 
+    wait([f for f in futures if f is not None], timeout=timeout_s)
+
+    for entry, future in zip(results, futures):
+        if future is None or not future.done():
+            continue
+        try:
+            entry["analysis"] = future.result()
+            entry["status"] = "ok" if entry["analysis"] else "failed"
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+
+    pending = sum(r["status"] == "pending" for r in results)
+    if pending:
+        print(f"⏳ {pending}/{len(results)} article analyses still pending after {time.time() - started:.1f}s")
     return results
 
 
+def run_policy_shock_from_live_news(
+    max_articles: int = 5,
+    timeout_s: float = ARTICLE_TIMEOUT_S,
+    max_age_s: float = NEWS_TTL_S,
+) -> list[dict]:
+    """
+    Latest tariff-related news via The News API (reused from the news
+    store for max_age_s), analysed concurrently with MegaLLM; stories
+    analysed before are served from the store.
+
+    Returns a list of dicts, one per article, in feed order:
+        { article: { title, url, source, dateTime, image },
+          analysis: { extracted_policy, strategic_analysis } | None,
+          status: "ok" | "failed" | "pending" }
+    """
+    store = get_news_store()
+    feed = f"tariff-news:{max_articles}"
+    articles = store.get_feed(feed, max_age_s=max_age_s)
+    if articles is None:
+        articles = fetch_tariff_news(max_items=max_articles)
+        if articles:
+            store.put_feed(feed, articles)
+    return analyze_articles(articles, timeout_s=timeout_s)
+
+
 # ═══════════════════════════════════════════════════════════════════
 #  Demo Run
 # ═══════════════════════════════════════════════════════════════════
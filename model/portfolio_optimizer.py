@@ -0,0 +1,341 @@
+"""
+TariffIQ — Portfolio Sourcing Optimizer
+========================================
+Splits annual volume for many SKUs across origins to minimize total
+landed cost, subject to:
+
+- origin capacity caps (units / year across all SKUs)
+- minimum order quantities (an origin used for a SKU gets ≥ MOQ units)
+- diversification: max share of one SKU from any origin, and max share
+  of portfolio value from any origin
+
+Unit costs come from one vectorized landed-cost pass over every
+SKU × origin pair. Each SKU ships ``shipments_per_year`` equal shipments;
+the unit cost is the landed cost of one full-volume shipment divided by
+its units, so per-shipment fees are spread as if the origin took the
+whole volume (the usual linearization for sourcing LPs).
+
+Solvers:
+- "lp" / "milp": SciPy's HiGHS (``scipy.optimize.milp``) when SciPy is
+  installed — exact LP; MOQs as binary on/off variables on small
+  portfolios, LP + MOQ repair rounds on large ones.
+- "greedy": regret-ordered fill (SKUs with the largest gap between their
+  best and second-best origin choose first), used when SciPy is missing
+  or HiGHS returns no solution within the time limit. Faster, but it can
+  leave demand unmet when capacity or share caps bind.
+
+Demand that no feasible origin can absorb is reported as unmet units.
+"""
+
+import time
+
+import numpy as np
+
+from shipping_landed_cost import (
+    SUPPORTED_COUNTRIES, _normalize, calculate_landed_cost_batch,
+    resolve_tariffs_bulk, route_supported_mask,
+)
+from cross_country_store import get_cross_country_store
+
+try:
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_matrix, vstack
+except ImportError:  # SciPy is optional — greedy solver only
+    milp = None
+
+DEFAULT_SHIPMENTS_PER_YEAR = 12
+SOLVER_TIME_LIMIT_S = 10.0
+# Exact MOQ handling (one binary per SKU × origin cell) up to this many
+# cells; larger portfolios use LP + MOQ repair, which stays in seconds
+MILP_MAX_BINARIES = 500
+MOQ_REPAIR_ROUNDS = 5
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Cost Coefficients
+# ═══════════════════════════════════════════════════════════════════
+
+def tariff_matrix(skus: list[dict], origins: list[str], live: bool = False, year: int = 2021) -> np.ndarray:
+    """
+    Tariff rate per (SKU, origin), NaN where unknown. Local rates come
+    from the cross-country store, one call per unique (destination, HS);
+    live=True resolves every unique key through WITS instead.
+    """
+    dest_hs = [(_normalize(s["destination"]), str(s["hs_code"]).strip()) for s in skus]
+    unique = list(dict.fromkeys(dest_hs))
+
+    if live:
+        resolved = resolve_tariffs_bulk([(o, d, h) for d, h in unique for o in origins], year=year)
+        table = {
+            (d, h): np.array([
+                np.nan if resolved[(o, d, h)]["ahs_rate"] is None else resolved[(o, d, h)]["ahs_rate"]
+                for o in origins
+            ], dtype=np.float64)
+            for d, h in unique
+        }
+    else:
+        store = get_cross_country_store()
+        table = {(d, h): store.applied_rates(d, origins, h) for d, h in unique}
+
+    return np.stack([table[k] for k in dest_hs]) if skus else np.empty((0, len(origins)))
+
+
+def unit_costs(skus: list[dict], origins: list[str], rates: np.ndarray) -> np.ndarray:
+    """
+    Landed cost per unit for every (SKU, origin) — NaN where there is no
+    tariff, no route for the SKU's mode, or origin == destination.
+    """
+    n_skus, n_origins = len(skus), len(origins)
+    costs = np.full((n_skus, n_origins), np.nan)
+    if n_skus == 0:
+        return costs
+
+    dest = np.array([_normalize(s["destination"]) for s in skus], dtype=object)
+    modes = np.array([_normalize(s.get("mode", "sea")) for s in skus], dtype=object)
+    shipments = np.array([s.get("shipments_per_year", DEFAULT_SHIPMENTS_PER_YEAR) for s in skus], dtype=np.float64)
+    units = np.array([s["annual_units"] for s in skus], dtype=np.float64) / shipments
+    hs_codes = np.array([str(s["hs_code"]).strip() for s in skus], dtype=object)
+    orig = np.array([_normalize(o) for o in origins], dtype=object)
+
+    ok = (
+        route_supported_mask(orig[None, :], dest[:, None], modes[:, None])
+        & ~np.isnan(rates) & (orig[None, :] != dest[:, None]) & (units[:, None] > 0)
+    )
+    si, oi = np.nonzero(ok)
+    if len(si):
+        landed = calculate_landed_cost_batch(
+            orig[oi], dest[si], modes[si],
+            units[si] * np.array([s["unit_weight_kg"] for s in skus], dtype=np.float64)[si],
+            units[si] * np.array([s["unit_value"] for s in skus], dtype=np.float64)[si],
+            rates[si, oi], hs_codes=hs_codes[si],
+        )["total_landed_cost"]
+        costs[si, oi] = landed / units[si]
+    return costs
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Solvers
+# ═══════════════════════════════════════════════════════════════════
+
+def _limits(origins, demand, values, capacity, moq, max_sku_share, max_origin_share):
+    """Per-origin capacity / value caps, per-cell upper bounds and MOQs as arrays."""
+    cap = np.array([(capacity or {}).get(o, np.inf) for o in origins], dtype=np.float64)
+    if isinstance(moq, dict):
+        moqs = np.array([moq.get(o, 0.0) for o in origins], dtype=np.float64)
+    else:
+        moqs = np.full(len(origins), float(moq or 0.0))
+    upper = demand[:, None] * np.ones((1, len(origins))) * (1.0 if max_sku_share is None else max_sku_share)
+    value_cap = np.full(len(origins), np.inf)
+    if max_origin_share is not None:
+        value_cap[:] = max_origin_share * float(demand @ values)
+    return cap, moqs, upper, value_cap
+
+
+def solve_greedy(costs, demand, values, cap, moqs, upper, value_cap) -> np.ndarray:
+    """Regret-ordered greedy fill. Returns allocation (SKU, origin) in units."""
+    n_skus, n_origins = costs.shape
+    alloc = np.zeros((n_skus, n_origins))
+    ranked = np.where(np.isnan(costs), np.inf, costs)
+    order = np.argsort(ranked, axis=1)
+    sorted_costs = np.take_along_axis(ranked, order, axis=1)
+    second = sorted_costs[:, 1] if n_origins > 1 else np.full(n_skus, np.inf)
+    regret = np.where(np.isfinite(second), second - sorted_costs[:, 0], np.inf) * demand
+
+    cap_left, value_left = cap.copy(), value_cap.copy()
+    for s in np.argsort(-regret, kind="stable"):
+        remaining = demand[s]
+        for o in order[s]:
+            if remaining <= 0 or not np.isfinite(ranked[s, o]):
+                break
+            take = min(remaining, upper[s, o], cap_left[o],
+                       value_left[o] / values[s] if values[s] > 0 else np.inf)
+            if take <= 0 or take < moqs[o]:
+                continue
+            alloc[s, o] = take
+            remaining -= take
+            cap_left[o] -= take
+            value_left[o] -= take * values[s]
+    return alloc
+
+
+def solve_milp(costs, demand, values, cap, moqs, upper, value_cap,
+               time_limit_s: float = SOLVER_TIME_LIMIT_S) -> tuple[np.ndarray | None, str]:
+    """
+    HiGHS over the feasible (SKU, origin) cells plus one unmet slack per
+    SKU (penalized above any real cost). Returns (allocation, solver):
+
+    - "lp"   — no MOQs, or more MOQ cells than MILP_MAX_BINARIES: plain LP,
+               then cells left below their MOQ are closed and the LP
+               re-solved (MOQ_REPAIR_ROUNDS at most).
+    - "milp" — exact, one binary on/off variable per MOQ cell.
+
+    Allocation is None when SciPy is missing or no solution was found in time.
+    """
+    if milp is None:
+        return None, "greedy"
+    upper = upper.copy()
+    # A cell whose cap is below its MOQ can never be opened
+    upper[upper < moqs[None, :]] = 0.0
+    costs = np.where(upper > 0, costs, np.nan)
+
+    si, oi = np.nonzero(~np.isnan(costs))
+    exact = 0 < int((moqs[oi] > 0).sum()) <= MILP_MAX_BINARIES
+    deadline = time.time() + time_limit_s
+
+    for _ in range(MOQ_REPAIR_ROUNDS + 1):
+        alloc = _highs(costs, demand, values, cap, moqs, upper, value_cap, exact,
+                       max(deadline - time.time(), 0.1))
+        if alloc is None or exact:
+            break
+        below = (alloc > 1e-9) & (alloc < moqs[None, :] - 1e-9)
+        if not below.any():
+            break
+        costs = np.where(below, np.nan, costs)
+    else:
+        # Still below MOQ after the repair rounds — drop those cells to unmet
+        alloc[(alloc > 1e-9) & (alloc < moqs[None, :] - 1e-9)] = 0.0
+    return alloc, "milp" if exact else "lp"
+
+
+def _highs(costs, demand, values, cap, moqs, upper, value_cap, use_moq, time_limit_s):
+    """One HiGHS solve; see solve_milp."""
+    n_skus, n_origins = costs.shape
+    si, oi = np.nonzero(~np.isnan(costs))
+    n_cells = len(si)
+    use_moq = use_moq and bool((moqs[oi] > 0).any())
+    n_bin = n_cells if use_moq else 0
+    penalty = (np.nanmax(costs) if n_cells else 1.0) * 10 + 1.0
+
+    # Variables: x (cells) | unmet (SKUs) | y (cells, binary on/off) when MOQs apply
+    n_vars = n_cells + n_skus + n_bin
+    c = np.concatenate([costs[si, oi], np.full(n_skus, penalty), np.zeros(n_bin)])
+    bounds = Bounds(np.zeros(n_vars), np.concatenate([upper[si, oi], demand, np.ones(n_bin)]))
+    integrality = np.concatenate([np.zeros(n_cells + n_skus), np.ones(n_bin)])
+
+    cells = np.arange(n_cells)
+    rows, lo, hi = [], [], []
+
+    # Demand: Σ_o x[s, o] + unmet[s] = demand[s]
+    rows.append(coo_matrix(
+        (np.ones(n_cells + n_skus), (np.concatenate([si, np.arange(n_skus)]),
+                                     np.concatenate([cells, n_cells + np.arange(n_skus)]))),
+        shape=(n_skus, n_vars),
+    ))
+    lo.append(demand), hi.append(demand)
+
+    # Origin capacity (units) and diversification (portfolio value share)
+    for weights, limit in ((np.ones(n_cells), cap), (values[si], value_cap)):
+        finite = np.isfinite(limit)
+        if finite.any():
+            remap = np.cumsum(finite) - 1
+            keep = finite[oi]
+            rows.append(coo_matrix((weights[keep], (remap[oi[keep]], cells[keep])),
+                                   shape=(int(finite.sum()), n_vars)))
+            lo.append(np.full(int(finite.sum()), -np.inf)), hi.append(limit[finite])
+
+    # MOQ: moq·y ≤ x ≤ upper·y
+    if use_moq:
+        y = n_cells + n_skus + cells
+        for bound, lower, higher in ((moqs[oi], 0.0, np.inf), (upper[si, oi], -np.inf, 0.0)):
+            rows.append(coo_matrix((np.concatenate([np.ones(n_cells), -bound]),
+                                    (np.concatenate([cells, cells]), np.concatenate([cells, y]))),
+                                   shape=(n_cells, n_vars)))
+            lo.append(np.full(n_cells, lower)), hi.append(np.full(n_cells, higher))
+
+    res = milp(
+        c, integrality=integrality, bounds=bounds,
+        constraints=LinearConstraint(vstack(rows).tocsr(), np.concatenate(lo), np.concatenate(hi)),
+        options={"time_limit": time_limit_s},
+    )
+    if res.x is None:
+        return None
+    alloc = np.zeros((n_skus, n_origins))
+    alloc[si, oi] = np.maximum(res.x[:n_cells], 0.0)
+    return alloc
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Portfolio Optimization
+# ═══════════════════════════════════════════════════════════════════
+
+def optimize_portfolio(
+    skus: list[dict],
+    origins: list[str] | None = None,
+    capacity: dict[str, float] | None = None,
+    moq: float | dict[str, float] | None = None,
+    max_sku_share: float | None = None,
+    max_origin_share: float | None = None,
+    tariff_rates: np.ndarray | None = None,
+    live: bool = False,
+    solver: str = "auto",
+    time_limit_s: float = SOLVER_TIME_LIMIT_S,
+    year: int = 2021,
+) -> dict:
+    """
+    Allocate each SKU's annual volume across origins at minimum total
+    landed cost.
+
+    Each SKU needs hs_code, destination, annual_units, unit_weight_kg and
+    unit_value (optional: sku_id, mode, shipments_per_year). capacity and
+    moq are keyed by origin name; moq may be one number for all origins.
+    tariff_rates (SKU, origin) overrides the tariff lookup.
+
+    Returns {solver, total_landed_cost, unmet_units, allocations, by_origin, elapsed_ms}.
+    """
+    if solver not in ("auto", "highs", "greedy"):
+        raise ValueError("solver must be 'auto', 'highs' or 'greedy'.")
+    if solver == "highs" and milp is None:
+        raise ValueError("solver='highs' requires SciPy (pip install scipy).")
+    for bound in (max_sku_share, max_origin_share):
+        if bound is not None and not 0 < bound <= 1:
+            raise ValueError("Share limits must be in (0, 1].")
+
+    start = time.time()
+    origins = [_normalize(o) for o in (origins or SUPPORTED_COUNTRIES)]
+    capacity = {_normalize(o): v for o, v in (capacity or {}).items()}
+    if isinstance(moq, dict):
+        moq = {_normalize(o): v for o, v in moq.items()}
+
+    rates = tariff_matrix(skus, origins, live=live, year=year) if tariff_rates is None \
+        else np.asarray(tariff_rates, dtype=np.float64)
+    costs = unit_costs(skus, origins, rates)
+    demand = np.array([s["annual_units"] for s in skus], dtype=np.float64)
+    values = np.array([s["unit_value"] for s in skus], dtype=np.float64)
+    limits = _limits(origins, demand, values, capacity, moq, max_sku_share, max_origin_share)
+
+    alloc, used = None, "greedy"
+    if solver != "greedy":
+        alloc, used = solve_milp(costs, demand, values, *limits, time_limit_s=time_limit_s)
+    if alloc is None:
+        alloc, used = solve_greedy(costs, demand, values, *limits), "greedy"
+
+    spend = np.where(alloc > 0, alloc * np.nan_to_num(costs), 0.0)
+    allocations = [
+        {
+            "sku_id": skus[s].get("sku_id") or int(s),
+            "hs_code": str(skus[s]["hs_code"]),
+            "origin": origins[o],
+            "units": round(float(alloc[s, o]), 2),
+            "unit_landed_cost": round(float(costs[s, o]), 4),
+            "landed_cost": round(float(spend[s, o]), 2),
+        }
+        for s, o in zip(*np.nonzero(alloc > 1e-9))
+    ]
+    total = float(spend.sum())
+    by_origin = {
+        origins[o]: {
+            "units": round(float(alloc[:, o].sum()), 2),
+            "landed_cost": round(float(spend[:, o].sum()), 2),
+            "cost_share": round(float(spend[:, o].sum() / total), 4) if total else 0.0,
+        }
+        for o in range(len(origins)) if alloc[:, o].sum() > 1e-9
+    }
+
+    return {
+        "solver": used,
+        "total_landed_cost": round(total, 2),
+        "unmet_units": round(float(np.maximum(demand - alloc.sum(axis=1), 0.0).sum()), 2),
+        "allocations": allocations,
+        "by_origin": by_origin,
+        "elapsed_ms": round((time.time() - start) * 1e3, 1),
+    }
@@ -0,0 +1,239 @@
+"""
+TariffIQ — Route Matrix
+========================
+Dense country ids and precomputed (mode, origin, destination) distance
+matrices for air, sea and rail, covering every country in
+``wits_api.ISO3_TO_NUMERIC``.
+
+- Known trade-lane distances (``AIR_DISTANCE_KM`` / ``SEA_DISTANCE_KM`` in
+  shipping_landed_cost) are used as-is.
+- Missing pairs are computed once from port / airport coordinates in
+  ``data/country_ports.csv``: great-circle distance × a per-mode detour
+  factor. Air and sea factors are calibrated on the known lanes; rail is
+  only available between countries sharing a rail region.
+- The result is cached as ``data/route_matrix.npz`` and rebuilt when its
+  inputs change: the coordinates file, the known-lane tables or the
+  default detour factors (hashed into ``source_key``).
+
+Shipping-cost lookups then reduce to array indexing, which the scalar and
+batched landed-cost paths share.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from wits_api import COUNTRY_NAME_TO_ISO3, ISO3_TO_NUMERIC
+
+# ── Paths ───────────────────────────────────────────────────────────
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+PORTS_FILE = os.path.join(DATA_DIR, "country_ports.csv")
+MATRIX_FILE = os.path.join(DATA_DIR, "route_matrix.npz")
+
+# ── Modes & Detour Factors ──────────────────────────────────────────
+MODES = ("air", "sea", "rail")
+
+# Used when there are no known lanes to calibrate against
+DEFAULT_DETOUR_FACTOR = {"air": 1.1, "sea": 1.6, "rail": 1.3}
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def great_circle_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine distance (km); inputs broadcast together."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class RouteMatrix:
+    """
+    countries[i] is the ISO3 code for dense id i; distance_km[m, o, d] is
+    the distance for MODES[m] (NaN where no route exists).
+    """
+
+    def __init__(self, countries, names, distance_km, detour_factors=None, source_key=""):
+        self.countries = [str(c) for c in countries]
+        self.names = [str(n) for n in names]
+        self.distance_km = np.asarray(distance_km, dtype=np.float64)
+        self.detour_factors = dict(detour_factors or {})
+        self.source_key = str(source_key)
+
+        self.mode_ids = {m: i for i, m in enumerate(MODES)}
+        self._ids = {}
+        for i, (iso3, name) in enumerate(zip(self.countries, self.names)):
+            self._ids[iso3.lower()] = i
+            self._ids[name.lower()] = i
+        for alias, iso3 in COUNTRY_NAME_TO_ISO3.items():
+            if iso3.lower() in self._ids:
+                self._ids.setdefault(alias, self._ids[iso3.lower()])
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+    def country_id(self, name: str) -> int:
+        """Dense id for a short name, full name or ISO3 code (-1 if unknown)."""
+        return self._ids.get(str(name).strip().lower(), -1)
+
+    def country_ids(self, names) -> np.ndarray:
+        """Vectorized country_id, resolved once per unique value."""
+        names = np.atleast_1d(np.asarray(names, dtype=object))
+        if names.size == 1:
+            return np.full(names.shape, self.country_id(names.flat[0]), dtype=np.int64)
+        inverse, uniques = pd.factorize(names.ravel())
+        # Trailing -1 so factorize's missing-value code (-1) maps to "unknown"
+        ids = np.array([self.country_id(u) for u in uniques] + [-1], dtype=np.int64)
+        return ids[inverse].reshape(names.shape)
+
+    def distance(self, origin: str, destination: str, mode: str) -> float:
+        """Distance in km, NaN if there is no route."""
+        o, d = self.country_id(origin), self.country_id(destination)
+        m = self.mode_ids.get(mode.strip().lower(), -1)
+        if o < 0 or d < 0 or m < 0:
+            return float("nan")
+        return float(self.distance_km[m, o, d])
+
+    # ── Persistence ─────────────────────────────────────────────────
+
+    def save(self, path: str = MATRIX_FILE) -> None:
+        np.savez(
+            path,
+            countries=np.array(self.countries), names=np.array(self.names),
+            distance_km=self.distance_km, modes=np.array(MODES),
+            detour_modes=np.array(list(self.detour_factors.keys())),
+            detour_values=np.array(list(self.detour_factors.values()), dtype=np.float64),
+            source_key=np.array(self.source_key),
+        )
+
+    @classmethod
+    def load(cls, path: str = MATRIX_FILE) -> "RouteMatrix":
+        data = np.load(path)
+        if tuple(data["modes"].tolist()) != MODES:
+            raise ValueError("Route matrix was built for different modes.")
+        return cls(
+            data["countries"].tolist(), data["names"].tolist(), data["distance_km"],
+            dict(zip(data["detour_modes"].tolist(), data["detour_values"].tolist())),
+            str(data["source_key"]),
+        )
+
+
+def source_key(ports_file: str = PORTS_FILE) -> str:
+    """Hash of everything the matrix is built from: coordinates, known lanes, default factors."""
+    from shipping_landed_cost import AIR_DISTANCE_KM, SEA_DISTANCE_KM
+
+    h = hashlib.sha256()
+    with open(ports_file, "rb") as f:
+        h.update(f.read())
+    for table in (AIR_DISTANCE_KM, SEA_DISTANCE_KM, DEFAULT_DETOUR_FACTOR):
+        h.update(repr(sorted(table.items())).encode())
+    h.update(repr(MODES).encode())
+    return h.hexdigest()
+
+
+def build_route_matrix(ports_file: str = PORTS_FILE) -> RouteMatrix:
+    """Compute all pairwise distances once from coordinates + known lanes."""
+    from shipping_landed_cost import AIR_DISTANCE_KM, SEA_DISTANCE_KM
+
+    ports = pd.read_csv(ports_file, dtype={"rail_region": str})
+    ports = ports[ports["iso3"].isin(ISO3_TO_NUMERIC)].reset_index(drop=True)
+    n = len(ports)
+    ids = {iso3: i for i, iso3 in enumerate(ports["iso3"])}
+
+    def coords(lat_col, lon_col):
+        lat = ports[lat_col].to_numpy(dtype=np.float64)
+        lon = ports[lon_col].to_numpy(dtype=np.float64)
+        return great_circle_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+    great_circle = {
+        "air": coords("airport_lat", "airport_lon"),
+        "sea": coords("port_lat", "port_lon"),
+        "rail": coords("port_lat", "port_lon"),
+    }
+    known = {"air": AIR_DISTANCE_KM, "sea": SEA_DISTANCE_KM, "rail": {}}
+
+    distance_km = np.full((len(MODES), n, n), np.nan)
+    detour_factors = {}
+
+    for m, mode in enumerate(MODES):
+        known_ids = [
+            (ids[COUNTRY_NAME_TO_ISO3[a]], ids[COUNTRY_NAME_TO_ISO3[b]], km)
+            for (a, b), km in known[mode].items()
+            if COUNTRY_NAME_TO_ISO3.get(a) in ids and COUNTRY_NAME_TO_ISO3.get(b) in ids
+        ]
+
+        # Calibrate the detour factor on known lanes (median known / great-circle)
+        if known_ids:
+            ratios = [km / great_circle[mode][i, j] for i, j, km in known_ids if great_circle[mode][i, j] > 0]
+            factor = float(np.median(ratios))
+        else:
+            factor = DEFAULT_DETOUR_FACTOR[mode]
+        detour_factors[mode] = round(factor, 4)
+
+        computed = np.round(great_circle[mode] * factor, -1)
+        if mode == "rail":
+            region = ports["rail_region"].fillna("").to_numpy()
+            connected = (region[:, None] == region[None, :]) & (region[:, None] != "")
+            computed = np.where(connected, computed, np.nan)
+        distance_km[m] = computed
+
+        for i, j, km in known_ids:
+            distance_km[m, i, j] = km
+            distance_km[m, j, i] = km
+
+        np.fill_diagonal(distance_km[m], np.nan)
+
+    return RouteMatrix(
+        ports["iso3"].tolist(), ports["name"].tolist(), distance_km,
+        detour_factors, source_key(ports_file),
+    )
+
+
+_MATRIX: RouteMatrix | None = None
+_MATRIX_LOCK = threading.Lock()
+
+
+def get_route_matrix() -> RouteMatrix:
+    """
+    Process-wide route matrix: loaded from MATRIX_FILE when it was built
+    from the current inputs (see source_key), otherwise built once and
+    persisted.
+    """
+    global _MATRIX
+    if _MATRIX is None:
+        with _MATRIX_LOCK:
+            if _MATRIX is None:
+                matrix = None
+                if os.path.exists(MATRIX_FILE):
+                    try:
+                        matrix = RouteMatrix.load(MATRIX_FILE)
+                    except (ValueError, KeyError):
+                        matrix = None
+                    if matrix is not None and matrix.source_key != source_key(PORTS_FILE):
+                        matrix = None
+                if matrix is None:
+                    matrix = build_route_matrix(PORTS_FILE)
+                    matrix.save(MATRIX_FILE)
+                _MATRIX = matrix
+    return _MATRIX
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Build Run
+# ═══════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    matrix = build_route_matrix(PORTS_FILE)
+    matrix.save(MATRIX_FILE)
+
+    print(f"✅ Route matrix for {len(matrix)} countries → {MATRIX_FILE}")
+    for m, mode in enumerate(MODES):
+        routes = int(np.isfinite(matrix.distance_km[m]).sum())
+        print(f"  {mode:<5} {routes:>5} routes  (detour factor {matrix.detour_factors[mode]})")
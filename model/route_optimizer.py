@@ -0,0 +1,260 @@
+"""
+TariffIQ — Multi-Leg Route Optimizer
+=====================================
+Cheapest k itineraries from an origin to a destination, direct or via
+up to two transshipment hubs, each leg on its cheapest mode.
+
+- Leg costs come from the route matrix: base charge and per-kg cost
+  tensors over (mode, from, to) are precomputed once, so a query is one
+  array expression for the weight plus a min over modes.
+- On this graph (≈40 countries) every itinerary with ≤ 2 hubs is
+  enumerated over (hub1, hub2) pairs precomputed per hub set. Landed cost
+  never falls as freight rises at a fixed tariff rate, so only each
+  rate's k cheapest freights are costed — exact k-shortest paths, no
+  priority queue needed.
+- The final entry is costed with the landed-cost kernel. Under
+  ``origin_rule="origin"`` the tariff follows the goods' origin (plain
+  transshipment); under ``"last_hub"`` goods substantially transformed in
+  the last hub take that country's rate (rules of origin).
+"""
+
+import numpy as np
+
+from route_matrix import MODES, get_route_matrix
+from scenario_matrix import get_scenario_matrix
+from shipping_landed_cost import (
+    DISTANCE_NORM_KM, SHIPPING_RATES, SUPPORTED_COUNTRIES, _normalize, _round_cents,
+    landed_cost_from_shipping, resolve_tariffs_bulk,
+)
+from wits_api import COUNTRY_NAME_TO_ISO3
+
+# ── Hubs & Fees ─────────────────────────────────────────────────────
+# Major transshipment hubs (ISO3); pass hubs=None to search every country
+DEFAULT_HUBS = ("ARE", "SGP", "NLD", "BEL", "MYS", "DEU", "ESP", "SAU", "EGY", "CHN", "USA")
+
+# Port / airport handling per transshipment stop (USD)
+HUB_HANDLING_FEE = 75.0
+
+MAX_HUBS = 2
+
+ORIGIN_RULES = ("origin", "last_hub")
+
+_edge_cache: dict = {}
+_pair_cache: dict = {}
+
+
+def _edge_tables():
+    """(matrix, base charge, cost per kg, distance_km) over (mode, from, to), built once."""
+    matrix = get_route_matrix()
+    cached = _edge_cache.get(id(matrix))
+    if cached is None:
+        distance = matrix.distance_km
+        factor = _round_cents(np.where(np.isnan(distance), 0.0, distance) / DISTANCE_NORM_KM)
+        base = np.array([SHIPPING_RATES[m]["base_charge"] for m in MODES], dtype=np.float64)
+        per_kg = np.array([SHIPPING_RATES[m]["per_kg_rate"] for m in MODES], dtype=np.float64)
+
+        no_route = np.isnan(distance)
+        base_t = np.where(no_route, np.inf, base[:, None, None])
+        per_kg_t = np.where(no_route, 0.0, per_kg[:, None, None] * factor)
+        cached = (matrix, base_t, per_kg_t, distance)
+        _edge_cache.clear()
+        _edge_cache[id(matrix)] = cached
+    return cached
+
+
+def _hub_pairs(matrix, hubs) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (hub ids, first-hub ids, second-hub ids) of every ordered pair of
+    distinct hubs, built once per hub set — a query only masks out its
+    own origin and destination instead of rebuilding the O(H²) grid.
+    """
+    key = (id(matrix), None if hubs is None else tuple(hubs))
+    cached = _pair_cache.get(key)
+    if cached is None:
+        hub_ids = np.arange(len(matrix)) if hubs is None else matrix.country_ids(list(hubs))
+        hub_ids = np.unique(hub_ids[hub_ids >= 0])
+        h1, h2 = np.meshgrid(hub_ids, hub_ids, indexing="ij")
+        keep = h1 != h2
+        cached = (hub_ids, h1[keep], h2[keep])
+        if len(_pair_cache) >= 64:
+            _pair_cache.clear()
+        _pair_cache[key] = cached
+    return cached
+
+
+def _freight_candidates(freight: np.ndarray, rate: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices that can still reach the k cheapest totals. For a fixed tariff
+    rate the landed cost never decreases with freight, so per distinct
+    rate only freights up to that rate's k-th cheapest (ties included)
+    can make the cut; the landed-cost kernel then runs on those alone.
+    """
+    if len(freight) <= k:
+        return np.arange(len(freight))
+    if rate.min() == rate.max():  # one tariff origin (origin_rule="origin")
+        return np.flatnonzero(freight <= np.partition(freight, k - 1)[k - 1])
+    order = np.lexsort((freight, rate))
+    r, f = rate[order], freight[order]
+    starts = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+    ends = np.r_[starts[1:], len(r)]
+    group = np.repeat(np.arange(len(starts)), ends - starts)
+    kth = f[np.minimum(starts + k - 1, ends - 1)]
+    return np.sort(order[f <= kth[group]])
+
+
+def leg_costs(weight_kg: float, modes: list[str] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cheapest leg cost (from, to) for a shipment weight and the mode id
+    achieving it. Unreachable pairs are +inf.
+    """
+    _, base, per_kg, _ = _edge_tables()
+    costs = base + weight_kg * per_kg
+    finite = np.isfinite(costs)
+    costs[finite] = _round_cents(costs[finite])
+    if modes is not None:
+        allowed = np.isin(np.array(MODES), [m.strip().lower() for m in modes])
+        costs = np.where(allowed[:, None, None], costs, np.inf)
+    best_mode = np.argmin(costs, axis=0)
+    return np.take_along_axis(costs, best_mode[None], axis=0)[0], best_mode
+
+
+def country_key(iso3: str) -> str:
+    """Key used for tariff lookups: the short name when supported, else the ISO3 code."""
+    for short in SUPPORTED_COUNTRIES:
+        if COUNTRY_NAME_TO_ISO3.get(short) == iso3:
+            return short
+    return iso3.lower()
+
+
+def find_itineraries(
+    origin: str,
+    destination: str,
+    weight_kg: float,
+    product_value: float,
+    tariff_rates: dict[str, float],
+    hs_code: str | None = None,
+    k: int = 5,
+    hubs: list[str] | None = DEFAULT_HUBS,
+    modes: list[str] | None = None,
+    max_hubs: int = MAX_HUBS,
+    origin_rule: str = "origin",
+) -> list[dict]:
+    """
+    Cheapest k itineraries by total landed cost. `tariff_rates` maps a
+    country (name or ISO3) to the destination's rate for goods of that
+    origin; itineraries whose tariff origin has no rate are skipped.
+    Pure array work — no network calls.
+    """
+    if origin_rule not in ORIGIN_RULES:
+        raise ValueError(f"origin_rule must be one of {ORIGIN_RULES}.")
+    matrix, _, _, distance = _edge_tables()
+    n = len(matrix)
+    o, d = matrix.country_id(origin), matrix.country_id(destination)
+    if o < 0 or d < 0:
+        raise ValueError(f"Unknown country in route {origin} → {destination}.")
+
+    legs, leg_mode = leg_costs(weight_kg, modes)
+    hub_ids, pair_1, pair_2 = _hub_pairs(matrix, hubs)
+    hub_ids = hub_ids[(hub_ids != o) & (hub_ids != d)]
+
+    rates = np.full(n, np.nan)
+    for country, rate in tariff_rates.items():
+        i = matrix.country_id(country)
+        if i >= 0 and rate is not None:
+            rates[i] = rate
+
+    # Candidate paths as (hub1, hub2) with -1 for "no hub": freight + tariff origin
+    h = hub_ids
+    paths, freight = [np.array([[-1, -1]])], [np.array([legs[o, d]])]
+    if max_hubs >= 1 and len(h):
+        paths.append(np.stack([h, np.full_like(h, -1)], axis=1))
+        freight.append(legs[o, h] + legs[h, d] + HUB_HANDLING_FEE)
+    if max_hubs >= 2 and len(h) > 1:
+        keep = (pair_1 != o) & (pair_1 != d) & (pair_2 != o) & (pair_2 != d)
+        h1, h2 = pair_1[keep], pair_2[keep]
+        paths.append(np.stack([h1, h2], axis=1))
+        freight.append(legs[o, h1] + legs[h1, h2] + legs[h2, d] + 2 * HUB_HANDLING_FEE)
+    paths, freight = np.concatenate(paths), np.concatenate(freight)
+
+    last = np.where(paths[:, 1] >= 0, paths[:, 1], paths[:, 0])
+    tariff_origin = np.where((origin_rule == "last_hub") & (last >= 0), last, o)
+    rate = rates[tariff_origin]
+
+    ok = np.flatnonzero(np.isfinite(freight) & ~np.isnan(rate))
+    if not len(ok):
+        return []
+    freight = _round_cents(freight[ok])
+    keep = _freight_candidates(freight, rate[ok], k)
+    ok, freight = ok[keep], freight[keep]
+    paths, tariff_origin, rate = paths[ok], tariff_origin[ok], rate[ok]
+
+    costs = landed_cost_from_shipping(
+        freight, product_value, rate, destinations=[destination], hs_codes=[hs_code],
+    )
+    totals = costs["total_landed_cost"]
+    # Candidates are few after the freight cut: a stable sort keeps ties in path order
+    top = np.argsort(totals, kind="stable")[:k]
+
+    itineraries = []
+    for c in top.tolist():
+        stops = [o] + [x for x in paths[c].tolist() if x >= 0] + [d]
+        route_legs = [
+            {
+                "from": matrix.names[a],
+                "to": matrix.names[b],
+                "mode": MODES[leg_mode[a, b]],
+                "distance_km": int(distance[leg_mode[a, b], a, b]),
+                "shipping_cost": float(legs[a, b]),
+            }
+            for a, b in zip(stops[:-1], stops[1:])
+        ]
+        itineraries.append({
+            "path": [matrix.names[s] for s in stops],
+            "legs": route_legs,
+            "hub_fees": HUB_HANDLING_FEE * (len(stops) - 2),
+            "tariff_origin": matrix.names[tariff_origin[c]],
+            "tariff_rate": float(rate[c]),
+            "weight_kg": weight_kg,
+            "product_value": product_value,
+            **{field: float(values[c]) for field, values in costs.items()},
+        })
+    return itineraries
+
+
+def optimize_routes(
+    hs_code: str,
+    origin: str,
+    destination: str,
+    weight_kg: float,
+    product_value: float,
+    k: int = 5,
+    hubs: list[str] | None = DEFAULT_HUBS,
+    modes: list[str] | None = None,
+    max_hubs: int = MAX_HUBS,
+    origin_rule: str = "origin",
+    year: int = 2021,
+) -> list[dict]:
+    """
+    find_itineraries with the origin's tariff resolved through the
+    scenario-matrix cache. For "last_hub" the hubs' rates are resolved
+    directly (once per hub, concurrently) and not merged into that
+    destination-scoped cache, which would otherwise grow every hub into
+    the origin set that origin comparisons rank.
+    """
+    scenarios = get_scenario_matrix(hs_code, destination, origins=[origin], year=year)
+    rates = {o: float(r) for o, r in zip(scenarios.origins, scenarios.rates) if not np.isnan(r)}
+
+    if origin_rule == "last_hub":
+        matrix = get_route_matrix()
+        hub_ids = range(len(matrix)) if hubs is None else matrix.country_ids(list(hubs)).tolist()
+        hub_countries = {country_key(matrix.countries[i]) for i in hub_ids if i >= 0}
+        hub_countries -= {_normalize(origin), _normalize(destination)}
+        resolved = resolve_tariffs_bulk(
+            [(c, destination, hs_code) for c in sorted(hub_countries)], year=year, catch_errors=True,
+        )
+        rates.update({o: t["ahs_rate"] for (o, _, _), t in resolved.items() if t["ahs_rate"] is not None})
+
+    return find_itineraries(
+        origin, destination, weight_kg, product_value, rates, hs_code=hs_code,
+        k=k, hubs=hubs, modes=modes, max_hubs=max_hubs, origin_rule=origin_rule,
+    )
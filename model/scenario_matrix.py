@@ -0,0 +1,307 @@
+"""
+TariffIQ — Scenario Matrix
+===========================
+Landed cost for every origin × mode into one destination, for one HS code.
+
+- Tariffs are resolved once per origin (live WITS, cross-country store
+  fallback) and cached per (hs_code, destination, year).
+- For a given weight and value, the full origins × modes tensor is costed
+  in a single vectorized pass; "cheapest origin", "cheapest mode" and
+  "top-N alternatives" are then argmin / argsort over that tensor.
+- Cached matrices are dropped when the tariff store or cube is reloaded
+  (see ``tariff_data_version``) or after ``SCENARIO_TTL_SECONDS``.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from cross_country_store import store_version
+from tariff_cube import cube_version
+from shipping_landed_cost import (
+    MODES, ORIGIN_DEADLINE_S, SUPPORTED_COUNTRIES, _MODE_CHOICES, _enrich_with_tariff,
+    _normalize, calculate_landed_cost_batch, landed_cost_row, no_route_message, resolve_tariffs_async,
+    resolve_tariffs_bulk, route_supported_mask,
+)
+
+# ── Cache Settings ──────────────────────────────────────────────────
+SCENARIO_CACHE_SIZE = 512
+SCENARIO_TTL_SECONDS = int(os.getenv("TARIFFIQ_SCENARIO_TTL_S", "3600"))
+
+_COST_FIELDS = (
+    "distance_km", "distance_factor", "shipping_cost", "insurance_cost",
+    "cif_value", "import_duty", "import_vat", "gst_cost", "cess_cost",
+    "excise_cost", "handling_fees", "doc_fees", "total_landed_cost",
+)
+
+
+def tariff_data_version() -> tuple[int, int]:
+    """Changes whenever the cross-country store or tariff cube is reloaded."""
+    return store_version(), cube_version()
+
+
+class ScenarioMatrix:
+    """
+    Resolved tariffs for one (hs_code, destination, year) across origins.
+    tariffs[i] is the resolve_tariff_live dict for origins[i]; rates[i] is
+    its AHS rate (NaN if unresolved); routable[i, m] marks origins with a
+    route to the destination for MODES[m].
+    """
+
+    def __init__(self, hs_code: str, destination: str, origins: list[str],
+                 tariffs: list[dict], year: int, version: tuple[int, int]):
+        self.hs_code = hs_code
+        self.destination = destination
+        self.origins = list(origins)
+        self.tariffs = list(tariffs)
+        self.year = year
+        self.version = version
+        self.created_at = time.time()
+
+        self.rates = np.array(
+            [np.nan if t["ahs_rate"] is None else t["ahs_rate"] for t in self.tariffs],
+            dtype=np.float64,
+        )
+        origin_col = np.array(self.origins, dtype=object)[:, None]
+        self.routable = route_supported_mask(origin_col, destination, np.array(MODES, dtype=object)[None, :])
+        self.priced = self.routable & ~np.isnan(self.rates)[:, None]
+        self._origin_ids = {o: i for i, o in enumerate(self.origins)}
+
+    def __contains__(self, origin: str) -> bool:
+        return _normalize(origin) in self._origin_ids
+
+    def origin_status(self, origins: list[str] | None = None) -> dict[str, list[str]]:
+        """
+        Split origins by tariff provenance: live (WITS), estimated (local
+        store rate, including lookups that missed their deadline) and
+        missing (no rate at all). timed_out lists deadline misses.
+        """
+        status = {"live": [], "estimated": [], "missing": [], "timed_out": []}
+        for origin in (self.origins if origins is None else [_normalize(o) for o in origins]):
+            i = self._origin_ids.get(origin)
+            tariff = self.tariffs[i] if i is not None else None
+            if tariff is None or tariff["ahs_rate"] is None:
+                status["missing"].append(origin)
+            elif tariff.get("is_live"):
+                status["live"].append(origin)
+            else:
+                status["estimated"].append(origin)
+            if tariff is not None and tariff.get("timed_out"):
+                status["timed_out"].append(origin)
+        return status
+
+    def is_fresh(self, version: tuple[int, int]) -> bool:
+        return self.version == version and time.time() - self.created_at < SCENARIO_TTL_SECONDS
+
+    # ── Tensor ──────────────────────────────────────────────────────
+
+    def costs(self, weight_kg: float, product_value: float) -> dict[str, np.ndarray]:
+        """
+        Every cost column as an (origins, modes) array in one vectorized
+        pass; cells without a route or tariff are NaN.
+        """
+        shape = self.priced.shape
+        oi, mi = np.nonzero(self.priced)
+        out = {field: np.full(shape, np.nan) for field in _COST_FIELDS}
+        if len(oi):
+            origins = np.array(self.origins, dtype=object)[oi]
+            modes = np.array(MODES, dtype=object)[mi]
+            batch = calculate_landed_cost_batch(
+                origins, self.destination, modes, weight_kg, product_value, self.rates[oi],
+                hs_codes=self.hs_code,
+            )
+            for field in _COST_FIELDS:
+                out[field][oi, mi] = batch[field]
+        return out
+
+    def scenario(self, costs: dict, origin: str, mode: str,
+                 weight_kg: float, product_value: float) -> dict | None:
+        """
+        Result dict (as calculate_landed_cost_live) for one cell, or None if
+        the origin has no resolved tariff. Raises ValueError, like the
+        scalar path, for an unknown mode or a missing route.
+        """
+        mode = mode.strip().lower()
+        if mode not in MODES:
+            raise ValueError(f"Invalid mode '{mode}'. Choose {_MODE_CHOICES}.")
+        i = self._origin_ids.get(_normalize(origin))
+        m = MODES.index(mode)
+        if i is None:
+            return None
+        if not self.routable[i, m]:
+            raise ValueError(no_route_message(mode, origin, self.destination))
+        if not self.priced[i, m]:
+            return None
+        cell = {field: costs[field][i:i + 1, m] for field in _COST_FIELDS}
+        result = landed_cost_row(
+            cell, 0, self.origins[i], self.destination, mode,
+            weight_kg, product_value, float(self.rates[i]),
+        )
+        return _enrich_with_tariff(result, self.tariffs[i])
+
+    # ── Queries ─────────────────────────────────────────────────────
+
+    def rank(self, weight_kg: float, product_value: float, modes: list[str] | None = None,
+             exclude_origins: list[str] = (), top_n: int | None = None) -> list[dict]:
+        """
+        Priced (origin, mode) scenarios sorted by total landed cost,
+        optionally restricted to `modes` and without `exclude_origins`.
+        """
+        costs = self.costs(weight_kg, product_value)
+        totals = costs["total_landed_cost"].copy()
+
+        if modes is not None:
+            keep_modes = np.isin(np.array(MODES), [m.strip().lower() for m in modes])
+            totals[:, ~keep_modes] = np.nan
+        for origin in exclude_origins:
+            i = self._origin_ids.get(_normalize(origin))
+            if i is not None:
+                totals[i, :] = np.nan
+
+        flat = totals.ravel()
+        order = np.argsort(flat, kind="stable")
+        order = order[~np.isnan(flat[order])]
+        if top_n is not None:
+            order = order[:top_n]
+
+        n_modes = len(MODES)
+        return [
+            self.scenario(costs, self.origins[k // n_modes], MODES[k % n_modes], weight_kg, product_value)
+            for k in order.tolist()
+        ]
+
+    def cheapest_origin(self, weight_kg: float, product_value: float, mode: str | None = None) -> dict | None:
+        """Cheapest origin for one mode (or across all modes)."""
+        best = self.rank(weight_kg, product_value, modes=None if mode is None else [mode], top_n=1)
+        return best[0] if best else None
+
+    def cheapest_mode(self, origin: str, weight_kg: float, product_value: float,
+                      exclude_modes: list[str] = ()) -> dict | None:
+        """Cheapest mode for one origin, optionally skipping `exclude_modes`."""
+        others = [o for o in self.origins if o != _normalize(origin)]
+        modes = [m for m in MODES if m not in {x.strip().lower() for x in exclude_modes}]
+        best = self.rank(weight_kg, product_value, modes=modes, exclude_origins=others, top_n=1)
+        return best[0] if best else None
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Cache
+# ═══════════════════════════════════════════════════════════════════
+
+_MATRICES: OrderedDict[tuple[str, str, int], ScenarioMatrix] = OrderedDict()
+_MATRICES_LOCK = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def default_origins(destination: str) -> list[str]:
+    """Every supported country except the destination."""
+    return [c for c in SUPPORTED_COUNTRIES if c != _normalize(destination)]
+
+
+def wanted_origins(destination: str, origins: list[str] | None) -> list[str]:
+    """Normalized, de-duplicated origins without the destination (default set if None)."""
+    if origins is None:
+        return default_origins(destination)
+    return [o for o in dict.fromkeys(_normalize(o) for o in origins) if o != destination]
+
+
+def _cached_matrix(key, wanted: list[str]) -> tuple[ScenarioMatrix | None, list[str]]:
+    """(fresh cached matrix or None, origins still to resolve)."""
+    version = tariff_data_version()
+    with _MATRICES_LOCK:
+        cached = _MATRICES.get(key)
+        if cached is not None and not cached.is_fresh(version):
+            del _MATRICES[key]
+            _stats["invalidations"] += 1
+            cached = None
+        if cached is None:
+            _stats["misses"] += 1
+            return None, wanted
+        _MATRICES.move_to_end(key)
+        missing = [o for o in wanted if o not in cached]
+        _stats["misses" if missing else "hits"] += 1
+        return cached, missing
+
+
+def _merge_matrix(key, cached: ScenarioMatrix | None, missing: list[str],
+                  resolved: dict, remember: bool = True) -> ScenarioMatrix:
+    """Build the merged matrix for `key` and cache it if `remember`."""
+    hs_code, destination, year = key
+    new_origins = list(missing)
+    new_tariffs = [resolved[(o, destination, hs_code)] for o in missing]
+    if cached is not None:
+        new_origins = cached.origins + new_origins
+        new_tariffs = cached.tariffs + new_tariffs
+
+    # Read after resolving: resolution may load the store / cube for the first time
+    matrix = ScenarioMatrix(hs_code, destination, new_origins, new_tariffs, year, tariff_data_version())
+    if cached is not None:
+        matrix.created_at = cached.created_at  # merged rates keep the original TTL
+
+    # Don't pin a matrix where nothing resolved (e.g. WITS down, no local data)
+    if remember and not np.isnan(matrix.rates).all():
+        with _MATRICES_LOCK:
+            _MATRICES[key] = matrix
+            _MATRICES.move_to_end(key)
+            while len(_MATRICES) > SCENARIO_CACHE_SIZE:
+                _MATRICES.popitem(last=False)
+    return matrix
+
+
+def get_scenario_matrix(
+    hs_code: str,
+    destination: str,
+    origins: list[str] | None = None,
+    year: int = 2021,
+) -> ScenarioMatrix:
+    """
+    Cached ScenarioMatrix for (hs_code, destination, year). Origins not yet
+    in the cached matrix are resolved and merged in; the default origin set
+    is every supported country except the destination.
+    """
+    destination = _normalize(destination)
+    key = (str(hs_code).strip(), destination, year)
+    cached, missing = _cached_matrix(key, wanted_origins(destination, origins))
+    if not missing:
+        return cached
+
+    resolved = resolve_tariffs_bulk([(o, destination, key[0]) for o in missing], year=year)
+    return _merge_matrix(key, cached, missing, resolved)
+
+
+async def get_scenario_matrix_async(
+    hs_code: str,
+    destination: str,
+    origins: list[str] | None = None,
+    year: int = 2021,
+    deadline_s: float = ORIGIN_DEADLINE_S,
+) -> ScenarioMatrix:
+    """
+    get_scenario_matrix with a per-origin deadline on live lookups. Origins
+    that time out are costed on their local store rate (or left missing);
+    such partial matrices are returned but not cached.
+    """
+    destination = _normalize(destination)
+    key = (str(hs_code).strip(), destination, year)
+    cached, missing = _cached_matrix(key, wanted_origins(destination, origins))
+    if not missing:
+        return cached
+
+    resolved = await resolve_tariffs_async(
+        [(o, destination, key[0]) for o in missing], year=year, deadline_s=deadline_s,
+    )
+    complete = not any(t["timed_out"] for t in resolved.values())
+    return _merge_matrix(key, cached, missing, resolved, remember=complete)
+
+
+def clear_scenario_cache() -> None:
+    with _MATRICES_LOCK:
+        _MATRICES.clear()
+
+
+def scenario_cache_stats() -> dict:
+    with _MATRICES_LOCK:
+        return {"entries": len(_MATRICES), "max_entries": SCENARIO_CACHE_SIZE, **_stats}
@@ -12,14 +12,31 @@ from contextlib import asynccontextmanager
 # Fix for "RuntimeError: Already borrowed" in some environments (especially Mac/uvicorn)
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Global lock for thread-safe model access
 model_lock = threading.Lock()
 
+# MegaLLM reranks of batch classifications run concurrently
+RERANK_WORKERS = int(os.getenv("TARIFFIQ_RERANK_WORKERS", "4"))
+RERANK_EXECUTOR = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+
+
+class _LockedModel:
+    """SentenceTransformer proxy whose encode() holds model_lock (for helpers that embed off-thread)."""
+
+    def __init__(self, model):
+        self._model = model
+
+    def encode(self, *args, **kwargs):
+        with model_lock:
+            return self._model.encode(*args, **kwargs)
+
+
 # ── Ensure model/ is importable ──────────────────────────────────
 MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
 if MODEL_DIR not in sys.path:
@@ -45,10 +62,21 @@ async def lifespan(app: FastAPI):
     print("⏳ Loading FAISS index and SentenceTransformer model...")
     faiss_index, codes_df = load_index()
     sentence_model = SentenceTransformer(MODEL_NAME)
+
+    from tax_schedule import get_tax_schedule
+    get_tax_schedule()
+    print("🧾 Compiled destination tax schedules.")
+
+    from news_ingest import get_news_ingestor
+    ingestor = get_news_ingestor()
+    if os.getenv("THENEWSAPI_API_KEY") and os.getenv("TARIFFIQ_NEWS_INGEST", "1") != "0":
+        ingestor.start()
+        print(f"📰 News ingestion running every {ingestor.interval_s:.0f}s.")
     print("✅ Models loaded. Server ready.")
 
     yield  # app runs here
 
+    ingestor.stop()
     print("Server shutting down.")
 
 
@@ -86,9 +114,106 @@ class LandedCostRequest(BaseModel):
     hs_code: str | None = Field(None, description="Optional — if empty, auto-classifies first")
 
 
+class CompareOriginsRequest(BaseModel):
+    hs_code: str = Field(..., examples=["610910"])
+    destination: str = Field(..., examples=["USA"])
+    mode: str = Field("sea", examples=["sea", "air", "rail"])
+    weight_kg: float = Field(100.0, gt=0)
+    product_value: float = Field(10000.0, gt=0)
+    origins: list[str] | None = Field(None, description="Defaults to every supported country")
+    deadline_s: float = Field(8.0, gt=0, le=60, description="Per-origin live lookup deadline")
+
+
+class SolveRequest(BaseModel):
+    hs_code: str = Field(..., examples=["610910"])
+    origin: str = Field(..., examples=["China"])
+    destination: str = Field(..., examples=["USA"])
+    mode: str = Field("sea", examples=["sea", "air", "rail"])
+    weight_kg: float = Field(100.0, gt=0)
+    product_value: float = Field(10000.0, gt=0)
+    origins: list[str] | None = Field(None, description="Alternative origins (default: every supported country)")
+
+
+class RouteOptimizeRequest(BaseModel):
+    hs_code: str = Field(..., examples=["610910"])
+    origin: str = Field(..., examples=["China"])
+    destination: str = Field(..., examples=["USA"])
+    weight_kg: float = Field(100.0, gt=0)
+    product_value: float = Field(10000.0, gt=0)
+    k: int = Field(5, ge=1, le=50)
+    hubs: list[str] | None = Field(None, description="Transshipment hubs (default: major hubs)")
+    all_hubs: bool = Field(False, description="Search every country in the route graph as a hub (ignores hubs)")
+    modes: list[str] | None = Field(None, examples=[["sea", "rail"]])
+    max_hubs: int = Field(2, ge=0, le=2)
+    origin_rule: str = Field("origin", examples=["origin", "last_hub"])
+
+
+class PortfolioSku(BaseModel):
+    sku_id: str | None = None
+    hs_code: str = Field(..., examples=["610910"])
+    destination: str = Field(..., examples=["USA"])
+    annual_units: float = Field(..., gt=0)
+    unit_weight_kg: float = Field(..., gt=0)
+    unit_value: float = Field(..., gt=0)
+    mode: str = Field("sea", examples=["sea", "air", "rail"])
+    shipments_per_year: int = Field(12, ge=1)
+
+
+class PortfolioRequest(BaseModel):
+    skus: list[PortfolioSku] = Field(..., min_length=1, max_length=20000)
+    origins: list[str] | None = Field(None, description="Defaults to every supported country")
+    capacity: dict[str, float] | None = Field(None, description="Max units / year per origin")
+    moq: float | dict[str, float] | None = Field(None, description="Min units per SKU from an origin used")
+    max_sku_share: float | None = Field(None, gt=0, le=1)
+    max_origin_share: float | None = Field(None, gt=0, le=1, description="Max share of portfolio value per origin")
+    live: bool = Field(False, description="Resolve tariffs live via WITS instead of the local store")
+    solver: str = Field("auto", examples=["auto", "highs", "greedy"])
+
+
+class ShockSweepLine(BaseModel):
+    line_id: str | None = None
+    hs_code: str = Field(..., examples=["610910"])
+    destination: str = Field(..., examples=["USA"])
+    mode: str = Field("sea", examples=["sea", "air", "rail"])
+    weight_kg: float = Field(100.0, gt=0)
+    product_value: float = Field(10000.0, gt=0)
+
+
+class ShockSweepRequest(BaseModel):
+    lines: list[ShockSweepLine] = Field(..., min_length=1, max_length=20000)
+    origin: str = Field(..., examples=["China"], description="Current sourcing origin")
+    origins: list[str] | None = Field(None, description="Alternatives (default: every supported country)")
+    delta_min: float = Field(-10.0, ge=-100)
+    delta_max: float = Field(100.0, le=1000)
+    delta_step: float = Field(5.0, gt=0)
+    deltas: list[float] | None = Field(None, description="Explicit delta grid (overrides min / max / step)")
+    shocked_origins: list[str] | None = Field(None, description="Origins the delta hits (default: origin)")
+    policy: dict | None = Field(None, description="extracted_policy from /api/news to target by HS / country")
+    live: bool = Field(False, description="Resolve baselines live via WITS instead of the local store")
+    include_lines: bool = Field(False, description="Per-line break-even deltas")
+
+
+class LandedCostLine(BaseModel):
+    line_id: str | None = None
+    product_description: str = Field("", description="Used to classify lines without an hs_code")
+    origin: str = Field(..., examples=["China"])
+    destination: str = Field(..., examples=["USA"])
+    mode: str = Field("sea", examples=["sea", "air", "rail"])
+    weight_kg: float = Field(100.0, gt=0)
+    product_value: float = Field(10000.0, gt=0)
+    hs_code: str | None = None
+
+
+class BatchLandedCostRequest(BaseModel):
+    lines: list[LandedCostLine] = Field(..., min_length=1, max_length=5000)
+    rerank_with_llm: bool = Field(False, description="LLM-rerank each unique description (slower)")
+
+
 class ComplianceRequest(BaseModel):
     destination: str
     product_description: str
+    hs_code: str | None = Field(None, description="Optional — keys the cached checklist by HS code")
+    refresh: bool = Field(False, description="Ignore the stored checklist and re-run the search")
 
 class VendorRequest(BaseModel):
     product: str
@@ -101,7 +226,20 @@ class VendorRequest(BaseModel):
 
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "models_loaded": faiss_index is not None}
+    from scenario_matrix import scenario_cache_stats
+    from news_store import get_news_store
+    from compliance_store import get_compliance_store
+    from compliance_kb import get_compliance_kb
+    from cross_country_store import cross_country_store_stats
+    return {
+        "status": "ok",
+        "models_loaded": faiss_index is not None,
+        "cross_country_store": cross_country_store_stats(),
+        "scenario_cache": scenario_cache_stats(),
+        "news_store": get_news_store().stats(),
+        "compliance_store": get_compliance_store().stats(),
+        "compliance_kb": get_compliance_kb().stats(),
+    }
 
 
 @app.post("/api/classify")
@@ -159,7 +297,7 @@ def landed_cost(req: LandedCostRequest):
     If hs_code is not provided, auto-classifies first.
     """
     from HS_code_search import search, rerank_with_llm
-    from shipping_landed_cost import calculate_landed_cost_live, compare_origins_live
+    from scenario_matrix import default_origins, get_scenario_matrix
 
     hs_code = req.hs_code
     classification = None
@@ -195,16 +333,11 @@ def landed_cost(req: LandedCostRequest):
     if not hs_code:
         raise HTTPException(status_code=400, detail="Could not determine HS code.")
 
-    # Calculate landed cost
+    # Landed cost for every origin × mode into the destination (cached per HS code)
     try:
-        result = calculate_landed_cost_live(
-            origin=req.origin,
-            destination=req.destination,
-            mode=req.mode,
-            weight_kg=req.weight_kg,
-            product_value=req.product_value,
-            hs_code=hs_code,
-        )
+        matrix = get_scenario_matrix(hs_code, req.destination, origins=default_origins(req.destination) + [req.origin])
+        costs = matrix.costs(req.weight_kg, req.product_value)
+        result = matrix.scenario(costs, req.origin, req.mode, req.weight_kg, req.product_value)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Landed cost calculation failed: {e}")
 
@@ -214,41 +347,21 @@ def landed_cost(req: LandedCostRequest):
             detail=f"No tariff data found for HS {hs_code} on route {req.origin} → {req.destination}."
         )
 
-    # Calculate scenarios automatically for route optimization
-    scenarios = []
+    # Scenarios for route optimization: cheapest other mode on this route,
+    # then the top 4 other origins for the requested mode
     try:
-        scenarios = compare_origins_live(
-            hs_code=hs_code,
-            my_country=req.destination,
-            mode=req.mode,
-            weight_kg=req.weight_kg,
-            product_value=req.product_value,
-        )
-        
-        # Add alternative mode for current route
-        alt_mode = "air" if req.mode.lower() == "sea" else "sea"
-        alt_mode_result = calculate_landed_cost_live(
-            origin=req.origin,
-            destination=req.destination,
-            mode=alt_mode,
-            weight_kg=req.weight_kg,
-            product_value=req.product_value,
-            hs_code=hs_code,
-        )
-        
         combined_scenarios = [result]
+
+        alt_mode_result = matrix.cheapest_mode(
+            req.origin, req.weight_kg, req.product_value, exclude_modes=[req.mode],
+        )
         if alt_mode_result:
             combined_scenarios.append(alt_mode_result)
-            
-        # Add top 4 alternative scenarios
-        added_count = 0
-        for s in scenarios:
-            s_origin = s["route"].split(" → ")[0].lower().strip()
-            if s_origin != req.origin.lower().strip():
-                combined_scenarios.append(s)
-                added_count += 1
-                if added_count >= 4:
-                    break
+
+        combined_scenarios += matrix.rank(
+            req.weight_kg, req.product_value, modes=[req.mode],
+            exclude_origins=[req.origin], top_n=4,
+        )
 
     except Exception as e:
         print(f"Scenario generation failed: {e}")
@@ -262,15 +375,230 @@ def landed_cost(req: LandedCostRequest):
     }
 
 
+@app.post("/api/compare-origins")
+async def compare_origins_endpoint(req: CompareOriginsRequest):
+    """
+    Landed cost from every origin into one destination. Live lookups share
+    one executor and a global WITS budget; origins that miss the deadline
+    come back as estimated (local rate) or missing instead of blocking.
+    """
+    from shipping_landed_cost import compare_origins_live_async
+
+    try:
+        return await compare_origins_live_async(
+            hs_code=req.hs_code,
+            my_country=req.destination,
+            mode=req.mode,
+            weight_kg=req.weight_kg,
+            product_value=req.product_value,
+            origins=req.origins,
+            deadline_s=req.deadline_s,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/landed-cost/solve")
+def landed_cost_solve(req: SolveRequest):
+    """
+    Sensitivities (∂cost/∂weight, ∂value, ∂tariff), air/sea/rail break-even
+    weights and break-even tariffs against every alternative origin — one
+    tariff resolution instead of repeated /api/landed-cost calls.
+    """
+    from landed_cost_solver import solve
+
+    try:
+        return solve(
+            hs_code=req.hs_code,
+            origin=req.origin,
+            destination=req.destination,
+            mode=req.mode,
+            weight_kg=req.weight_kg,
+            product_value=req.product_value,
+            origins=req.origins,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/api/routes/optimize")
+def routes_optimize(req: RouteOptimizeRequest):
+    """
+    Cheapest k itineraries — direct or via up to two transshipment hubs,
+    each leg on its cheapest allowed mode — ranked by total landed cost.
+    all_hubs=True searches the full route graph instead of the hub list.
+    """
+    from route_optimizer import DEFAULT_HUBS, optimize_routes
+
+    try:
+        itineraries = optimize_routes(
+            hs_code=req.hs_code,
+            origin=req.origin,
+            destination=req.destination,
+            weight_kg=req.weight_kg,
+            product_value=req.product_value,
+            k=req.k,
+            hubs=None if req.all_hubs else (req.hubs or DEFAULT_HUBS),
+            modes=req.modes,
+            max_hubs=req.max_hubs,
+            origin_rule=req.origin_rule,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not itineraries:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No tariff data or route found for HS {req.hs_code} on {req.origin} → {req.destination}.",
+        )
+    return {"hs_code": req.hs_code, "itineraries": itineraries}
+
+
+@app.post("/api/portfolio/optimize")
+def portfolio_optimize(req: PortfolioRequest):
+    """
+    Split annual volume for many SKUs across origins at minimum total
+    landed cost, under capacity caps, MOQs and diversification limits.
+    """
+    from portfolio_optimizer import optimize_portfolio
+
+    try:
+        return optimize_portfolio(
+            [sku.model_dump() for sku in req.skus],
+            origins=req.origins,
+            capacity=req.capacity,
+            moq=req.moq,
+            max_sku_share=req.max_sku_share,
+            max_origin_share=req.max_origin_share,
+            live=req.live,
+            solver=req.solver,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/policy-shock/sweep")
+def policy_shock_sweep(req: ShockSweepRequest):
+    """
+    Sweep a tariff delta grid over a portfolio and every alternative
+    origin in one vectorized pass: cost curves, the cheapest origin at
+    each delta and the break-even deltas where switching becomes optimal.
+    """
+    from shock_sweep import delta_grid, sweep_shock
+
+    try:
+        return sweep_shock(
+            [line.model_dump() for line in req.lines],
+            origin=req.origin,
+            deltas=req.deltas if req.deltas else delta_grid(req.delta_min, req.delta_max, req.delta_step),
+            origins=req.origins,
+            shocked_origins=req.shocked_origins,
+            policy=req.policy,
+            live=req.live,
+            include_lines=req.include_lines,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/landed-cost/batch")
+def landed_cost_batch(req: BatchLandedCostRequest):
+    """
+    Price a whole purchase order or SKU catalogue in one call.
+    Classification runs once per unique description, tariff resolution
+    once per unique (origin, destination, hs_code), and landed cost in
+    a single vectorized pass.
+    """
+    from HS_code_search import search_batch, rerank_with_llm
+    from shipping_landed_cost import price_line_items
+
+    lines = [line.model_dump() for line in req.lines]
+    for i, line in enumerate(lines):
+        if line["line_id"] is None:
+            line["line_id"] = str(i)
+
+    # Bulk-classify lines missing HS codes (one embedding pass per unique description)
+    to_classify = list(dict.fromkeys(
+        line["product_description"].strip()
+        for line in lines
+        if not line["hs_code"] and line["product_description"].strip()
+    ))
+    classified = {}
+    if to_classify:
+        if faiss_index is None or codes_df is None or sentence_model is None:
+            raise HTTPException(status_code=503, detail="Models not loaded yet.")
+
+        with model_lock:
+            all_candidates = search_batch(
+                queries=to_classify,
+                index=faiss_index,
+                codes_df=codes_df,
+                model=sentence_model,
+                top_k=6,
+            )
+
+        def classify_one(desc, candidates):
+            hs_code = str(candidates[0]["hs_code"])
+            if req.rerank_with_llm:
+                try:
+                    reranked = rerank_with_llm(desc, candidates)
+                    if reranked and reranked.get("primary_hs"):
+                        hs_code = str(reranked["primary_hs"])
+                except Exception as e:
+                    print(f"LLM reranking failed: {e}")
+            return hs_code
+
+        found = [(desc, c) for desc, c in zip(to_classify, all_candidates) if c]
+        classified = dict(zip(
+            [desc for desc, _ in found],
+            RERANK_EXECUTOR.map(lambda item: classify_one(*item), found),
+        ))
+
+    priceable = []
+    for line in lines:
+        if not line["hs_code"]:
+            line["hs_code"] = classified.get(line["product_description"].strip())
+            line["auto_classified"] = line["hs_code"] is not None
+        if line["hs_code"]:
+            priceable.append(line)
+
+    try:
+        priced = price_line_items(priceable)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch landed cost calculation failed: {e}")
+
+    # Back into input order, unclassified lines at their own index
+    entries = iter(priced["lines"])
+    ordered = []
+    for line in lines:
+        if line["hs_code"]:
+            entry = next(entries)
+            entry["auto_classified"] = bool(line.get("auto_classified"))
+        else:
+            entry = {"line_id": line["line_id"], "hs_code": None, "error": "Could not determine HS code."}
+            priced["totals"]["lines_failed"] += 1
+        ordered.append(entry)
+    priced["lines"] = ordered
+
+    priced["unique_classifications"] = len(classified)
+    return priced
+
+
 @app.post("/api/compliance")
 def compliance_check(req: ComplianceRequest):
     """
-    Run the AI compliance agent.
+    Run the AI compliance agent. Checklists are served from the
+    compliance store when the same destination + HS code / product was
+    checked within the TTL, then from the offline knowledge base of the
+    HS heading / chapter; the web is searched only on a miss.
     """
     from compliance_agent import run_compliance_check
     
     try:
-        result = run_compliance_check(req.destination, req.product_description)
+        result = run_compliance_check(
+            req.destination, req.product_description,
+            hs_code=req.hs_code, use_store=not req.refresh,
+            model=_LockedModel(sentence_model) if sentence_model is not None else None,
+        )
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -284,26 +612,46 @@ def compliance_check(req: ComplianceRequest):
 @app.post("/api/vendors")
 def find_vendors(req: VendorRequest):
     """
-    Run the AI vendor discovery pipeline.
+    Run the AI vendor discovery pipeline (evidence ranked with the
+    loaded sentence model, when there is one).
     """
     from vendor_finder import run_pipeline
-    vendors = run_pipeline(req.product, req.country)
+    vendors = run_pipeline(
+        req.product, req.country,
+        model=_LockedModel(sentence_model) if sentence_model is not None else None,
+    )
     return {"vendors": vendors}
 
 
 @app.get("/api/news")
-def get_news():
+def get_news(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    risk_level: str | None = Query(None, examples=["high"]),
+    country: str | None = Query(None, examples=["china"]),
+    hs_chapter: str | None = Query(None, examples=["72"]),
+):
     """
-    Fetch live tariff news and analyze them using the Policy Shock Engine.
+    Analysed tariff news from the news store, newest first. Articles are
+    fetched and analysed by the background ingestor, so this is a read:
+    paginate with page / page_size, filter by risk level, affected
+    country and HS chapter.
     """
-    from policy_shock_engine import run_policy_shock_from_live_news
-    try:
-        results = run_policy_shock_from_live_news(max_articles=3)
-        return {"news": results}
-    except Exception as e:
-        print(f"Error fetching news: {e}")
-        # Return empty list so frontend can fallback to static samples
-        return {"news": []}
+    from news_store import get_news_store
+    from news_ingest import get_news_ingestor
+
+    total, items = get_news_store().query(
+        limit=page_size, offset=(page - 1) * page_size,
+        risk_level=risk_level, country=country, hs_chapter=hs_chapter,
+    )
+    return {
+        "news": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "ingest": get_news_ingestor().status(),
+    }
+
 
 @app.post("/api/parse-document")
 async def parse_document(file: UploadFile = File(...)):
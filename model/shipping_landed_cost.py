@@ -9,9 +9,19 @@ with distance-normalized multipliers to simulate realistic
 cross-border trade cost sensitivity.
 """
 
+import asyncio
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-from tarrif_lookup_engine import load_tariffs, get_tariff_rate, get_tariff_rate_live
+from tarrif_lookup_engine import load_tariffs, get_tariff_rate, get_tariff_rate_live, local_tariff_rate
+from cross_country_store import get_cross_country_store
+from route_matrix import MODES, get_route_matrix
+from tax_schedule import get_tax_schedule, hs_chapters
 
 # ── Route Distances ─────────────────────────────────────────────────
 # Approximate trade-lane estimates (km). All routes are symmetric.
@@ -75,6 +85,10 @@ SHIPPING_RATES = {
         "base_charge": 120,
         "per_kg_rate": 1.2,
     },
+    "rail": {
+        "base_charge": 180,
+        "per_kg_rate": 2.5,
+    },
 }
 
 # ── Normalization Constant ──────────────────────────────────────────
@@ -117,31 +131,15 @@ FILE_NAME_MAP = {
     "vietnam": "vietnam",
 }
 
-# ── Global CSV Cache ───────────────────────────────────────────────
-_CSV_CACHE = {}
-
-def load_cross_country_data(reporter: str, partner: str) -> pd.DataFrame | None:
-    """
-    Load and cache the cross-country tariff CSV for a reporter→partner route.
-    """
-    r = _normalize(reporter)
-    p = _normalize(partner)
-    r_file = FILE_NAME_MAP.get(r, r)
-    p_file = FILE_NAME_MAP.get(p, p)
-
-    filename = f"{r_file}-{p_file}.csv"
-    if filename in _CSV_CACHE:
-        return _CSV_CACHE[filename]
-
-    filepath = os.path.join(CROSS_COUNTRY_DIR, filename)
-
-    if not os.path.exists(filepath):
-        return None
-
-    df = pd.read_csv(filepath, dtype={"hs_code": str})
-    _CSV_CACHE[filename] = df
-    return df
+# ── Shared Live-Lookup Executor ────────────────────────────────────
+# One process-wide pool for live tariff resolution, so concurrent API
+# requests share threads instead of each spawning their own. Outstanding
+# WITS HTTP calls are further capped by wits_api.WITS_MAX_CONCURRENCY.
+LIVE_WORKERS = int(os.getenv("TARIFFIQ_LIVE_WORKERS", "16"))
+LIVE_EXECUTOR = ThreadPoolExecutor(max_workers=LIVE_WORKERS, thread_name_prefix="tariffiq-live")
 
+# Per-origin deadline (s) for the async comparison path
+ORIGIN_DEADLINE_S = float(os.getenv("TARIFFIQ_ORIGIN_DEADLINE_S", "8"))
 
 # ═══════════════════════════════════════════════════════════════════
 #  Core Functions
@@ -152,20 +150,40 @@ def _normalize(name: str) -> str:
     return name.strip().lower()
 
 
+def no_route_message(mode: str, origin: str, destination: str) -> str:
+    """Error text for a route missing from the route matrix, listing the countries it prices."""
+    return (
+        f"No {mode} route found for {origin} → {destination} in the route matrix. "
+        f"Routed countries: {', '.join(get_route_matrix().names)}"
+    )
+
+
 def get_route_distance(origin: str, destination: str, mode: str) -> int:
     """
-    Look up the distance (km) between two countries for a given mode.
-    Routes are symmetric — order doesn't matter.
+    Look up the distance (km) between two countries for a given mode
+    from the precomputed route matrix. Routes are symmetric.
     """
-    a, b = sorted([_normalize(origin), _normalize(destination)])
-    table = AIR_DISTANCE_KM if mode == "air" else SEA_DISTANCE_KM
-    key = (a, b)
-    if key not in table:
-        raise ValueError(
-            f"No {mode} route found for {origin} → {destination}. "
-            f"Supported countries: {SUPPORTED_COUNTRIES}"
-        )
-    return table[key]
+    distance_km = get_route_matrix().distance(origin, destination, mode)
+    if distance_km != distance_km:  # NaN → no route
+        raise ValueError(no_route_message(mode, origin, destination))
+    return int(distance_km)
+
+
+@lru_cache(maxsize=4096)
+def _route_leg(origin: str, destination: str, mode: str) -> tuple[int, float]:
+    """(distance_km, distance_factor) of a route, memoized for the single-shipment path."""
+    distance_km = get_route_distance(origin, destination, mode)
+    return distance_km, round(distance_km / DISTANCE_NORM_KM, 2)
+
+
+def _shipping_leg(origin: str, destination: str, mode: str, weight_kg: float) -> tuple[int, float, float]:
+    """(distance_km, distance_factor, shipping_cost) for a normalized mode."""
+    rates = SHIPPING_RATES.get(mode)
+    if rates is None:
+        raise ValueError(f"Invalid mode '{mode}'. Choose {_MODE_CHOICES}.")
+    distance_km, distance_factor = _route_leg(origin, destination, mode)
+    shipping_cost = _round_cent(rates["base_charge"] + (weight_kg * rates["per_kg_rate"] * distance_factor))
+    return distance_km, distance_factor, shipping_cost
 
 
 def calculate_shipping_cost(origin: str, destination: str, mode: str, weight_kg: float) -> dict:
@@ -173,19 +191,7 @@ def calculate_shipping_cost(origin: str, destination: str, mode: str, weight_kg:
     Calculate freight shipping cost.
     Returns dict with: distance_km, distance_factor, shipping_cost
     """
-    mode = mode.strip().lower()
-    if mode not in SHIPPING_RATES:
-        raise ValueError(f"Invalid mode '{mode}'. Choose 'air' or 'sea'.")
-
-    distance_km = get_route_distance(origin, destination, mode)
-    distance_factor = round(distance_km / DISTANCE_NORM_KM, 2)
-
-    rates = SHIPPING_RATES[mode]
-    shipping_cost = round(
-        rates["base_charge"] + (weight_kg * rates["per_kg_rate"] * distance_factor),
-        2,
-    )
-
+    distance_km, distance_factor, shipping_cost = _shipping_leg(origin, destination, mode.strip().lower(), weight_kg)
     return {
         "distance_km": distance_km,
         "distance_factor": distance_factor,
@@ -198,6 +204,238 @@ def calculate_import_duty(base_value: float, tariff_rate: float) -> float:
     return round(base_value * tariff_rate / 100, 2)
 
 
+def _round_cent(value: float) -> float:
+    """
+    Scalar _round_cents: round(value, 2) without the decimal-string
+    conversion builtin round() does when given ndigits (same rint + tie
+    fallback as the array version).
+    """
+    scaled = value * 100
+    if not math.isfinite(scaled) or abs(scaled % 1.0 - 0.5) < 1e-6:
+        return round(value, 2)
+    return round(scaled) / 100
+
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized round(x, 2) with exactly the semantics of Python's round().
+    rint(x * 100) / 100 agrees with round() except where x * 100 lands
+    within float noise of a half-cent; those few rows use round() directly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 1:
+        # Single-shipment fast path: skip the array machinery entirely
+        return np.full(values.shape, round(float(values.flat[0]), 2))
+    scaled = values * 100
+    out = np.rint(scaled) / 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        out[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return out
+
+
+# ── Array-path lookup tables ───────────────────────────────────────
+# Dense country ids and (mode, origin, dest) distance tensors come from
+# the route matrix; per-mode rates are aligned with its MODES order.
+
+_MODE_IDS = {m: i for i, m in enumerate(MODES)}
+_MODE_CHOICES = ", ".join(f"'{m}'" for m in MODES[:-1]) + f" or '{MODES[-1]}'"
+
+_BASE_CHARGE = np.array([SHIPPING_RATES[m]["base_charge"] for m in MODES], dtype=np.float64)
+_PER_KG_RATE = np.array([SHIPPING_RATES[m]["per_kg_rate"] for m in MODES], dtype=np.float64)
+
+
+@lru_cache(maxsize=1)
+def _shipping_tables():
+    """(route matrix, distance_km tensor, rounded distance_factor tensor), built once."""
+    matrix = get_route_matrix()
+    distance_km = matrix.distance_km
+    factors = np.full(distance_km.shape, np.nan)
+    known = ~np.isnan(distance_km)
+    factors[known] = _round_cents(distance_km[known] / DISTANCE_NORM_KM)
+    return matrix, distance_km, factors
+
+
+def _ids_for(names, table: dict) -> np.ndarray:
+    """Map names → dense ids via the unique values only (-1 if unknown)."""
+    names = np.atleast_1d(np.asarray(names, dtype=object))
+    if names.size == 1:
+        return np.full(names.shape, table.get(_normalize(str(names.flat[0])), -1), dtype=np.int64)
+    inverse, uniques = pd.factorize(names.ravel())
+    # Trailing -1 so factorize's missing-value code (-1) maps to "unknown"
+    ids = np.array([table.get(_normalize(str(u)), -1) for u in uniques] + [-1], dtype=np.int64)
+    return ids[inverse].reshape(names.shape)
+
+
+@lru_cache(maxsize=256)
+def _format_country(name: str) -> str:
+    n = name.strip().lower()
+    return COUNTRY_NAME_MAP.get(n, n.title())
+
+
+def calculate_shipping_cost_batch(origins, destinations, modes, weights_kg) -> dict:
+    """
+    Array version of calculate_shipping_cost. Inputs broadcast together.
+    Returns dict of arrays: distance_km, distance_factor, shipping_cost.
+    """
+    origins, destinations, modes = (
+        np.atleast_1d(np.asarray(a, dtype=object)) for a in (origins, destinations, modes)
+    )
+    matrix, distance_table, factor_table = _shipping_tables()
+    o_ids = matrix.country_ids(origins)
+    d_ids = matrix.country_ids(destinations)
+    m_ids = _ids_for(modes, _MODE_IDS)
+    weights = np.asarray(weights_kg, dtype=np.float64)
+    o_ids, d_ids, m_ids, weights = np.broadcast_arrays(o_ids, d_ids, m_ids, weights)
+
+    bad_mode = m_ids < 0
+    if bad_mode.any():
+        mode = str(np.broadcast_to(modes, m_ids.shape)[bad_mode][0]).strip().lower()
+        raise ValueError(f"Invalid mode '{mode}'. Choose {_MODE_CHOICES}.")
+
+    valid = (o_ids >= 0) & (d_ids >= 0)
+    distance_km = np.full(o_ids.shape, np.nan)
+    distance_factor = np.full(o_ids.shape, np.nan)
+    distance_km[valid] = distance_table[m_ids[valid], o_ids[valid], d_ids[valid]]
+    distance_factor[valid] = factor_table[m_ids[valid], o_ids[valid], d_ids[valid]]
+    missing = np.isnan(distance_km)
+    if missing.any():
+        i = np.argmax(missing)
+        origin = np.broadcast_to(origins, o_ids.shape).ravel()[i]
+        destination = np.broadcast_to(destinations, o_ids.shape).ravel()[i]
+        raise ValueError(no_route_message(MODES[m_ids.ravel()[i]], origin, destination))
+
+    shipping_cost = _round_cents(
+        _BASE_CHARGE[m_ids] + weights * _PER_KG_RATE[m_ids] * distance_factor
+    )
+    return {
+        "distance_km": distance_km,
+        "distance_factor": distance_factor,
+        "shipping_cost": shipping_cost,
+    }
+
+
+def landed_cost_from_shipping(
+    shipping_cost,
+    product_value,
+    tariff_rate,
+    destinations=None,
+    hs_codes=None,
+) -> dict:
+    """
+    Landed-cost formula from freight onwards, on broadcastable arrays.
+    Taxes and fees follow each destination's compiled tax schedule (the
+    default schedule when `destinations` is None); excise is looked up by
+    the HS chapter of `hs_codes`. Every intermediate is rounded to cents
+    exactly like the scalar path.
+    """
+    tax = get_tax_schedule()
+    shipping_cost, product_value, tariff_rate, t, chapter = np.broadcast_arrays(
+        np.asarray(shipping_cost, dtype=np.float64),
+        np.asarray(product_value, dtype=np.float64),
+        np.asarray(tariff_rate, dtype=np.float64),
+        tax.country_ids(destinations),
+        hs_chapters(hs_codes),
+    )
+    return _landed_cost_terms(
+        shipping_cost, product_value, tariff_rate, tax.terms(t, chapter), _round_cents, np.where,
+    )
+
+
+def _where_scalar(condition, if_true, if_false):
+    return if_true if condition else if_false
+
+
+def _landed_cost_terms(shipping_cost, product_value, tariff_rate, s: dict, round_cents, where) -> dict:
+    """
+    The landed-cost formula, shared by the array kernel (arrays,
+    _round_cents, np.where) and the single-shipment path (floats,
+    _round_cent, a plain conditional). `s` holds the destination's
+    TaxSchedule.terms.
+    """
+    # Insurance is typically estimated at ~3% of product value
+    insurance_cost = round_cents(product_value * 0.03)
+
+    # CIF (Cost, Insurance, Freight)
+    cif_value = round_cents(product_value + shipping_cost + insurance_cost)
+
+    # Duty is applied on CIF, waived at or below the destination's de-minimis
+    import_duty = round_cents(cif_value * tariff_rate / 100)
+    duty_threshold = s["duty_de_minimis"]
+    import_duty = where((duty_threshold > 0) & (product_value <= duty_threshold), 0.0, import_duty)
+
+    # Cess / surcharge: a share of CIF or of the duty, per schedule
+    cess_base = where(s["cess_on_duty"], import_duty, cif_value)
+    cess_cost = round_cents(cess_base * s["cess_rate"])
+
+    # Excise: ad valorem on CIF + duty, by HS chapter
+    excise_cost = round_cents((cif_value + import_duty) * s["excise"])
+
+    # VAT and GST are assessed on CIF plus the components in the schedule's tax base
+    dutiable_value = (
+        cif_value + import_duty * s["base_duty"] + cess_cost * s["base_cess"]
+        + excise_cost * s["base_excise"]
+    )
+    vat_threshold = s["vat_de_minimis"]
+    vat_waived = (vat_threshold > 0) & (product_value <= vat_threshold)
+
+    import_vat = where(vat_waived, 0.0, round_cents(dutiable_value * s["vat_rate"]))
+    gst_cost = where(vat_waived, 0.0, round_cents(dutiable_value * s["gst_rate"]))
+
+    handling_fees = s["handling_fee"]
+    doc_fees = s["doc_fee"]
+
+    total = round_cents(
+        cif_value + import_duty + import_vat + gst_cost + cess_cost + handling_fees + doc_fees
+        + excise_cost
+    )
+
+    return {
+        "shipping_cost": shipping_cost,
+        "insurance_cost": insurance_cost,
+        "cif_value": cif_value,
+        "import_duty": import_duty,
+        "import_vat": import_vat,
+        "gst_cost": gst_cost,
+        "cess_cost": cess_cost,
+        "excise_cost": excise_cost,
+        "handling_fees": handling_fees,
+        "doc_fees": doc_fees,
+        "total_landed_cost": total,
+    }
+
+
+def calculate_landed_cost_batch(
+    origins,
+    destinations,
+    modes,
+    weights_kg,
+    product_values,
+    tariff_rates,
+    hs_codes=None,
+) -> dict:
+    """
+    Vectorized landed cost for many shipments in one NumPy pass.
+    All inputs are columns (or scalars) that broadcast together; taxes
+    follow each destination's schedule and hs_codes (optional) select
+    chapter excise.
+
+    Returns a dict of arrays: distance_km, distance_factor, shipping_cost,
+    insurance_cost, cif_value, import_duty, import_vat, gst_cost, cess_cost,
+    excise_cost, handling_fees, doc_fees, total_landed_cost.
+    """
+    shipping = calculate_shipping_cost_batch(origins, destinations, modes, weights_kg)
+    costs = landed_cost_from_shipping(
+        shipping["shipping_cost"], product_values, tariff_rates,
+        destinations=destinations, hs_codes=hs_codes,
+    )
+    return {
+        "distance_km": shipping["distance_km"],
+        "distance_factor": shipping["distance_factor"],
+        **costs,
+    }
+
+
 def calculate_landed_cost(
     origin: str,
     destination: str,
@@ -205,63 +443,76 @@ def calculate_landed_cost(
     weight_kg: float,
     product_value: float,
     tariff_rate: float,
+    hs_code: str | None = None,
 ) -> dict:
     """
     Full landed cost calculation with detailed breakdown.
+    Same formula as calculate_landed_cost_batch, evaluated on Python floats
+    so a single shipment skips the array setup; hs_code (optional) selects
+    chapter excise in the destination schedule.
     Returns: route, mode, distance_km, distance_factor, weight_kg,
              shipping_cost, insurance_cost, cif_value, tariff_rate, 
-             import_duty, import_vat, gst_cost, cess_cost, 
+             import_duty, import_vat, gst_cost, cess_cost, excise_cost,
              handling_fees, doc_fees, total_landed_cost
     """
-    shipping = calculate_shipping_cost(origin, destination, mode, weight_kg)
-    shipping_cost = shipping["shipping_cost"]
-    
-    # Insurance is typically estimated at ~3% of product value
-    insurance_cost = round(product_value * 0.03, 2)
-    
-    # CIF (Cost, Insurance, Freight)
-    cif_value = round(product_value + shipping_cost + insurance_cost, 2)
-    
-    # Duty is applied on CIF
-    import_duty = calculate_import_duty(cif_value, tariff_rate)
-    
-    # Cess is often a surcharge on CIF or Duty. We'll use 1.5% of CIF for this simulation.
-    cess_cost = round(cif_value * 0.015, 2)
-    
-    # VAT and GST are typically assessed on the dutiable value (CIF + Duty + Cess)
-    dutiable_value = cif_value + import_duty + cess_cost
-    
-    # Additional common taxes/fees
-    import_vat = round(dutiable_value * 0.12, 2)  # assumed standard 12%
-    gst_cost = round(dutiable_value * 0.08, 2)    # assumed 8%
-    
-    handling_fees = 200.0
-    doc_fees = 100.0
-
-    total = round(cif_value + import_duty + import_vat + gst_cost + cess_cost + handling_fees + doc_fees, 2)
+    mode = mode.strip().lower()
+    distance_km, distance_factor, shipping_cost = _shipping_leg(origin, destination, mode, weight_kg)
+    costs = _landed_cost_terms(
+        shipping_cost, product_value, tariff_rate,
+        get_tax_schedule().shipment_terms(destination, hs_code), _round_cent, _where_scalar,
+    )
+    return {
+        "route": f"{_format_country(origin)} → {_format_country(destination)}",
+        "mode": mode,
+        "distance_km": distance_km,
+        "distance_factor": distance_factor,
+        "weight_kg": weight_kg,
+        "product_value": product_value,
+        "shipping_cost": costs["shipping_cost"],
+        "insurance_cost": costs["insurance_cost"],
+        "cif_value": costs["cif_value"],
+        "tariff_rate": tariff_rate,
+        "import_duty": costs["import_duty"],
+        "import_vat": costs["import_vat"],
+        "gst_cost": costs["gst_cost"],
+        "cess_cost": costs["cess_cost"],
+        "excise_cost": costs["excise_cost"],
+        "handling_fees": costs["handling_fees"],
+        "doc_fees": costs["doc_fees"],
+        "total_landed_cost": costs["total_landed_cost"],
+    }
 
-    def format_country(name):
-        n = name.strip().lower()
-        return COUNTRY_NAME_MAP.get(n, n.title())
 
+def landed_cost_row(
+    batch: dict,
+    j,
+    origin: str,
+    destination: str,
+    mode: str,
+    weight_kg: float,
+    product_value: float,
+    tariff_rate: float,
+) -> dict:
+    """Result dict for element `j` of a calculate_landed_cost_batch output."""
     return {
-        "route": f"{format_country(origin)} → {format_country(destination)}",
-        "mode": mode.strip().lower(),
-        "distance_km": shipping["distance_km"],
-        "distance_factor": shipping["distance_factor"],
+        "route": f"{_format_country(origin)} → {_format_country(destination)}",
+        "mode": mode,
+        "distance_km": int(batch["distance_km"][j]),
+        "distance_factor": float(batch["distance_factor"][j]),
         "weight_kg": weight_kg,
         "product_value": product_value,
-        "shipping_cost": shipping_cost,
-        "insurance_cost": insurance_cost,
-        "cif_value": cif_value,
+        "shipping_cost": float(batch["shipping_cost"][j]),
+        "insurance_cost": float(batch["insurance_cost"][j]),
+        "cif_value": float(batch["cif_value"][j]),
         "tariff_rate": tariff_rate,
-        "import_duty": import_duty,
-        "import_vat": import_vat,
-        "gst_cost": gst_cost,
-        "cess_cost": cess_cost,
-        "handling_fees": handling_fees,
-        "doc_fees": doc_fees,
-        "total_landed_cost": total,
+        "import_duty": float(batch["import_duty"][j]),
+        "import_vat": float(batch["import_vat"][j]),
+        "gst_cost": float(batch["gst_cost"][j]),
+        "cess_cost": float(batch["cess_cost"][j]),
+        "excise_cost": float(batch["excise_cost"][j]),
+        "handling_fees": float(batch["handling_fees"][j]),
+        "doc_fees": float(batch["doc_fees"][j]),
+        "total_landed_cost": float(batch["total_landed_cost"][j]),
     }
 
 
@@ -288,7 +539,7 @@ def calculate_landed_cost_with_lookup(
         return None
 
     return calculate_landed_cost(
-        origin, destination, mode, weight_kg, product_value, rate
+        origin, destination, mode, weight_kg, product_value, rate, hs_code=hs_code
     )
 
 
@@ -305,28 +556,8 @@ def calculate_landed_cost_live(
     Full landed cost calculation using LIVE preferentially-adjusted 
     WITS tariffs (AHS). Falls back to csv rate if live fails.
     """
-    # 1) Try to get fallback rate from CSV
-    df = load_cross_country_data(reporter=destination, partner=origin)
-    fallback_rate = None
-    csv_product_desc = "Unknown"
-    is_traded = "No"
-    
-    if df is not None:
-        hs_str = str(hs_code).strip()
-        match = df[df["hs_code"] == hs_str]
-        if not match.empty:
-            fallback_rate = float(match.iloc[0]["AppliedTariff"])
-            csv_product_desc = match.iloc[0]["Product"]
-            is_traded = match.iloc[0]["IsTraded"]
-
-    # 2) Live lookup
-    tariff_data = get_tariff_rate_live(
-        hs_code=hs_code, 
-        origin=origin, 
-        destination=destination, 
-        year=year,
-        fallback_rate=fallback_rate
-    )
+    # 1-2) Resolve the tariff (live WITS, cross-country store fallback)
+    tariff_data = resolve_tariff_live(origin, destination, hs_code, year)
     
     rate_to_use = tariff_data["ahs_rate"]
     if rate_to_use is None:
@@ -334,18 +565,63 @@ def calculate_landed_cost_live(
          
     # 3) Calculate landed cost
     result = calculate_landed_cost(
-        origin, destination, mode, weight_kg, product_value, rate_to_use
+        origin, destination, mode, weight_kg, product_value, rate_to_use, hs_code=hs_code
     )
     
     # 4) Enrich with preference data
-    result["product_description"] = tariff_data.get("product_label", csv_product_desc)
+    return _enrich_with_tariff(result, tariff_data)
+
+
+def resolve_tariff_live(origin: str, destination: str, hs_code: str, year: int = 2021) -> dict:
+    """
+    Resolve the tariff for one (origin, destination, hs_code) key: live WITS
+    AHS rate, with the cross-country store rate as fallback.
+
+    Returns the get_tariff_rate_live dict plus csv_product_description
+    and is_traded from the store.
+    """
+    # 1) Try to get fallback rate from the consolidated cross-country store
+    fallback_rate, csv_product_desc, is_traded = _store_tariff(origin, destination, hs_code)
+
+    # 2) Live lookup
+    tariff_data = get_tariff_rate_live(
+        hs_code=hs_code, 
+        origin=origin, 
+        destination=destination, 
+        year=year,
+        fallback_rate=fallback_rate
+    )
+    tariff_data["csv_product_description"] = csv_product_desc
+    tariff_data["is_traded"] = is_traded
+    return tariff_data
+
+
+def resolve_tariff_local(origin: str, destination: str, hs_code: str) -> dict:
+    """resolve_tariff_live without the WITS call — cross-country store rate only."""
+    fallback_rate, csv_product_desc, is_traded = _store_tariff(origin, destination, hs_code)
+    tariff_data = local_tariff_rate(fallback_rate)
+    tariff_data["csv_product_description"] = csv_product_desc
+    tariff_data["is_traded"] = is_traded
+    return tariff_data
+
+
+def _store_tariff(origin: str, destination: str, hs_code: str) -> tuple[float | None, str, str]:
+    """(AppliedTariff, Product, IsTraded) from the cross-country store, with defaults."""
+    row = get_cross_country_store().lookup(destination, origin, hs_code)
+    if row is None:
+        return None, "Unknown", "No"
+    return row["AppliedTariff"], row["Product"], row["IsTraded"]
+
+
+def _enrich_with_tariff(result: dict, tariff_data: dict) -> dict:
+    """Attach preference / provenance fields from a resolved tariff."""
+    result["product_description"] = tariff_data.get("product_label", tariff_data["csv_product_description"])
     result["mfn_rate"] = tariff_data["mfn_rate"]
     result["applied_tariff"] = tariff_data["ahs_rate"]
     result["preference_margin"] = tariff_data["preference_margin"]
     result["has_preference"] = tariff_data["has_preference"]
     result["is_live"] = tariff_data["is_live"]
-    result["is_traded"] = is_traded
-    
+    result["is_traded"] = tariff_data["is_traded"]
     return result
 
 
@@ -368,27 +644,20 @@ def lookup_landed_cost_by_country(
     origin = exporting country (partner in CSV)
     destination = importing country (reporter in CSV)
     """
-    # The CSV file is named reporter-partner, where reporter = importer
-    df = load_cross_country_data(reporter=destination, partner=origin)
-    if df is None:
+    # Store keys are (reporter, partner, hs_code), where reporter = importer
+    row = get_cross_country_store().lookup(destination, origin, hs_code)
+    if row is None:
         return None
 
-    hs_code = str(hs_code).strip()
-    match = df[df["hs_code"] == hs_code]
-
-    if match.empty:
-        return None
-
-    row = match.iloc[0]
-    tariff_rate = float(row["AppliedTariff"])
+    tariff_rate = row["AppliedTariff"]
 
     result = calculate_landed_cost(
-        origin, destination, mode, weight_kg, product_value, tariff_rate
+        origin, destination, mode, weight_kg, product_value, tariff_rate, hs_code=hs_code
     )
 
     # Enrich with cross-country data
     result["product_description"] = row["Product"]
-    result["mfn_rate"] = round(float(row["MFNRate"]), 2)
+    result["mfn_rate"] = round(row["MFNRate"], 2)
     result["applied_tariff"] = round(tariff_rate, 2)
     result["is_traded"] = row["IsTraded"]
 
@@ -446,34 +715,229 @@ def compare_origins_live(
     year: int = 2021,
 ) -> list[dict]:
     """
-    Concurrent version of compare_origins_live to speed up calculation.
+    Live-tariff version of compare_origins, served from the cached
+    scenario matrix for (hs_code, my_country): tariffs are resolved once
+    per origin and all origins are costed in one vectorized pass.
     """
-    from concurrent.futures import ThreadPoolExecutor
+    from scenario_matrix import get_scenario_matrix, wanted_origins
 
-    if origins is None:
-        origins = [c for c in SUPPORTED_COUNTRIES if c != _normalize(my_country)]
+    matrix = get_scenario_matrix(hs_code, my_country, origins=origins, year=year)
+    wanted = wanted_origins(_normalize(my_country), origins)
+    return matrix.rank(
+        weight_kg, product_value, modes=[mode],
+        exclude_origins=[o for o in matrix.origins if o not in wanted],
+    )
 
-    results = []
 
-    def task(src):
-        src = _normalize(src)
-        if src == _normalize(my_country):
+async def compare_origins_live_async(
+    hs_code: str,
+    my_country: str,
+    mode: str,
+    weight_kg: float,
+    product_value: float,
+    origins: list[str] | None = None,
+    year: int = 2021,
+    deadline_s: float = ORIGIN_DEADLINE_S,
+) -> dict:
+    """
+    Async compare_origins_live for the event loop. Live lookups fan out on
+    the shared executor under the global WITS budget; each origin gets
+    `deadline_s` seconds before falling back to its local store rate.
+
+    Returns { scenarios (cheapest first), live_origins, estimated_origins,
+    missing_origins, timed_out_origins, complete }.
+    """
+    from scenario_matrix import get_scenario_matrix_async, wanted_origins
+
+    matrix = await get_scenario_matrix_async(
+        hs_code, my_country, origins=origins, year=year, deadline_s=deadline_s,
+    )
+    wanted = wanted_origins(_normalize(my_country), origins)
+    scenarios = matrix.rank(
+        weight_kg, product_value, modes=[mode],
+        exclude_origins=[o for o in matrix.origins if o not in wanted],
+    )
+    status = matrix.origin_status(wanted)
+
+    return {
+        "scenarios": scenarios,
+        "live_origins": status["live"],
+        "estimated_origins": status["estimated"],
+        "missing_origins": status["missing"],
+        "timed_out_origins": status["timed_out"],
+        "complete": not status["timed_out"],
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Batch Pricing (purchase orders / catalogue revaluation)
+# ═══════════════════════════════════════════════════════════════════
+
+# Cost columns summed into order totals
+_ORDER_TOTAL_FIELDS = (
+    "product_value", "shipping_cost", "insurance_cost", "cif_value",
+    "import_duty", "import_vat", "gst_cost", "cess_cost", "excise_cost",
+    "handling_fees", "doc_fees", "total_landed_cost",
+)
+
+
+def route_supported_mask(origins, destinations, modes) -> np.ndarray:
+    """Boolean mask of rows whose (origin, destination, mode) has a known distance."""
+    matrix, distance_table, _ = _shipping_tables()
+    o_ids = matrix.country_ids(origins)
+    d_ids = matrix.country_ids(destinations)
+    m_ids = _ids_for(modes, _MODE_IDS)
+    o_ids, d_ids, m_ids = np.broadcast_arrays(o_ids, d_ids, m_ids)
+
+    ok = (o_ids >= 0) & (d_ids >= 0) & (m_ids >= 0)
+    ok[ok] = ~np.isnan(distance_table[m_ids[ok], o_ids[ok], d_ids[ok]])
+    return ok
+
+
+def _resolve_tariff_or_error(key: tuple[str, str, str], year: int) -> dict:
+    """resolve_tariff_live, with a failure reported as ahs_rate=None + error for this key only."""
+    try:
+        return resolve_tariff_live(key[0], key[1], key[2], year)
+    except Exception as e:
+        return {"ahs_rate": None, "error": f"Tariff lookup failed for HS {key[2]} on route {key[0]} → {key[1]}: {e}"}
+
+
+def resolve_tariffs_bulk(
+    keys: list[tuple[str, str, str]],
+    year: int = 2021,
+    catch_errors: bool = False,
+) -> dict[tuple[str, str, str], dict]:
+    """
+    Resolve tariffs once per unique (origin, destination, hs_code) key,
+    concurrently on the shared live-lookup executor.
+    Returns {normalized key: resolve_tariff_live dict}. With catch_errors
+    a failing key gets {ahs_rate: None, error} instead of raising.
+    """
+    unique = _unique_keys(keys)
+    if not unique:
+        return {}
+
+    if catch_errors:
+        resolved = LIVE_EXECUTOR.map(lambda k: _resolve_tariff_or_error(k, year), unique)
+    else:
+        resolved = LIVE_EXECUTOR.map(lambda k: resolve_tariff_live(k[0], k[1], k[2], year), unique)
+    return dict(zip(unique, resolved))
+
+
+async def resolve_tariffs_async(
+    keys: list[tuple[str, str, str]],
+    year: int = 2021,
+    deadline_s: float = ORIGIN_DEADLINE_S,
+) -> dict[tuple[str, str, str], dict]:
+    """
+    Async resolve_tariffs_bulk with a per-key deadline. Keys whose live
+    lookup misses the deadline fall back to the cross-country store rate
+    and are flagged with timed_out=True. A lookup already running keeps
+    going (its result still warms the WITS caches); one still queued on
+    the shared executor when the deadline passes is skipped, so timed-out
+    requests do not hold workers that other requests are waiting for.
+    """
+    unique = _unique_keys(keys)
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + deadline_s
+
+    def lookup(key):
+        if time.monotonic() >= deadline:
             return None
-        return calculate_landed_cost_live(
-            origin=src, destination=my_country, hs_code=hs_code,
-            mode=mode, weight_kg=weight_kg, product_value=product_value,
-            year=year
+        return resolve_tariff_live(key[0], key[1], key[2], year)
+
+    async def resolve(key):
+        try:
+            tariff = await asyncio.wait_for(loop.run_in_executor(LIVE_EXECUTOR, lookup, key), timeout=deadline_s)
+            if tariff is None:
+                raise asyncio.TimeoutError
+            tariff["timed_out"] = False
+        except asyncio.TimeoutError:
+            tariff = resolve_tariff_local(*key)
+            tariff["timed_out"] = True
+        return tariff
+
+    resolved = await asyncio.gather(*(resolve(k) for k in unique))
+    return dict(zip(unique, resolved))
+
+
+def _unique_keys(keys) -> list[tuple[str, str, str]]:
+    return list(dict.fromkeys(
+        (_normalize(o), _normalize(d), str(h).strip()) for o, d, h in keys
+    ))
+
+
+def price_line_items(lines: list[dict], year: int = 2021) -> dict:
+    """
+    Price many line items at once. Each line needs origin, destination,
+    mode, weight_kg, product_value and hs_code (line_id is optional).
+
+    Tariffs are resolved once per unique (origin, destination, hs_code) and
+    all lines are costed in a single vectorized pass, so cost scales with
+    the number of unique keys rather than the number of lines.
+
+    Returns { lines: [...], totals: {...}, unique_tariff_keys }.
+    """
+    n = len(lines)
+    origins = np.array([_normalize(l["origin"]) for l in lines], dtype=object)
+    destinations = np.array([_normalize(l["destination"]) for l in lines], dtype=object)
+    modes = np.array([_normalize(l.get("mode", "sea")) for l in lines], dtype=object)
+    hs_codes = [str(l["hs_code"]).strip() for l in lines]
+    weights = np.array([l["weight_kg"] for l in lines], dtype=np.float64)
+    values = np.array([l["product_value"] for l in lines], dtype=np.float64)
+
+    errors: list[str | None] = [None] * n
+    routable = route_supported_mask(origins, destinations, modes) if n else np.zeros(0, dtype=bool)
+    for i in np.flatnonzero(~routable):
+        errors[i] = no_route_message(modes[i], origins[i], destinations[i])
+
+    keys = [(origins[i], destinations[i], hs_codes[i]) for i in range(n)]
+    # A failing key marks only its own lines as failed
+    tariffs = resolve_tariffs_bulk([k for k, ok in zip(keys, routable) if ok], year=year, catch_errors=True)
+
+    rates = np.full(n, np.nan)
+    for i in np.flatnonzero(routable):
+        rate = tariffs[keys[i]]["ahs_rate"]
+        if rate is None:
+            errors[i] = tariffs[keys[i]].get("error") or (
+                f"No tariff data found for HS {hs_codes[i]} on route {origins[i]} → {destinations[i]}."
+            )
+        else:
+            rates[i] = rate
+
+    priced = np.array([e is None for e in errors], dtype=bool)
+    idx = np.flatnonzero(priced)
+    batch = calculate_landed_cost_batch(
+        origins[idx], destinations[idx], modes[idx], weights[idx], values[idx], rates[idx],
+        hs_codes=np.array(hs_codes, dtype=object)[idx],
+    ) if len(idx) else None
+
+    results = []
+    for i in range(n):
+        entry = {"line_id": lines[i].get("line_id", i), "hs_code": hs_codes[i]}
+        if errors[i] is not None:
+            entry["error"] = errors[i]
+        results.append(entry)
+
+    totals = {field: 0.0 for field in _ORDER_TOTAL_FIELDS}
+    for j, i in enumerate(idx):
+        result = landed_cost_row(
+            batch, j, origins[i], destinations[i], modes[i],
+            float(weights[i]), float(values[i]), float(rates[i]),
         )
+        results[i]["landed_cost"] = _enrich_with_tariff(result, tariffs[keys[i]])
+        for field in _ORDER_TOTAL_FIELDS:
+            totals[field] += result[field]
 
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(task, src) for src in origins]
-        for f in futures:
-            res = f.result()
-            if res:
-                results.append(res)
+    totals = {k: round(v, 2) for k, v in totals.items()}
+    totals["lines_priced"] = int(priced.sum())
+    totals["lines_failed"] = int(n - priced.sum())
 
-    results.sort(key=lambda r: r["total_landed_cost"])
-    return results
+    return {
+        "lines": results,
+        "totals": totals,
+        "unique_tariff_keys": len(tariffs),
+    }
 
 
 # ═══════════════════════════════════════════════════════════════════
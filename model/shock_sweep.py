@@ -0,0 +1,261 @@
+"""
+TariffIQ — Policy Shock Sweep
+==============================
+"At what tariff increase does it pay to move sourcing?" for a whole
+portfolio, in one call instead of one ``run_policy_shock`` per point.
+
+For a delta grid D, origins O and portfolio lines N:
+
+1. Baseline rates (N, O) are resolved once per unique (destination, HS)
+   from the cross-country store (or live WITS), as in the portfolio
+   optimizer.
+2. The shock hits the current origin (or ``shocked_origins``, or — given
+   an extracted policy — the lines and routes its targeting masks select):
+   rates[d, n, o] = max(0, base[n, o] + delta[d] · mask[n, o]).
+3. Shipping depends on neither delta nor tariff, so it is computed once
+   per (line, origin) and the (D, N, O) cost tensor comes from a single
+   ``landed_cost_from_shipping`` pass.
+
+From the tensor: cost curves per origin, the cheapest single origin and
+the cheapest per-line mix at every delta, and the break-even deltas —
+linearly interpolated between grid points — at which each alternative
+(and each line's best alternative) overtakes the current origin.
+"""
+
+import numpy as np
+
+from portfolio_optimizer import tariff_matrix
+from shipping_landed_cost import (
+    SUPPORTED_COUNTRIES, _normalize, _round_cents, calculate_shipping_cost_batch,
+    landed_cost_from_shipping, route_supported_mask,
+)
+from shock_targeting import compile_policy, policy_masks
+
+DEFAULT_DELTAS = (-10.0, 100.0, 5.0)   # start, stop (inclusive), step — tariff points
+MAX_SWEEP_POINTS = 1000
+
+
+def delta_grid(start: float = DEFAULT_DELTAS[0], stop: float = DEFAULT_DELTAS[1],
+               step: float = DEFAULT_DELTAS[2]) -> np.ndarray:
+    """Inclusive arithmetic grid of tariff deltas (percentage points)."""
+    if step <= 0 or stop < start:
+        raise ValueError("Delta grid needs step > 0 and stop >= start.")
+    n = int(np.floor((stop - start) / step + 1e-9)) + 1
+    if n > MAX_SWEEP_POINTS:
+        raise ValueError(f"Delta grid has {n} points (max {MAX_SWEEP_POINTS}).")
+    return np.round(start + step * np.arange(n), 6)
+
+
+def _crossings(deltas: np.ndarray, diff: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    First delta where each column of diff (alternative − current, shape
+    (D, M)) turns negative, interpolated between grid points. Returns
+    (break-even deltas, status) with status "crosses", "cheaper_throughout"
+    or "never" (NaN break-even for the last two).
+    """
+    neg = diff < 0                                   # NaN compares False
+    first = np.where(neg.any(axis=0), neg.argmax(axis=0), -1)
+    status = np.where(first < 0, "never", np.where(first == 0, "cheaper_throughout", "crosses"))
+    out = np.full(diff.shape[1], np.nan)
+    cols = np.flatnonzero(first > 0)
+    if len(cols):
+        k = first[cols]
+        d0, d1 = diff[k - 1, cols], diff[k, cols]
+        x0, x1 = deltas[k - 1], deltas[k]
+        # Previous point NaN (e.g. unpriced) → fall back to the grid point itself
+        frac = np.where(np.isfinite(d0) & (d0 != d1), d0 / np.where(d0 != d1, d0 - d1, 1.0), 1.0)
+        out[cols] = x0 + (x1 - x0) * frac
+    return out, status
+
+
+def _round_or_none(x: float) -> float | None:
+    return None if not np.isfinite(x) else round(float(x), 2)
+
+
+def sweep_shock(
+    lines: list[dict],
+    origin: str,
+    deltas=None,
+    origins: list[str] | None = None,
+    shocked_origins: list[str] | None = None,
+    policy: dict | None = None,
+    tariff_rates=None,
+    live: bool = False,
+    year: int = 2021,
+    include_lines: bool = False,
+) -> dict:
+    """
+    Sweep a tariff delta grid over a portfolio sourced from `origin`.
+
+    lines: [{hs_code, destination, mode, weight_kg, product_value, line_id?}]
+    deltas: sequence of deltas (default: DEFAULT_DELTAS grid)
+    origins: alternatives to consider (default: every supported country)
+    shocked_origins: origins the delta applies to (default: [origin]);
+        ignored when `policy` (an extracted_policy dict) is given, whose
+        HS / country targeting then decides which lines and routes move
+    tariff_rates: optional (lines, origins) baseline override
+
+    Returns {
+        deltas, origins, current_origin,
+        curves: [{delta, current_total, best_origin, best_origin_total,
+                  optimal_mix_total, lines_switching}],
+        origin_curves: {origin: [total per delta] (None if not every line is priced)},
+        breakeven: [{origin, breakeven_delta, status, baseline_gap}]   (vs the current
+            origin; baseline_gap and per_line baseline_total are at delta 0, not the grid start)
+        portfolio_breakeven: {first_delta_switch_optimal, mix_breakeven_delta},
+        per_line: [...] (include_lines), skipped: [line_id, ...],
+        unresolved_countries, country_fallback   (with `policy`)
+    }
+    """
+    origin = _normalize(origin)
+    deltas = np.asarray(delta_grid() if deltas is None else deltas, dtype=np.float64)
+    if deltas.ndim != 1 or not len(deltas):
+        raise ValueError("deltas must be a non-empty list of numbers.")
+    if len(deltas) > MAX_SWEEP_POINTS:
+        raise ValueError(f"Delta grid has {len(deltas)} points (max {MAX_SWEEP_POINTS}).")
+    deltas = np.sort(deltas)
+
+    origins = list(dict.fromkeys(
+        [origin] + [_normalize(o) for o in (origins if origins is not None else SUPPORTED_COUNTRIES)]
+    ))
+    n, n_origins = len(lines), len(origins)
+    if not n:
+        raise ValueError("Portfolio has no lines.")
+
+    line_ids = [line.get("line_id") or i for i, line in enumerate(lines)]
+    dest = np.array([_normalize(l["destination"]) for l in lines], dtype=object)
+    modes = np.array([_normalize(l.get("mode", "sea")) for l in lines], dtype=object)
+    hs = np.array([str(l["hs_code"]).strip() for l in lines], dtype=object)
+    weights = np.array([l["weight_kg"] for l in lines], dtype=np.float64)
+    values = np.array([l["product_value"] for l in lines], dtype=np.float64)
+    orig = np.array(origins, dtype=object)
+
+    base = (
+        np.asarray(tariff_rates, dtype=np.float64) if tariff_rates is not None
+        else tariff_matrix(lines, origins, live=live, year=year)
+    )
+    if base.shape != (n, n_origins):
+        raise ValueError(f"tariff_rates must have shape (lines, origins) = {(n, n_origins)}.")
+
+    # Which (line, origin) cells the shock moves
+    targeted = None
+    if policy is not None:
+        targeted = compile_policy(policy, delta=1.0)
+        flat = policy_masks(
+            [targeted],
+            np.repeat(hs, n_origins), np.tile(orig, n), np.repeat(dest, n_origins),
+        )[0]
+        mask = flat.reshape(n, n_origins)
+    else:
+        shocked = {_normalize(o) for o in (shocked_origins or [origin])}
+        mask = np.broadcast_to(np.isin(orig, list(shocked))[None, :], (n, n_origins))
+
+    # Shipping once per priced (line, origin) cell, then one tax pass over all deltas
+    ok = (
+        route_supported_mask(orig[None, :], dest[:, None], modes[:, None])
+        & ~np.isnan(base) & (orig[None, :] != dest[:, None])
+    )
+    # Row 0 is the unshocked baseline (delta 0), whatever the grid covers
+    li, oi = np.nonzero(ok)
+    costs = np.full((len(deltas) + 1, n, n_origins), np.nan)
+    if len(li):
+        shipping = calculate_shipping_cost_batch(orig[oi], dest[li], modes[li], weights[li])["shipping_cost"]
+        rates = np.vstack([
+            base[li, oi],
+            _round_cents(np.maximum(0.0, base[li, oi] + deltas[:, None] * mask[li, oi])),
+        ])
+        costs[:, li, oi] = landed_cost_from_shipping(
+            shipping, values[li], rates, destinations=dest[li], hs_codes=hs[li],
+        )["total_landed_cost"]
+
+    # Lines the current origin (column 0) cannot price are left out of every comparison
+    c = 0
+    priced = ok[:, c]
+    skipped = [line_ids[i] for i in np.flatnonzero(~priced).tolist()]
+    baseline, costs = costs[0, priced, :], costs[1:, priced, :]
+    kept_ids = [line_ids[i] for i in np.flatnonzero(priced).tolist()]
+    kept_hs = hs[priced].tolist()
+
+    current = costs[:, :, c].sum(axis=1)                                  # (D,)
+    complete = ~np.isnan(costs).any(axis=(0, 1))                          # origin prices every line
+    baseline_totals = baseline.sum(axis=0)                                # (O,) at delta 0
+    origin_totals = np.where(complete[None, :], np.nansum(costs, axis=1), np.nan)   # (D, O)
+    line_best = np.nanargmin(costs, axis=2) if costs.shape[1] else np.zeros((len(deltas), 0), dtype=np.int64)
+    mix_total = np.nanmin(costs, axis=2).sum(axis=1) if costs.shape[1] else np.zeros(len(deltas))
+    best_origin = np.nanargmin(np.where(np.isnan(origin_totals), np.inf, origin_totals), axis=1)
+
+    curves = [
+        {
+            "delta": float(d),
+            "current_total": round(float(current[k]), 2),
+            "best_origin": origins[best_origin[k]],
+            "best_origin_total": round(float(origin_totals[k, best_origin[k]]), 2),
+            "optimal_mix_total": round(float(mix_total[k]), 2),
+            "lines_switching": int((line_best[k] != c).sum()),
+        }
+        for k, d in enumerate(deltas.tolist())
+    ]
+
+    # Break-even vs each alternative (whole portfolio moved to it)
+    alt_delta, alt_status = _crossings(deltas, origin_totals - current[:, None])
+    breakeven = []
+    for j, alt in enumerate(origins):
+        if j == c:
+            continue
+        entry = {
+            "origin": alt,
+            "priced": bool(complete[j]),
+            "breakeven_delta": _round_or_none(alt_delta[j]),
+            "status": str(alt_status[j]) if complete[j] else "unpriced",
+        }
+        if complete[j]:
+            entry["baseline_gap"] = round(float(baseline_totals[j] - baseline_totals[c]), 2)
+        breakeven.append(entry)
+    breakeven.sort(key=lambda e: (e["breakeven_delta"] is None, e["breakeven_delta"] or 0.0))
+
+    # Half-cent tolerance: the mix always includes the current origin, so it only "wins" strictly
+    mix_delta, mix_status = _crossings(deltas, (mix_total - current + 0.005)[:, None])
+    switch_points = np.flatnonzero(best_origin != c)
+    result = {
+        "current_origin": origin,
+        "deltas": deltas.tolist(),
+        "origins": origins,
+        "curves": curves,
+        "origin_curves": {
+            o: None if not complete[j] else [round(float(x), 2) for x in origin_totals[:, j].tolist()]
+            for j, o in enumerate(origins)
+        },
+        "breakeven": breakeven,
+        "portfolio_breakeven": {
+            # Smallest grid delta at which moving the whole portfolio to one origin pays
+            "first_delta_switch_optimal": float(deltas[switch_points[0]]) if len(switch_points) else None,
+            # Delta at which re-sourcing lines individually starts to pay
+            "mix_breakeven_delta": _round_or_none(mix_delta[0]),
+            "mix_status": str(mix_status[0]),
+        },
+        "skipped": skipped,
+    }
+    if targeted is not None:
+        result["unresolved_countries"] = targeted.unresolved_countries
+        result["country_fallback"] = targeted.country_fallback
+
+    if include_lines and costs.shape[1]:
+        # Per line: cheapest alternative over the sweep and where it overtakes
+        alternatives = costs.copy()
+        alternatives[:, :, c] = np.nan
+        alt_best = np.nanmin(np.where(np.isnan(alternatives), np.inf, alternatives), axis=2)
+        alt_best = np.where(np.isinf(alt_best), np.nan, alt_best)
+        line_delta, line_status = _crossings(deltas, alt_best - costs[:, :, c])
+        has_alternative = np.isfinite(alt_best).any(axis=0)
+        result["per_line"] = [
+            {
+                "line_id": kept_ids[i],
+                "hs_code": kept_hs[i],
+                "baseline_total": round(float(baseline[i, c]), 2),
+                "best_origin_at_max_delta": origins[int(line_best[-1, i])],
+                "breakeven_delta": _round_or_none(line_delta[i]),
+                "status": str(line_status[i]) if has_alternative[i] else "no_alternative",
+            }
+            for i in range(costs.shape[1])
+        ]
+    return result
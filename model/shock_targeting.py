@@ -0,0 +1,273 @@
+"""
+TariffIQ — Policy Shock Targeting
+==================================
+Turns an LLM-extracted policy into masks over a portfolio, so a shock
+hits only the lines it is about instead of every HS code uniformly.
+
+A policy compiles to:
+
+- HS prefixes — 2-digit chapters, 4-digit headings or 6-digit
+  subheadings parsed from ``likely_affected_hs_chapters``
+  ("72 - Iron and steel", "Heading 8471", "Chapter 7") — matched against
+  each line's zero-padded HS-6 code. No prefixes → every code.
+- Countries — ``affected_countries`` resolved to route-matrix ids
+  ("EU" expands to its members in the graph; "U.S.", "Viet Nam" and
+  other common spellings go through ``COUNTRY_ALIASES``). With two or
+  more countries and a bilateral policy type (retaliatory, preferential,
+  other) a line matches when both its origin and destination are listed;
+  for MFN / safeguard measures, or a single country, either side matching
+  is enough. No countries → every route; names given but none resolved
+  → every route too, flagged ``country_fallback``.
+- A delta in tariff percentage points.
+
+Many policies stack into a (policies, lines) delta tensor whose column
+sums are the combined shock, evaluated with the baseline and every
+individual policy in one landed-cost pass.
+"""
+
+import re
+
+import numpy as np
+
+from route_matrix import get_route_matrix
+from shipping_landed_cost import _round_cents, calculate_shipping_cost_batch, landed_cost_from_shipping
+
+_CODE_RE = re.compile(r"\d+")
+_NAME_RE = re.compile(r"[^a-z0-9&' ]+")
+
+# Country groupings the LLM tends to name instead of members
+COUNTRY_GROUPS = {
+    "eu": ("FRA", "DEU", "ITA", "ESP", "BEL", "NLD", "POL", "SWE"),
+    "european union": ("FRA", "DEU", "ITA", "ESP", "BEL", "NLD", "POL", "SWE"),
+    "asean": ("VNM", "THA", "MYS", "SGP", "IDN", "PHL"),
+}
+
+# Spellings the LLM uses for countries the route matrix knows by another name
+COUNTRY_ALIASES = {
+    "us": "USA", "usa": "USA", "america": "USA", "united states": "USA",
+    "uk": "GBR", "britain": "GBR", "great britain": "GBR", "england": "GBR",
+    "prc": "CHN", "mainland china": "CHN", "people's republic of china": "CHN",
+    "viet nam": "VNM", "korea": "KOR", "republic of korea": "KOR",
+    "uae": "ARE", "emirates": "ARE", "holland": "NLD", "turkiye": "TUR", "türkiye": "TUR",
+    "russian federation": "RUS", "ksa": "SAU",
+}
+
+# Policy types that apply to every trading partner of the listed importer(s)
+ERGA_OMNES_TYPES = ("mfn", "safeguard")
+
+
+class TargetedPolicy:
+    """One compiled policy: HS prefixes, country ids, matching rule and delta."""
+
+    def __init__(self, delta: float, prefixes=(), countries=(), bilateral: bool = False,
+                 headline: str = "", unresolved_countries=(), country_filter: bool | None = None):
+        self.delta = float(delta)
+        self.prefixes = tuple(prefixes)
+        self.countries = np.array(sorted(set(countries)), dtype=np.int64)
+        self.bilateral = bilateral
+        self.headline = headline
+        self.unresolved_countries = list(unresolved_countries)
+        # Names were given but none resolved → every route, flagged as a fallback
+        self.country_filter = bool(len(self.countries)) if country_filter is None else country_filter
+        self.country_fallback = bool(self.unresolved_countries) and not len(self.countries)
+
+    def describe(self) -> dict:
+        matrix = get_route_matrix()
+        return {
+            "headline": self.headline,
+            "delta": self.delta,
+            "hs_prefixes": list(self.prefixes),
+            "countries": [matrix.names[i] for i in self.countries.tolist()],
+            "unresolved_countries": self.unresolved_countries,
+            "country_fallback": self.country_fallback,
+            "bilateral": self.bilateral,
+        }
+
+
+def _hs_prefixes(entries) -> list[str]:
+    """First number of each entry, as a 2 / 4 / 6-digit HS prefix."""
+    prefixes = []
+    for entry in entries or []:
+        match = _CODE_RE.search(str(entry))
+        if not match:
+            continue
+        digits = match.group()
+        if len(digits) <= 2:
+            prefixes.append(digits.zfill(2))
+        elif len(digits) in (3, 5):
+            prefixes.append(digits.zfill(len(digits) + 1))
+        else:
+            prefixes.append(digits[:6])
+    return list(dict.fromkeys(prefixes))
+
+
+def _country_name_key(name) -> str:
+    """Lower-cased name without dots / punctuation or a leading "the" ("The U.S." → "us")."""
+    key = _NAME_RE.sub(" ", str(name).lower().replace(".", ""))
+    key = " ".join(key.split())
+    return key[4:] if key.startswith("the ") else key
+
+
+def compile_policy(extracted_policy: dict, delta: float | None = None) -> TargetedPolicy:
+    """Compile an analyze_news ``extracted_policy`` block into masks."""
+    matrix = get_route_matrix()
+    if delta is None:
+        delta = extracted_policy.get("estimated_tariff_delta_percent") or 0.0
+
+    countries, unresolved = [], []
+    for name in extracted_policy.get("affected_countries") or []:
+        key = _country_name_key(name)
+        if not key:
+            continue
+        members = COUNTRY_GROUPS.get(key, (COUNTRY_ALIASES.get(key, key),))
+        ids = [matrix.country_id(m) for m in members]
+        ids = [i for i in ids if i >= 0]
+        if ids:
+            countries += ids
+        else:
+            unresolved.append(str(name))
+
+    policy_type = str(extracted_policy.get("policy_type") or "").strip().lower()
+    return TargetedPolicy(
+        delta=float(delta),
+        prefixes=_hs_prefixes(extracted_policy.get("likely_affected_hs_chapters")),
+        countries=countries,
+        bilateral=len(set(countries)) >= 2 and policy_type not in ERGA_OMNES_TYPES,
+        headline=str(extracted_policy.get("headline") or ""),
+        unresolved_countries=unresolved,
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Masks
+# ═══════════════════════════════════════════════════════════════════
+
+def _hs6(hs_codes) -> np.ndarray:
+    """Zero-padded HS-6 codes as integers (-1 when not numeric)."""
+    out = []
+    for code in hs_codes:
+        code = str(code).strip()
+        code = code.zfill(len(code) + len(code) % 2)[:6].ljust(6, "0")
+        out.append(int(code) if code.isdigit() else -1)
+    return np.array(out, dtype=np.int64)
+
+
+def policy_masks(policies: list[TargetedPolicy], hs_codes, origins, destinations) -> np.ndarray:
+    """Boolean (policies, lines): which lines each policy applies to."""
+    matrix = get_route_matrix()
+    hs6 = _hs6(hs_codes)
+    n = len(hs6)
+    o_ids = np.broadcast_to(matrix.country_ids(origins), (n,))
+    d_ids = np.broadcast_to(matrix.country_ids(destinations), (n,))
+
+    masks = np.zeros((len(policies), n), dtype=bool)
+    for p, policy in enumerate(policies):
+        if policy.prefixes:
+            hs_ok = np.zeros(n, dtype=bool)
+            for length in {len(x) for x in policy.prefixes}:
+                wanted = [int(x) for x in policy.prefixes if len(x) == length]
+                hs_ok |= (hs6 >= 0) & np.isin(hs6 // 10 ** (6 - length), wanted)
+        else:
+            hs_ok = np.ones(n, dtype=bool)
+
+        if not policy.country_filter:
+            country_ok = np.ones(n, dtype=bool)
+        else:
+            o_in, d_in = np.isin(o_ids, policy.countries), np.isin(d_ids, policy.countries)
+            country_ok = (o_in & d_in) if policy.bilateral else (o_in | d_in)
+        masks[p] = hs_ok & country_ok
+    return masks
+
+
+def stacked_deltas(policies: list[TargetedPolicy], hs_codes, origins, destinations) -> np.ndarray:
+    """Delta tensor (policies, lines): each policy's delta where it applies, 0 elsewhere."""
+    masks = policy_masks(policies, hs_codes, origins, destinations)
+    return masks * np.array([p.delta for p in policies], dtype=np.float64)[:, None]
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Stacked Evaluation
+# ═══════════════════════════════════════════════════════════════════
+
+def simulate_policies(lines: list[dict], policies: list[TargetedPolicy], baseline_rates=None) -> dict:
+    """
+    Baseline, each policy alone and all policies combined, in one
+    broadcast landed-cost pass over a (policies + 2, lines) rate tensor.
+
+    Returns {
+        per_policy: [{...policy, lines_affected, total_impact, percent_change}],
+        combined:   {lines_affected, total_baseline_cost, total_new_cost,
+                     total_impact, portfolio_percent_change},
+        per_line:   [{hs_code, origin, destination, baseline_tariff, combined_delta,
+                      new_tariff, baseline_total, new_total}],
+        skipped:    [hs_code, ...]   (no baseline rate)
+    }
+    """
+    if baseline_rates is None:
+        baseline_rates = [line.get("baseline_tariff") for line in lines]
+    base = np.array([np.nan if r is None else r for r in baseline_rates], dtype=np.float64)
+    ok = ~np.isnan(base)
+    skipped = [str(line["hs_code"]) for line, keep in zip(lines, ok) if not keep]
+    lines = [line for line, keep in zip(lines, ok) if keep]
+    base = base[ok]
+
+    hs = np.array([str(line["hs_code"]) for line in lines], dtype=object)
+    origins = np.array([line["origin"] for line in lines], dtype=object)
+    destinations = np.array([line["destination"] for line in lines], dtype=object)
+    deltas = stacked_deltas(policies, hs, origins, destinations) if lines else np.zeros((len(policies), 0))
+
+    # Rows: baseline | one per policy | combined
+    shifts = np.vstack([np.zeros((1, len(lines))), deltas, deltas.sum(axis=0, keepdims=True)])
+    rates = _round_cents(np.maximum(0.0, base + shifts))
+    rates[0] = base
+
+    if lines:
+        shipping = calculate_shipping_cost_batch(
+            origins, destinations,
+            np.array([line["mode"] for line in lines], dtype=object),
+            np.array([line["weight_kg"] for line in lines], dtype=np.float64),
+        )["shipping_cost"]
+        totals = landed_cost_from_shipping(
+            shipping, np.array([line["product_value"] for line in lines], dtype=np.float64), rates,
+            destinations=destinations, hs_codes=hs,
+        )["total_landed_cost"]
+    else:
+        totals = np.zeros_like(rates)
+
+    sums = [float(sum(row)) for row in totals.tolist()]
+    base_total = sums[0]
+
+    def summary(row: int, affected: np.ndarray) -> dict:
+        impact = round(sums[row] - base_total, 2)
+        return {
+            "lines_affected": int(affected.sum()),
+            "total_impact": impact,
+            "percent_change": round(impact / base_total * 100, 2) if base_total else 0.0,
+        }
+
+    combined = summary(len(policies) + 1, shifts[-1] != 0)
+    return {
+        "per_policy": [
+            {**policy.describe(), **summary(p + 1, deltas[p] != 0)}
+            for p, policy in enumerate(policies)
+        ],
+        "combined": {
+            "lines_affected": combined["lines_affected"],
+            "total_baseline_cost": base_total,
+            "total_new_cost": sums[-1],
+            "total_impact": combined["total_impact"],
+            "portfolio_percent_change": combined["percent_change"],
+        },
+        "per_line": [
+            {
+                "hs_code": h, "origin": o, "destination": d,
+                "baseline_tariff": b, "combined_delta": round(s, 4), "new_tariff": r,
+                "baseline_total": bt, "new_total": nt,
+            }
+            for h, o, d, b, s, r, bt, nt in zip(
+                hs.tolist(), origins.tolist(), destinations.tolist(), base.tolist(),
+                shifts[-1].tolist(), rates[-1].tolist(), totals[0].tolist(), totals[-1].tolist(),
+            )
+        ],
+        "skipped": skipped,
+    }
@@ -0,0 +1,493 @@
+"""
+TariffIQ — Tariff Cube Store
+=============================
+Multi-year, multi-indicator tariff store indexed by
+(reporter, partner, HS-6, year, indicator).
+
+Every cell is packed into a single sorted int64 key, so exact lookups,
+nearest-available-year resolution and year-range slices are all answered
+with ``np.searchsorted`` over the whole query batch at once.
+
+Key layout (most → least significant bits):
+
+    reporter (10) | partner (10) | hs6 (20) | indicator (2) | year offset (8)
+
+Sources:
+1. The raw tariff dump (``data/tarrif_data.csv``) — all years, MFN / AHS /
+   bound indicators. Rows without a partner are stored against ``WLD``;
+   where several HS revisions cover the same cell, the newest one wins.
+2. HS-6 rates fetched live from WITS TRAINS, written through by
+   ``wits_api.get_tariff_rate`` so repeat lookups never leave the process.
+   Write-throughs land in a small sorted side buffer that is searched
+   alongside the main arrays and merged in once it holds
+   ``MERGE_ROWS`` cells, instead of re-sorting the cube on every hit.
+
+Usage (build from the raw dump):
+    python model/tariff_cube.py
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ── Paths ───────────────────────────────────────────────────────────
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+RAW_TARIFF_CSV = os.path.join(DATA_DIR, "tarrif_data.csv")
+CUBE_FILE = os.path.join(DATA_DIR, "tariff_cube.npz")
+
+# ── Key Layout ──────────────────────────────────────────────────────
+INDICATORS = ("MFN", "AHS", "BND")
+INDICATOR_IDS = {name: i for i, name in enumerate(INDICATORS)}
+
+YEAR_BASE = 1988          # first year of the HS nomenclature
+YEAR_BITS = 8
+INDICATOR_BITS = 2
+HS_BITS = 20              # 999999 < 2**20
+COUNTRY_BITS = 10
+
+_HS_SHIFT = INDICATOR_BITS + YEAR_BITS
+_PARTNER_SHIFT = _HS_SHIFT + HS_BITS
+_REPORTER_SHIFT = _PARTNER_SHIFT + COUNTRY_BITS
+_YEAR_MASK = (1 << YEAR_BITS) - 1
+
+WORLD = "WLD"
+
+# Buffered write-through cells merged into the main arrays at this size
+MERGE_ROWS = 1024
+
+_NO_GAP = np.iinfo(np.int64).max
+
+# WITS nomenclature codes → first year of the HS revision
+_HS_REVISIONS = {"H0": 1988, "H1": 1996, "H2": 2002, "H3": 2007, "H4": 2012, "H5": 2017, "H6": 2022}
+
+
+def _classify_indicator(raw: str) -> str | None:
+    """Map a raw dump indicator name onto one of INDICATORS."""
+    name = str(raw).upper()
+    if "BOUND" in name or "BND" in name:
+        return "BND"
+    if "AHS" in name or "PREF" in name or "EFFECTIVELY" in name:
+        return "AHS"
+    if "MFN" in name:
+        return "MFN"
+    return None
+
+
+def _revision_year(raw) -> int:
+    """Year of an HS classification version ("HS22", "HS2017", "H5"), 0 if unknown."""
+    name = str(raw).strip().upper()
+    if name in _HS_REVISIONS:
+        return _HS_REVISIONS[name]
+    digits = "".join(ch for ch in name if ch.isdigit())
+    if not digits:
+        return 0
+    year = int(digits)
+    if year < 100:
+        year += 1900 if year >= 88 else 2000
+    return year
+
+
+def _merge_sorted(keys: np.ndarray, rates: np.ndarray, new_keys: np.ndarray, new_rates: np.ndarray):
+    """Union of two key sets, sorted; for duplicate keys the new value wins."""
+    keys = np.concatenate([keys, new_keys])
+    vals = np.concatenate([rates, new_rates])
+    order = np.argsort(keys, kind="stable")
+    keys, vals = keys[order], vals[order]
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = keys[1:] != keys[:-1]
+    return keys[last], vals[last]
+
+
+def _resolve(keys: np.ndarray, series: np.ndarray, year_off: np.ndarray, resolve: str, max_lag: int):
+    """
+    Index into sorted `keys` of each query's resolved cell, whether it hit,
+    and its distance in years from the requested one (_NO_GAP on a miss).
+    """
+    n = len(series)
+    if len(keys) == 0:
+        return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=bool), np.full(n, _NO_GAP)
+
+    query = series | year_off
+    last = len(keys) - 1
+
+    # Candidate at-or-before the requested year
+    before = np.clip(np.searchsorted(keys, query, side="right") - 1, 0, last)
+    before_key = keys[before]
+    before_ok = (series >= 0) & ((before_key & ~_YEAR_MASK) == series) & (before_key <= query)
+    before_gap = year_off - (before_key & _YEAR_MASK)
+
+    if resolve == "exact":
+        hit = before_ok & (before_gap == 0)
+        idx, gap = before, before_gap
+    elif resolve == "previous":
+        hit = before_ok & (before_gap <= max_lag)
+        idx, gap = before, before_gap
+    elif resolve == "nearest":
+        after = np.clip(np.searchsorted(keys, query, side="left"), 0, last)
+        after_key = keys[after]
+        after_ok = (series >= 0) & ((after_key & ~_YEAR_MASK) == series) & (after_key >= query)
+        after_gap = (after_key & _YEAR_MASK) - year_off
+
+        before_gap = np.where(before_ok, before_gap, _NO_GAP)
+        after_gap = np.where(after_ok, after_gap, _NO_GAP)
+        use_after = after_gap < before_gap
+        idx = np.where(use_after, after, before)
+        gap = np.minimum(before_gap, after_gap)
+        hit = gap <= max_lag
+    else:
+        raise ValueError(f"Invalid resolve '{resolve}'. Choose 'exact', 'previous' or 'nearest'.")
+    return idx, hit, np.where(hit, gap, _NO_GAP)
+
+
+def _country_key(name: str) -> str:
+    """Resolve a friendly name / ISO3 code to the key used inside the cube."""
+    from wits_api import _resolve_iso3
+
+    try:
+        return _resolve_iso3(str(name))
+    except ValueError:
+        return str(name).strip().upper()
+
+
+class TariffCube:
+    """
+    Sorted-key tariff store. Country ids are append-only, so keys stay
+    valid as new WITS results are ingested.
+
+    The main (keys, rates) pair and the write-through buffer are each
+    swapped in as one tuple, so lock-free readers never see keys and
+    rates from different versions.
+    """
+
+    def __init__(self, countries=None, keys=None, rates=None):
+        self.countries: list[str] = list(countries) if countries is not None else [WORLD]
+        self._country_ids = {c: i for i, c in enumerate(self.countries)}
+        self._main = (
+            np.asarray(keys if keys is not None else [], dtype=np.int64),
+            np.asarray(rates if rates is not None else [], dtype=np.float64),
+        )
+        self._pending = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> np.ndarray:
+        self.flush()
+        return self._main[0]
+
+    @property
+    def rates(self) -> np.ndarray:
+        self.flush()
+        return self._main[1]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # ── Encoding ────────────────────────────────────────────────────
+
+    def _country_ids_for(self, names, create: bool = False) -> np.ndarray:
+        """Vectorized country → id; unknown countries map to -1 unless create."""
+        names = np.asarray(names, dtype=object)
+        uniques, inverse = np.unique(names.astype(str), return_inverse=True)
+        ids = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques):
+            key = _country_key(name)
+            cid = self._country_ids.get(key)
+            if cid is None and create:
+                if len(self.countries) >= (1 << COUNTRY_BITS):
+                    raise ValueError("Tariff cube country table is full.")
+                cid = len(self.countries)
+                self.countries.append(key)
+                self._country_ids[key] = cid
+            ids[i] = -1 if cid is None else cid
+        return ids[inverse].reshape(names.shape)
+
+    @staticmethod
+    def _series_keys(reporter_ids, partner_ids, hs_codes, indicator_ids) -> np.ndarray:
+        hs = pd.to_numeric(
+            pd.Series(np.asarray(hs_codes).ravel()).astype(str).str.strip().str.zfill(6).str[:6],
+            errors="coerce",
+        ).fillna(-1).to_numpy(dtype=np.int64).reshape(np.shape(hs_codes))
+        keys = (
+            (np.asarray(reporter_ids, dtype=np.int64) << _REPORTER_SHIFT)
+            | (np.asarray(partner_ids, dtype=np.int64) << _PARTNER_SHIFT)
+            | (hs << _HS_SHIFT)
+            | (np.asarray(indicator_ids, dtype=np.int64) << YEAR_BITS)
+        )
+        invalid = (
+            (np.asarray(reporter_ids) < 0) | (np.asarray(partner_ids) < 0) | (hs < 0)
+        )
+        return np.where(invalid, -1, keys)
+
+    @staticmethod
+    def _indicator_ids(indicator, n: int) -> np.ndarray:
+        if isinstance(indicator, str):
+            return np.full(n, INDICATOR_IDS[indicator.upper()], dtype=np.int64)
+        return np.array([INDICATOR_IDS[str(i).upper()] for i in indicator], dtype=np.int64)
+
+    # ── Ingestion ───────────────────────────────────────────────────
+
+    def add(self, reporters, partners, hs_codes, years, indicators, rates, buffered: bool = False) -> int:
+        """
+        Insert (or overwrite) a batch of cells. Later values win over
+        existing ones for the same key, and within the batch the last row
+        of a key wins. With buffered=True the cells go to the side buffer
+        (merged in at MERGE_ROWS). Returns the number of rows added.
+        """
+        reporters = np.atleast_1d(np.asarray(reporters, dtype=object))
+        n = len(reporters)
+        if n == 0:
+            return 0
+
+        with self._lock:
+            r_ids = self._country_ids_for(reporters, create=True)
+            p_ids = self._country_ids_for(np.broadcast_to(np.asarray(partners, dtype=object), (n,)), create=True)
+            series = self._series_keys(
+                r_ids, p_ids, np.broadcast_to(np.asarray(hs_codes), (n,)),
+                self._indicator_ids(indicators, n),
+            )
+            year_off = np.broadcast_to(np.asarray(years, dtype=np.int64), (n,)) - YEAR_BASE
+            new_rates = np.broadcast_to(np.asarray(rates, dtype=np.float64), (n,))
+
+            ok = (series >= 0) & (year_off >= 0) & (year_off <= _YEAR_MASK) & ~np.isnan(new_rates)
+            new_keys = series[ok] | year_off[ok]
+
+            if buffered:
+                self._pending = _merge_sorted(*self._pending, new_keys, new_rates[ok])
+                if len(self._pending[0]) >= MERGE_ROWS:
+                    self._flush_locked()
+            else:
+                self._flush_locked()
+                self._main = _merge_sorted(*self._main, new_keys, new_rates[ok])
+
+        return int(ok.sum())
+
+    def flush(self) -> None:
+        """Merge the write-through buffer into the main arrays."""
+        if len(self._pending[0]):
+            with self._lock:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if len(self._pending[0]):
+            self._main = _merge_sorted(*self._main, *self._pending)
+            self._pending = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+    def add_records(self, records: list[dict], indicator: str = "AHS") -> int:
+        """
+        Write through WITS-style result dicts (reporter, partner, hs_code,
+        year, tariff_rate) via the side buffer.
+        """
+        if not records:
+            return 0
+        df = pd.DataFrame(records)
+        return self.add(
+            df["reporter"].to_numpy(), df["partner"].to_numpy(),
+            df["hs_code"].to_numpy(), df["year"].to_numpy(),
+            df["indicator"].to_numpy() if "indicator" in df else indicator,
+            df["tariff_rate"].to_numpy(),
+            buffered=True,
+        )
+
+    # ── Queries ─────────────────────────────────────────────────────
+
+    def lookup(
+        self,
+        reporters,
+        partners,
+        hs_codes,
+        years,
+        indicator: str = "AHS",
+        resolve: str = "exact",
+        max_lag: int = 0,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized point lookup. All inputs broadcast against each other.
+
+        resolve:
+            "exact"    — only the requested year.
+            "previous" — latest year ≤ requested, at most ``max_lag`` years back.
+            "nearest"  — closest year in either direction within ``max_lag``
+                         (ties go to the earlier year).
+
+        Returns (rates, resolved_years); misses are NaN / 0.
+        """
+        reporters, partners, hs_codes, years = np.broadcast_arrays(
+            np.asarray(reporters, dtype=object), np.asarray(partners, dtype=object),
+            np.asarray(hs_codes, dtype=object), np.asarray(years, dtype=np.int64),
+        )
+        shape = years.shape
+        reporters, partners, hs_codes, years = (a.ravel() for a in (reporters, partners, hs_codes, years))
+        n = len(years)
+
+        rates = np.full(n, np.nan)
+        resolved = np.zeros(n, dtype=np.int64)
+        main, pending = self._main, self._pending
+        if n == 0 or len(main[0]) + len(pending[0]) == 0:
+            return rates.reshape(shape), resolved.reshape(shape)
+
+        series = self._series_keys(
+            self._country_ids_for(reporters), self._country_ids_for(partners),
+            hs_codes, self._indicator_ids(indicator, n),
+        )
+        year_off = np.clip(years - YEAR_BASE, 0, _YEAR_MASK)
+
+        idx, hit, gap = _resolve(main[0], series, year_off, resolve, max_lag)
+        rates[hit] = main[1][idx[hit]]
+        resolved[hit] = (main[0][idx[hit]] & _YEAR_MASK) + YEAR_BASE
+
+        # Write-through buffer wins where it is at least as close to the requested year
+        idx, hit, pending_gap = _resolve(pending[0], series, year_off, resolve, max_lag)
+        hit &= pending_gap <= gap
+        rates[hit] = pending[1][idx[hit]]
+        resolved[hit] = (pending[0][idx[hit]] & _YEAR_MASK) + YEAR_BASE
+        return rates.reshape(shape), resolved.reshape(shape)
+
+    def history(
+        self,
+        reporter: str,
+        partner: str,
+        hs_code: str,
+        start_year: int,
+        end_year: int,
+        indicators=INDICATORS,
+    ) -> pd.DataFrame:
+        """
+        Year-range slice, e.g. rate history for HS 610910 into USA 2015–2025.
+        Returns a DataFrame indexed by year with one column per indicator.
+        """
+        indicators = [i.upper() for i in indicators]
+        r_id = self._country_ids_for([reporter])
+        p_id = self._country_ids_for([partner])
+        series = self._series_keys(
+            np.repeat(r_id, len(indicators)), np.repeat(p_id, len(indicators)),
+            np.repeat(np.asarray([hs_code], dtype=object), len(indicators)),
+            self._indicator_ids(indicators, len(indicators)),
+        )
+        self.flush()
+        keys, rates = self._main
+        lo_off = max(start_year - YEAR_BASE, 0)
+        hi_off = min(end_year - YEAR_BASE, _YEAR_MASK)
+        lo = np.searchsorted(keys, series | lo_off, side="left")
+        hi = np.searchsorted(keys, series | hi_off, side="right")
+
+        years = np.arange(start_year, end_year + 1)
+        out = pd.DataFrame(index=pd.Index(years, name="year"), columns=indicators, dtype=float)
+        for name, s, a, b in zip(indicators, series, lo, hi):
+            if s < 0 or a >= b:
+                continue
+            out.loc[(keys[a:b] & _YEAR_MASK) + YEAR_BASE, name] = rates[a:b]
+        return out
+
+    def available_years(self, reporter: str, partner: str, hs_code: str, indicator: str = "AHS") -> list[int]:
+        """Sorted list of years with data for one series."""
+        df = self.history(reporter, partner, hs_code, YEAR_BASE, YEAR_BASE + _YEAR_MASK, [indicator])
+        return df.index[df[indicator.upper()].notna()].tolist()
+
+    # ── Persistence ─────────────────────────────────────────────────
+
+    def save(self, path: str = CUBE_FILE) -> None:
+        with self._lock:
+            self._flush_locked()
+            keys, rates = self._main
+            np.savez(path, countries=np.array(self.countries), keys=keys, rates=rates)
+
+    @classmethod
+    def load(cls, path: str = CUBE_FILE) -> "TariffCube":
+        data = np.load(path)
+        return cls(data["countries"].tolist(), data["keys"], data["rates"])
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Building
+# ═══════════════════════════════════════════════════════════════════
+
+def build_tariff_cube(raw_path: str = RAW_TARIFF_CSV, cube: TariffCube | None = None) -> TariffCube:
+    """
+    Build (or extend) a cube from the raw tariff dump. Unlike the cleaner,
+    this keeps every year and the MFN, AHS and bound indicators. Cells
+    covered by several HS revisions keep the newest revision's value.
+    """
+    cube = cube if cube is not None else TariffCube()
+
+    header = pd.read_csv(raw_path, nrows=0).columns.str.strip()
+    partner_col = next((c for c in ("partner_name", "partner") if c in header), None)
+    usecols = ["reporter_name", "year", "indicator", "product_code", "value"]
+    if partner_col:
+        usecols.append(partner_col)
+    if "classification_version" in header:
+        usecols.append("classification_version")
+
+    df = pd.read_csv(
+        raw_path, usecols=lambda c: c.strip() in usecols,
+        dtype={"product_code": str},
+    )
+    df.columns = df.columns.str.strip()
+
+    # Map indicator names once per unique value rather than per row
+    ind_map = {raw: _classify_indicator(raw) for raw in df["indicator"].unique()}
+    df["indicator"] = df["indicator"].map(ind_map)
+    df = df.dropna(subset=["indicator", "value"])
+
+    # Last row of a key wins inside add(): order rows oldest → newest revision
+    if "classification_version" in df:
+        revisions = {raw: _revision_year(raw) for raw in df["classification_version"].unique()}
+        df = df.iloc[np.argsort(df["classification_version"].map(revisions).to_numpy(), kind="stable")]
+
+    partners = df[partner_col].fillna(WORLD).to_numpy() if partner_col else WORLD
+    cube.add(
+        df["reporter_name"].to_numpy(), partners, df["product_code"].to_numpy(),
+        df["year"].to_numpy(), df["indicator"].to_numpy(),
+        df["value"].astype(float).to_numpy(),
+    )
+    return cube
+
+
+_CUBE: TariffCube | None = None
+_CUBE_LOCK = threading.Lock()
+_CUBE_VERSION = 0
+
+
+def cube_version() -> int:
+    """Bumped every time the process-wide cube is (re)loaded."""
+    return _CUBE_VERSION
+
+
+def get_tariff_cube(refresh: bool = False) -> TariffCube:
+    """
+    Process-wide cube: loaded from CUBE_FILE if present, otherwise built
+    from the raw dump if present, otherwise empty (filled by WITS results).
+    Pass refresh=True to reload after the files change.
+    """
+    global _CUBE, _CUBE_VERSION
+    if _CUBE is None or refresh:
+        with _CUBE_LOCK:
+            if _CUBE is None or refresh:
+                if os.path.exists(CUBE_FILE):
+                    _CUBE = TariffCube.load(CUBE_FILE)
+                elif os.path.exists(RAW_TARIFF_CSV):
+                    _CUBE = build_tariff_cube(RAW_TARIFF_CSV)
+                else:
+                    _CUBE = TariffCube()
+                _CUBE_VERSION += 1
+    return _CUBE
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Build Run
+# ═══════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    cube = build_tariff_cube(RAW_TARIFF_CSV)
+    cube.save(CUBE_FILE)
+    print(f"✅ Built tariff cube: {len(cube):,} cells, "
+          f"{len(cube.countries)} countries in {time.time() - start:.1f}s → {CUBE_FILE}")
+
+    print("\n  Rate history for HS 610910 into USA (2015–2025):")
+    print(cube.history("USA", WORLD, "610910", 2015, 2025).to_string())
@@ -60,6 +60,11 @@ def get_tariff_rate_live(hs_code: str, origin: str, destination: str, year: int
         return wits_data
         
     # Fallback to local
+    return local_tariff_rate(fallback_rate)
+
+
+def local_tariff_rate(fallback_rate: float | None) -> dict:
+    """get_tariff_rate_live-shaped result for a local (non-WITS) rate."""
     return {
         "ahs_rate": fallback_rate,
         "mfn_rate": fallback_rate,
@@ -0,0 +1,165 @@
+"""
+TariffIQ — Import Tax & Fee Schedules
+======================================
+Destination-specific VAT / GST / cess rates, tax bases, de-minimis
+thresholds, flat fees and per-HS-chapter excise, loaded from
+``data/tax_schedules.json``.
+
+Schedules are compiled once into arrays indexed by the route matrix's
+dense country ids (plus a trailing row for the default schedule) and by
+HS chapter, so the scalar and vectorized landed-cost paths apply them by
+array indexing with no per-call parsing.
+"""
+
+import json
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from route_matrix import get_route_matrix
+
+# ── Paths ───────────────────────────────────────────────────────────
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+SCHEDULES_FILE = os.path.join(DATA_DIR, "tax_schedules.json")
+
+N_CHAPTERS = 100
+TAX_BASE_COMPONENTS = ("duty", "cess", "excise")
+CESS_BASES = ("cif", "duty")
+
+
+class TaxSchedule:
+    """
+    Row i holds the schedule for route-matrix country i; the last row is
+    the default schedule (unknown / unlisted destinations). excise[i, ch]
+    is the ad-valorem excise (as a fraction) for HS chapter ch; chapter -1
+    (unknown HS code) maps to a zero column.
+    """
+
+    def __init__(self, schedules: dict):
+        matrix = get_route_matrix()
+        default = schedules["default"]
+        rows = [dict(default) for _ in range(len(matrix) + 1)]
+        for iso3, overrides in schedules.get("countries", {}).items():
+            i = matrix.country_id(iso3)
+            if i < 0:
+                raise ValueError(f"Tax schedule for unknown country '{iso3}'.")
+            rows[i] = {**default, **overrides}
+
+        def col(field, scale=1.0):
+            return np.array([float(r[field]) / scale for r in rows], dtype=np.float64)
+
+        # Rates are stored as fractions (12 → 0.12), matching the old constants bit for bit
+        self.vat_rate = col("vat_rate", 100)
+        self.gst_rate = col("gst_rate", 100)
+        self.cess_rate = col("cess_rate", 100)
+        self.duty_de_minimis = col("duty_de_minimis")
+        self.vat_de_minimis = col("vat_de_minimis")
+        self.handling_fee = col("handling_fee")
+        self.doc_fee = col("doc_fee")
+
+        for r in rows:
+            if r["cess_base"] not in CESS_BASES:
+                raise ValueError(f"cess_base must be one of {CESS_BASES}, got '{r['cess_base']}'.")
+            unknown = set(r["tax_base"]) - set(TAX_BASE_COMPONENTS)
+            if unknown:
+                raise ValueError(f"Unknown tax_base components: {sorted(unknown)}.")
+        self.cess_on_duty = np.array([r["cess_base"] == "duty" for r in rows])
+
+        # 1.0 / 0.0 coefficients, so the VAT base is one fused expression
+        self.base_duty, self.base_cess, self.base_excise = (
+            np.array([float(c in r["tax_base"]) for r in rows]) for c in TAX_BASE_COMPONENTS
+        )
+
+        # Trailing zero column catches chapter -1 (no HS code)
+        self.excise = np.zeros((len(rows), N_CHAPTERS + 1), dtype=np.float64)
+        for i, r in enumerate(rows):
+            for chapter, rate in r["excise"].items():
+                self.excise[i, int(chapter)] = float(rate) / 100
+
+        self.default_id = len(rows) - 1
+        self._matrix = matrix
+        self._terms: dict = {}
+
+    def country_id(self, destination: str | None) -> int:
+        """Scalar country_ids."""
+        i = -1 if destination is None else self._matrix.country_id(destination)
+        return self.default_id if i < 0 else i
+
+    def country_ids(self, destinations) -> np.ndarray:
+        """Row ids for destination names (default row when unknown or None)."""
+        if destinations is None:
+            return np.array(self.default_id)
+        ids = self._matrix.country_ids(destinations)
+        return np.where(ids < 0, self.default_id, ids)
+
+    def shipment_terms(self, destination: str | None, hs_code=None) -> dict:
+        """terms() for one shipment as plain Python numbers, cached per (destination, hs_code)."""
+        key = (destination, hs_code)
+        terms = self._terms.get(key)
+        if terms is None:
+            t, chapter = np.array([self.country_id(destination)]), np.array([hs_chapter(hs_code)])
+            terms = {k: v.item() for k, v in self.terms(t, chapter).items()}
+            self._terms[key] = terms
+        return terms
+
+    def terms(self, t, chapter) -> dict:
+        """
+        Schedule terms for schedule rows `t` and HS chapters `chapter`,
+        keyed like the attributes (excise already per chapter).
+        """
+        return {
+            "vat_rate": self.vat_rate[t], "gst_rate": self.gst_rate[t], "cess_rate": self.cess_rate[t],
+            "duty_de_minimis": self.duty_de_minimis[t], "vat_de_minimis": self.vat_de_minimis[t],
+            "handling_fee": self.handling_fee[t], "doc_fee": self.doc_fee[t],
+            "cess_on_duty": self.cess_on_duty[t], "base_duty": self.base_duty[t],
+            "base_cess": self.base_cess[t], "base_excise": self.base_excise[t],
+            "excise": self.excise[t, chapter],
+        }
+
+
+def hs_chapters(hs_codes) -> np.ndarray:
+    """2-digit HS chapter per code (-1 when missing or non-numeric)."""
+    if hs_codes is None:
+        return np.array(-1)
+    codes = np.atleast_1d(np.asarray(hs_codes, dtype=object))
+    if codes.size == 1:
+        return np.full(codes.shape, hs_chapter(codes.flat[0]), dtype=np.int64)
+    inverse, uniques = pd.factorize(codes.ravel())
+    # Trailing -1 for factorize's missing-value code
+    lookup = np.array([hs_chapter(u) for u in uniques] + [-1], dtype=np.int64)
+    return lookup[inverse].reshape(codes.shape)
+
+
+@lru_cache(maxsize=65536)
+def hs_chapter(hs_code) -> int:
+    """Scalar hs_chapters."""
+    if hs_code is None:
+        return -1
+    code = str(hs_code).strip()
+    # Odd-length numeric codes lost their leading zero (e.g. 20422 → 020422)
+    code = code.zfill(len(code) + len(code) % 2)
+    return int(code[:2]) if code[:2].isdigit() else -1
+
+
+def load_schedules(path: str = SCHEDULES_FILE) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+_SCHEDULE: TaxSchedule | None = None
+_SCHEDULE_LOCK = threading.Lock()
+
+
+def get_tax_schedule(refresh: bool = False) -> TaxSchedule:
+    """Process-wide compiled schedule (compiled on first use or refresh)."""
+    global _SCHEDULE
+    if _SCHEDULE is None or refresh:
+        with _SCHEDULE_LOCK:
+            if _SCHEDULE is None or refresh:
+                _SCHEDULE = TaxSchedule(load_schedules(SCHEDULES_FILE))
+    return _SCHEDULE
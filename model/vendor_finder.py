@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from urllib.parse import urlparse
 
+from context_packing import pack_context
+
 load_dotenv()
 
 # Setup MegaLLM Client
@@ -21,6 +23,9 @@ if MEGALLM_API_KEY:
 TAVILY_API_KEY = os.getenv("TAVILLY_API_KEY")
 TAVILY_ENDPOINT = "https://api.tavily.com/search"
 
+# Evidence handed to the vendor verdict (≈ the former 5000-char cut)
+VENDOR_EVIDENCE_TOKENS = int(os.getenv("TARIFFIQ_VENDOR_EVIDENCE_TOKENS", "1000"))
+
 
 def _extract_core_product_name(product_desc: str) -> str:
     """
@@ -175,10 +180,12 @@ def discover_vendors(product: str, country: str) -> list[dict]:
     return unique_vendors
 
 
-def get_tavily_evidence(company: str, product: str) -> str:
+def get_tavily_evidence(company: str, product: str, model=None,
+                        max_tokens: int = VENDOR_EVIDENCE_TOKENS) -> str:
     """
     (B) Phase 2: Gather real-world evidence about a company using a combined Tavily query.
-    Returns a truncated text string (~4-6k chars) combining the search snippets.
+    Returns the search snippets packed to max_tokens, most relevant to the
+    company / product / reviews first when a SentenceTransformer `model` is given.
     """
     if not TAVILY_API_KEY:
         return ""
@@ -188,7 +195,7 @@ def get_tavily_evidence(company: str, product: str) -> str:
         f'"{company}" reviews OR complaints'
     ]
     
-    evidence_text = ""
+    sources = []
     for query in queries:
         payload = {
             "api_key": TAVILY_API_KEY,
@@ -202,18 +209,13 @@ def get_tavily_evidence(company: str, product: str) -> str:
             response.raise_for_status()
             results = response.json().get("results", [])
             
-            for idx, r in enumerate(results):
-                evidence_text += f"\n--- Source: {r.get('url')} ---\n"
-                evidence_text += r.get("content", "") + "\n"
+            for r in results:
+                sources.append((f"Source ({r.get('url')})", r.get("content", "")))
 
         except Exception as e:
             print(f"Evidence search failed for '{company}': {e}")
 
-    # Truncate evidence to roughly 5000 characters
-    if len(evidence_text) > 5000:
-        evidence_text = evidence_text[:5000] + "...\n[TRUNCATED]"
-
-    return evidence_text
+    return pack_context(sources, f"{company} {product} reviews complaints", max_tokens, model=model)
 
 
 def verify_vendor_with_llm(product: str, country: str, vendor: dict, evidence: str) -> dict:
@@ -296,9 +298,10 @@ Do not include markdown blocks, backticks, or conversational text. Output raw JS
         return {}
 
 
-def run_pipeline(product: str, country: str) -> list[dict]:
+def run_pipeline(product: str, country: str, model=None) -> list[dict]:
     """
     (D) Phase 4: Orchestrate the Discovery -> Evidence -> Verification pipeline.
+    `model` (a SentenceTransformer) ranks evidence passages when given.
     """
     core_product = _extract_core_product_name(product)
     if core_product != product:
@@ -320,7 +323,7 @@ def run_pipeline(product: str, country: str) -> list[dict]:
         print(f"\n   [{i+1}/{len(vendors)}] Evaluating: {company_name}")
         
         # Gather deep evidence using the core product name
-        evidence = get_tavily_evidence(company=company_name, product=core_product)
+        evidence = get_tavily_evidence(company=company_name, product=core_product, model=model)
         
         if not evidence.strip():
             v["verification"] = {"error": "No external evidence found."}
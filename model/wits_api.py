@@ -13,8 +13,16 @@ Supports two endpoints:
 API Docs: https://wits.worldbank.org/API/V1/SDMX/V21/rest/doc
 """
 
+import os
+import threading
+from concurrent.futures import Future
+
+import numpy as np
 import requests
 from functools import lru_cache
+from requests.adapters import HTTPAdapter
+
+from tariff_cube import WORLD, get_tariff_cube
 
 # ── Base URLs ───────────────────────────────────────────────────────
 TRADESTATS_BASE = (
@@ -44,7 +52,7 @@ ISO3_TO_NUMERIC = {
 # ── Friendly name → ISO3 mapping ───────────────────────────────────
 # Matches naming in shipping_landed_cost.py
 COUNTRY_NAME_TO_ISO3 = {
-    "usa": "USA", "united states": "USA",
+    "usa": "USA", "united states": "USA", "united states of america": "USA",
     "india": "IND",
     "uk": "GBR", "united kingdom": "GBR",
     "china": "CHN",
@@ -121,6 +129,59 @@ TARIFF_INDICATORS = {
 }
 
 
+# ── Global Concurrency Budget ──────────────────────────────────────
+# Caps outstanding WITS HTTP requests across every thread in the process,
+# however many API requests are fanning out at once.
+WITS_MAX_CONCURRENCY = int(os.getenv("TARIFFIQ_WITS_CONCURRENCY", "8"))
+_WITS_SEMAPHORE = threading.BoundedSemaphore(WITS_MAX_CONCURRENCY)
+
+# One keep-alive session for every WITS call: lookups reuse pooled TLS
+# connections instead of opening a new one per request
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=WITS_MAX_CONCURRENCY))
+
+
+def _wits_get(url: str, timeout: int) -> requests.Response:
+    """GET on the shared session under the process-wide WITS concurrency budget."""
+    with _WITS_SEMAPHORE:
+        return _SESSION.get(url, timeout=timeout)
+
+
+class _SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one: the first caller
+    runs the fetch, later callers wait for its result. lru_cache alone
+    lets every thread that misses at the same moment fetch in parallel.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[tuple, Future] = {}
+
+    def do(self, key: tuple, fetch):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_SINGLE_FLIGHT = _SingleFlight()
+
+
 def _hs6_to_product_group(hs6: str) -> str | None:
     """Convert a 6-digit HS code to its WITS product group ID."""
     try:
@@ -152,7 +213,6 @@ def _resolve_iso3(code_or_name: str) -> str:
 #  Endpoint 1: TradeStats-Tariff (aggregate, reliable)
 # ═══════════════════════════════════════════════════════════════════
 
-@lru_cache(maxsize=128)
 def get_tradestats_tariff(
     reporter: str,
     partner: str,
@@ -185,10 +245,30 @@ def get_tradestats_tariff(
         List of dicts with keys: product_group, product_label, tariff_rate,
         reporter, partner, year, indicator.
         Returns None on failure.
+
+    Results are cached per (reporter, partner, year, product, indicator),
+    so every HS code in the same chapter range shares one fetch, and
+    concurrent misses on the same key wait for a single request.
     """
-    reporter_iso3 = _resolve_iso3(reporter)
-    partner_iso3 = _resolve_iso3(partner)
+    return _tradestats_cached(
+        _resolve_iso3(reporter), _resolve_iso3(partner), year, product, indicator, timeout,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _tradestats_cached(
+    reporter_iso3: str, partner_iso3: str, year: int, product: str, indicator: str, timeout: int,
+) -> list[dict] | None:
+    key = ("tradestats", reporter_iso3, partner_iso3, year, product, indicator)
+    return _SINGLE_FLIGHT.do(key, lambda: _fetch_tradestats(
+        reporter_iso3, partner_iso3, year, product, indicator, timeout,
+    ))
+
 
+def _fetch_tradestats(
+    reporter_iso3: str, partner_iso3: str, year: int, product: str, indicator: str, timeout: int,
+) -> list[dict] | None:
+    """One TradeStats-Tariff request, parsed (see get_tradestats_tariff)."""
     url = (
         f"{TRADESTATS_BASE}"
         f"/reporter/{reporter_iso3.lower()}"
@@ -200,7 +280,7 @@ def get_tradestats_tariff(
     )
 
     try:
-        response = requests.get(url, timeout=timeout)
+        response = _wits_get(url, timeout)
     except requests.exceptions.RequestException as e:
         print(f"[WITS TradeStats] Request failed: {e}")
         return None
@@ -305,7 +385,8 @@ def get_tariff_for_hs_category(
     )
 
     if results and len(results) > 0:
-        r = results[0]
+        # Copy: the cached group row is shared by every HS code in the range
+        r = dict(results[0])
         r["hs_code"] = hs6
         r["source"] = "tradestats-tariff"
         return r
@@ -317,7 +398,7 @@ def get_tariff_for_hs_category(
 #  Endpoint 2: TRN / TRAINS (HS-6, intermittently available)
 # ═══════════════════════════════════════════════════════════════════
 
-@lru_cache(maxsize=128)
+@lru_cache(maxsize=4096)
 def get_tariff_rate_trains(
     reporter: str,
     partner: str,
@@ -372,7 +453,7 @@ def get_tariff_rate_trains(
     )
 
     try:
-        response = requests.get(url, timeout=timeout)
+        response = _wits_get(url, timeout)
     except requests.exceptions.RequestException as e:
         print(f"[WITS TRAINS] Request failed: {e}")
         return None
@@ -411,6 +492,49 @@ def get_tariff_rate_trains(
 #  Smart Lookup: tries TRAINS first, falls back to TradeStats
 # ═══════════════════════════════════════════════════════════════════
 
+def lookup_cube_rate(
+    reporter: str,
+    partner: str,
+    hs6: str,
+    year: int,
+    indicator: str = "AHS",
+    max_lag: int = 2,
+    world_fallback: bool = True,
+) -> dict | None:
+    """
+    Resolve an HS-6 rate from the local tariff cube: latest year at or
+    before `year`, at most `max_lag` years back. A partner-specific cell
+    wins; with world_fallback, the reporter's rate against the world
+    (``WLD`` rows of the raw dump) — `indicator`, then MFN — follows,
+    with partner_scope = "WLD".
+    """
+    reporter_iso3 = _resolve_iso3(reporter)
+    partner_iso3 = _resolve_iso3(partner)
+    hs6 = str(hs6).strip().zfill(6)
+    cube = get_tariff_cube()
+
+    candidates = [(partner_iso3, indicator)]
+    if world_fallback:
+        candidates += [(WORLD, ind) for ind in dict.fromkeys((indicator, "MFN"))]
+    for scope, ind in candidates:
+        rates, years = cube.lookup(
+            reporter_iso3, scope, hs6, year,
+            indicator=ind, resolve="previous", max_lag=max_lag,
+        )
+        if not np.isnan(rates[()]):
+            return {
+                "tariff_rate": float(rates[()]),
+                "reporter": reporter_iso3,
+                "partner": partner_iso3,
+                "partner_scope": scope,
+                "indicator": ind,
+                "hs_code": hs6,
+                "year": int(years[()]),
+                "source": "tariff-cube",
+            }
+    return None
+
+
 def get_tariff_rate(
     reporter: str,
     partner: str,
@@ -420,18 +544,33 @@ def get_tariff_rate(
     timeout: int = 15,
 ) -> dict | None:
     """
-    Smart tariff lookup — tries HS-6 granularity first (TRAINS) across recent years,
-    then falls back to product-category average (TradeStats).
+    Smart tariff lookup — resolves a partner-specific HS-6 rate from the
+    local tariff cube (nearest available year up to 2 years back), then
+    tries TRAINS on a cube miss, then the raw dump's rate against the world
+    (partner_scope="WLD", so FTA preferences are never masked by it), then
+    falls back to product-category average (TradeStats).
     """
-    # 1. Try TRAINS (HS-6) for the requested year, and back 2 years if needed
+    # 1. Local tariff cube — partner-specific cells (previously fetched TRAINS rates)
+    cached = lookup_cube_rate(reporter, partner, hs6, year, max_lag=2, world_fallback=False)
+    if cached:
+        return cached
+
+    # 2. Try TRAINS (HS-6) for the requested year, and back 2 years if needed.
+    #    Hits are written through to the cube so the next lookup stays local.
     for lookup_year in [year, year - 1, year - 2]:
         result = get_tariff_rate_trains(
             reporter, partner, hs6, lookup_year, timeout=timeout
         )
         if result:
+            get_tariff_cube().add_records([result], indicator="AHS")
             return result
 
-    # 2. Fallback to TradeStats (category-level) for the requested year
+    # 3. The reporter's rate against the world from the raw dump
+    world = lookup_cube_rate(reporter, partner, hs6, year, max_lag=2)
+    if world:
+        return world
+
+    # 4. Fallback to TradeStats (category-level) for the requested year
     return get_tariff_for_hs_category(
         reporter, partner, hs6, year, indicator=indicator, timeout=timeout
     )